@@ -1,7 +1,14 @@
 from __future__ import annotations
 
+import re
 from typing import Literal
 
+try:
+    # optional: RE2's linear-time engine for the routing keyword patterns
+    import re2 as _fast_re
+except ImportError:
+    _fast_re = re
+
 from langgraph.checkpoint.memory import InMemorySaver
 from langgraph.graph import END, StateGraph
 
@@ -71,6 +78,12 @@ def start_agent_node(state: AgentState) -> AgentState:
         plan_correction_reasoning = state.get("plan_correction_reasoning") or "",
     )
 
+# Keyword rules for route_context_decision, each compiled into one alternation so a
+# single regex pass replaces a Python loop of substring checks. Case-insensitivity is
+# inline, since re2 takes no re.IGNORECASE flag.
+_YELLOW_PROMPT_KEYWORDS = _fast_re.compile("(?i)yellow|nitrolite|sdk|channel|payment")
+_DOC_KEYWORDS = _fast_re.compile("doc|readme|guide|api|reference|spec")
+
 # Routing functions
 def route_context_decision(state: AgentState) -> Literal["read_code", "retrieve_docs", "research", "ready"]:
     """
@@ -110,8 +123,7 @@ def route_context_decision(state: AgentState) -> Literal["read_code", "retrieve_
         # For Yellow SDK integration, docs are critical - retrieve them first if not done
         if not docs_retrieved:
             # Check if prompt suggests Yellow SDK integration
-            prompt_lower = (state.get("prompt", "") or "").lower()
-            if any(keyword in prompt_lower for keyword in ["yellow", "nitrolite", "sdk", "channel", "payment"]):
+            if _YELLOW_PROMPT_KEYWORDS.search(state.get("prompt", "") or ""):
                 return "retrieve_docs"
         return "read_code"
 
@@ -126,7 +138,7 @@ def route_context_decision(state: AgentState) -> Literal["read_code", "retrieve_
             file_like.append(item)
             continue
         # Mentions docs / guides / api etc.
-        if any(keyword in text for keyword in ["doc", "readme", "guide", "api", "reference", "spec"]):
+        if _DOC_KEYWORDS.search(text):
             doc_like.append(item)
 
     # If there are unresolved file-like gaps, try reading code again.
@@ -198,16 +210,10 @@ def route_resume(state: AgentState) -> Literal["start_agent", "coding"]:
     return "start_agent"
 
 
-def resume_router_node(state: AgentState) -> AgentState:
-    """No-op entry node; routing is done by route_resume conditional edge."""
-    return state
-
-
 # Build the graph
 workflow = StateGraph(AgentState)
 
 # Add nodes
-workflow.add_node("resume_router", resume_router_node)
 workflow.add_node("start_agent", start_agent_node)
 workflow.add_node("context_check", nodes.context_check_node)
 workflow.add_node("read_code", nodes.read_code_node)
@@ -235,10 +241,9 @@ workflow.add_node("fix_plan", nodes.fix_plan_node)
 workflow.add_node("escalation", nodes.escalation_node)
 workflow.add_node("summary", nodes.summary_node)
 
-# Set entry point: router decides start_agent (new run) vs coding (resume after approval)
-workflow.set_entry_point("resume_router")
-workflow.add_conditional_edges(
-    "resume_router",
+# Conditional entry: route_resume picks start_agent (new run) vs coding (resume after
+# approval) directly from START, without a pass-through node and its extra checkpoint.
+workflow.set_conditional_entry_point(
     route_resume,
     {"start_agent": "start_agent", "coding": "coding"},
 )
@@ -312,20 +317,22 @@ workflow.add_conditional_edges(
     check_build_result,
     {
         "success": "summary",
-        "failure": "error_analysis"
+        "failure": "memory_check"
     }
 )
 
-# Error handling loop
-workflow.add_edge("error_analysis", "memory_check")
+# Error handling loop. memory_check only bumps a counter, so it runs first: when the
+# retry budget is spent we escalate straight away instead of paying for an LLM error
+# analysis that escalation never reads.
 workflow.add_conditional_edges(
     "memory_check",
     check_memory,
     {
-        "retry": "fix_plan",
+        "retry": "error_analysis",
         "escalate": "escalation"
     }
 )
+workflow.add_edge("error_analysis", "fix_plan")
 
 workflow.add_edge("fix_plan", "coding")  # Loop back to verify fix
 workflow.add_edge("escalation", "summary")
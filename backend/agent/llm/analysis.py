@@ -1,10 +1,11 @@
 from __future__ import annotations
 
+import heapq
 from typing import Dict, Any, List, Optional
 
 from config import settings
 from agent import prompts
-from agent.llm.utils import extract_text_from_content, extract_json_from_response
+from agent.llm.utils import format_tree_for_prompt, invoke_llm_json, truncate_to_tokens
 
 async def analyze_context(prompt: str, files: Dict[str, str], memory: List[str], tree: Optional[Dict[str, Any]] = None, doc_context: str = "") -> Dict[str, Any]:
     """
@@ -25,7 +26,7 @@ async def analyze_context(prompt: str, files: Dict[str, str], memory: List[str],
     
     # Add file tree structure if available (especially useful when files is empty)
     if tree:
-        tree_str = _format_tree_for_prompt(tree)
+        tree_str = format_tree_for_prompt(tree)
         context_parts.append(f"File Tree Structure:\n{tree_str}\n")
     
     # Add file list summary
@@ -34,14 +35,13 @@ async def analyze_context(prompt: str, files: Dict[str, str], memory: List[str],
     
     # Add snippets for files to give LLM context
     # Limit to avoid huge prompts, but ensure we show content
-    for path in sorted(files.keys()):
-        content = files.get(path, "")
+    for path, content in sorted(files.items()):
         # clear any large binary or lock files from view if they accidentally got in
         if "lock" in path or len(content) > 100000: 
             continue
             
-        snippet = content[:2000] # 2KB limit per file for decision making
-        if len(content) > 2000:
+        snippet = truncate_to_tokens(content, 500) # ~2KB of English per file for decision making
+        if len(snippet) < len(content):
             snippet += "\n... (truncated)"
         context_parts.append(f"--- {path} ---\n{snippet}\n")
         
@@ -66,9 +66,7 @@ async def analyze_context(prompt: str, files: Dict[str, str], memory: List[str],
 
     llm = get_llm(temperature=0.1, max_tokens=1024)
 
-    resp = await llm.ainvoke(messages)
-    content = extract_text_from_content(getattr(resp, "content", ""))
-    obj = extract_json_from_response(content)
+    content, obj = await invoke_llm_json(llm, messages)
 
     if not obj:
         # Default to ready if LLM fails to structure response, 
@@ -112,9 +110,7 @@ async def analyze_imports(files: Dict[str, str]) -> Dict[str, Any]:
 
     llm = get_llm(temperature=0.1, max_tokens=1024)
 
-    resp = await llm.ainvoke(messages)
-    content = extract_text_from_content(getattr(resp, "content", ""))
-    obj = extract_json_from_response(content)
+    content, obj = await invoke_llm_json(llm, messages)
     
     return obj or {"imports": [], "dependencies": [], "yellow_sdk_present": False}
 
@@ -132,9 +128,8 @@ async def conduct_research(query: str, files: Dict[str, str], docs_context: str)
 
     # Provide snippets of key files
     snippets = []
-    for path in sorted(files.keys())[:5]:
-        content = files.get(path, "")
-        snippet = content[:1000]
+    for path, content in heapq.nsmallest(5, files.items()):
+        snippet = truncate_to_tokens(content, 250)
         snippets.append(f"--- {path} ---\n{snippet}")
     
     file_context = "\n".join(snippets)
@@ -143,31 +138,10 @@ async def conduct_research(query: str, files: Dict[str, str], docs_context: str)
 
     llm = get_llm(temperature=0.2, max_tokens=2048)
 
-    resp = await llm.ainvoke(messages)
-    content = extract_text_from_content(getattr(resp, "content", ""))
-    obj = extract_json_from_response(content)
+    content, obj = await invoke_llm_json(llm, messages)
     
     return obj or {"findings": "Could not generate findings", "next_steps": []}
 
-def _format_tree_for_prompt(tree: Dict[str, Any], indent: int = 0) -> str:
-    """Format file tree structure for LLM prompt."""
-    if not tree:
-        return ""
-    
-    lines = []
-    prefix = "  " * indent
-    name = tree.get("name", "")
-    node_type = tree.get("type", "")
-    
-    if node_type == "folder":
-        lines.append(f"{prefix}📁 {name}/")
-        for child in tree.get("children", []):
-            lines.append(_format_tree_for_prompt(child, indent + 1))
-    else:
-        lines.append(f"{prefix}📄 {name}")
-    
-    return "\n".join(lines)
-
 async def analyze_errors(build_output: str) -> Dict[str, Any]:
     """
     Analyze build/test errors.
@@ -186,8 +160,6 @@ async def analyze_errors(build_output: str) -> Dict[str, Any]:
 
     llm = get_llm(temperature=0.1, max_tokens=1024)
 
-    resp = await llm.ainvoke(messages)
-    content = extract_text_from_content(getattr(resp, "content", ""))
-    obj = extract_json_from_response(content)
+    content, obj = await invoke_llm_json(llm, messages)
     
     return obj or {"error_type": "unknown", "fix_suggestion": "Check logs"}
@@ -3,16 +3,21 @@ from __future__ import annotations
 from pathlib import Path
 from typing import Dict, List, Optional
 import json
+import re
 
 from config import settings
 from agent.state import Diff
 from agent import prompts
-from agent.llm.utils import extract_text_from_content, get_llm
+from agent.llm.utils import astream_llm_text, cache_llm_reply, format_llm_json_error, get_llm
 from logging import getLogger
 
 logger = getLogger(__name__)
 
 
+# Only these characters affect brace matching; the regex skips everything else in C.
+_OBJECT_SCAN_TOKENS = re.compile(r"""[{}"'\\]""")
+
+
 def _extract_json_from_text(text: str) -> Optional[str]:
     """
     Extract the first complete JSON object (between braces) from text.
@@ -24,30 +29,26 @@ def _extract_json_from_text(text: str) -> Optional[str]:
     if start == -1:
         return None
     depth = 0
-    in_string = False
-    escape = False
-    quote_char = None
-    for i in range(start, len(text)):
-        c = text[i]
-        if escape:
-            escape = False
-            continue
-        if c == "\\" and in_string:
-            escape = True
-            continue
-        if not in_string:
-            if c == "{":
-                depth += 1
-            elif c == "}":
-                depth -= 1
-                if depth == 0:
-                    return text[start : i + 1]
-            elif c in ("\"", "'"):
-                in_string = True
-                quote_char = c
+    quote_char = None  # set while inside a string
+    escaped = -1  # index of the character a backslash escapes
+    for m in _OBJECT_SCAN_TOKENS.finditer(text, start):
+        i = m.start()
+        if i == escaped:
             continue
-        if c == quote_char:
-            in_string = False
+        c = text[i]
+        if quote_char is not None:
+            if c == "\\":
+                escaped = i + 1
+            elif c == quote_char:
+                quote_char = None
+        elif c == "{":
+            depth += 1
+        elif c == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start : i + 1]
+        elif c in ("\"", "'"):
+            quote_char = c
     return None
 
 
@@ -95,8 +96,8 @@ def _parse_coder_json_response(content: str) -> Optional[dict]:
 def _build_file_context(files: Dict[str, str], max_per_file: int = 8000) -> str:
     """Build prompt file context: --- path ---\\ncontent for each file. Truncate very large files."""
     parts = []
-    for path in sorted(files.keys()):
-        content = files.get(path) or ""
+    for path, content in sorted(files.items()):
+        content = content or ""
         if len(content) > max_per_file:
             content = content[:max_per_file] + "\n... [truncated]"
         parts.append(f"--- {path} ---\n{content}\n")
@@ -128,6 +129,35 @@ def _diffs_from_llm_response(obj: dict) -> List[Diff]:
     return out
 
 
+_DIFFS_ARRAY_START = re.compile(r'"diffs"\s*:\s*\[')
+_JSON_DECODER = json.JSONDecoder()
+_ARRAY_SEPARATORS = " \t\r\n,"
+
+
+def _salvage_diffs(content: str) -> List[Diff]:
+    """
+    Complete diff objects from a reply that is not complete JSON (e.g. cut off at
+    max_tokens): one pass over the "diffs" array, stopping at the first object that
+    doesn't parse.
+    """
+    m = _DIFFS_ARRAY_START.search(content)
+    if m is None:
+        return []
+    items = []
+    pos = m.end()
+    while True:
+        while pos < len(content) and content[pos] in _ARRAY_SEPARATORS:
+            pos += 1
+        if pos >= len(content) or content[pos] == "]":
+            break
+        try:
+            item, pos = _JSON_DECODER.raw_decode(content, pos)
+        except ValueError:
+            break
+        items.append(item)
+    return _diffs_from_llm_response({"diffs": items})
+
+
 async def propose_code_changes(
     prompt: str,
     files: Dict[str, str],
@@ -140,6 +170,11 @@ async def propose_code_changes(
     Invoke LLM with coder prompt (plan, rag, file context, tool_diffs), parse response JSON,
     and return list of Diff from obj["diffs"].
     """
+    # No request, no plan and no tool edits: there is nothing for the coder to write.
+    if not (prompt or "").strip() and not (plan_notes or "").strip() and not tool_diffs:
+        logger.info("propose_code_changes: empty prompt and plan; skipping LLM call")
+        return []
+
     # Effective files: repo files + tool-proposed newCode per file
     effective_files: Dict[str, str] = dict(files or {})
     for d in tool_diffs or []:
@@ -163,20 +198,25 @@ async def propose_code_changes(
     llm = get_llm(temperature=0.2, max_tokens=8192 * 2)
     logger.info("Invoking coder LLM", extra={"model": settings.OPENROUTER_MODEL})
 
-    response = await llm.ainvoke(messages)
-    raw_content = getattr(response, "content", "") or ""
-    content = extract_text_from_content(raw_content)
-    logger.info(
-        "Coder LLM response received",
-        extra={"content_len": len(content or ""), "raw_type": type(raw_content).__name__},
-    )
+    parts: List[str] = []
+    async for delta in astream_llm_text(llm, messages):
+        parts.append(delta)
+    content = "".join(parts)
+    logger.info("Coder LLM response received", extra={"content_len": len(content)})
 
     obj = _parse_coder_json_response(content)
-    if obj is None:
-        logger.warning("propose_code_changes: no valid JSON from LLM")
-        return []
+    if obj is not None:
+        valid_diffs = _diffs_from_llm_response(obj)
+        # Only a complete, parsed reply is worth replaying to an identical request
+        cache_llm_reply(llm, messages, content)
+    else:
+        # Reply cut off (e.g. max_tokens) after some complete diffs: keep those
+        valid_diffs = _salvage_diffs(content)
+        if not valid_diffs:
+            logger.warning("propose_code_changes: %s", format_llm_json_error(content, "code changes"))
+            return []
+        logger.warning("propose_code_changes: reply is not complete JSON; keeping %s complete diffs", len(valid_diffs))
 
-    valid_diffs = _diffs_from_llm_response(obj)
     logger.info("propose_code_changes: parsed %s diffs", len(valid_diffs), extra={"files": [d["file"] for d in valid_diffs]})
     return valid_diffs
 
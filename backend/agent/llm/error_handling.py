@@ -5,7 +5,8 @@ from agent.state import Diff
 
 from config import settings
 from agent import prompts
-from agent.llm.utils import extract_text_from_content, extract_json_from_response
+from agent.llm.coding import _diffs_from_llm_response
+from agent.llm.utils import invoke_llm_json, truncate_to_tokens
 
 async def generate_fix_plan(
     error_analysis: Dict[str, Any], 
@@ -33,16 +34,16 @@ async def generate_fix_plan(
         if file_path in files:
             content = files[file_path]
             # Limit content size to avoid huge prompts
-            snippet = content[:2000] if len(content) > 2000 else content
-            if len(content) > 2000:
+            snippet = truncate_to_tokens(content, 500)
+            if len(snippet) < len(content):
                 snippet += "\n... (truncated)"
             file_context_parts.append(f"--- {file_path} ---\n{snippet}\n")
     
     # Also include a few other relevant files for context
     for path, content in list(files.items())[:5]:
         if path not in files_to_fix:
-            snippet = content[:1000] if len(content) > 1000 else content
-            if len(content) > 1000:
+            snippet = truncate_to_tokens(content, 250)
+            if len(snippet) < len(content):
                 snippet += "\n... (truncated)"
             file_context_parts.append(f"--- {path} ---\n{snippet}\n")
     
@@ -53,24 +54,13 @@ async def generate_fix_plan(
     
     llm = get_llm(temperature=0.1, max_tokens=8192)
     
-    resp = await llm.ainvoke(messages)
-    content = extract_text_from_content(getattr(resp, "content", ""))
-    obj = extract_json_from_response(content)
+    content, obj = await invoke_llm_json(llm, messages)
     
     if not obj or "diffs" not in obj:
         return []
     
-    # Convert to Diff format
-    diffs = []
-    for diff_data in obj["diffs"]:
-        if all(k in diff_data for k in ["file", "oldCode", "newCode"]):
-            diffs.append({
-                "file": diff_data["file"],
-                "oldCode": diff_data["oldCode"],
-                "newCode": diff_data["newCode"]
-            })
-    
-    return diffs
+    # Same Diff contract as the coder's diffs: str fields, no-op edits dropped
+    return _diffs_from_llm_response(obj)
 
 async def escalate_issue(
     error_context: str, 
@@ -92,9 +82,7 @@ async def escalate_issue(
     
     llm = get_llm(temperature=0.2, max_tokens=1024)
     
-    resp = await llm.ainvoke(messages)
-    content = extract_text_from_content(getattr(resp, "content", ""))
-    obj = extract_json_from_response(content)
+    content, obj = await invoke_llm_json(llm, messages)
     
     if obj and "message" in obj:
         return obj["message"]
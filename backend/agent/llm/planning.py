@@ -1,10 +1,25 @@
 from __future__ import annotations
 
+import heapq
 from typing import Dict, Any, List, Optional
 
 from config import settings
 from agent import prompts
-from agent.llm.utils import extract_text_from_content, extract_json_from_response
+from agent.llm.utils import format_llm_json_error, format_tree_for_prompt, invoke_llm_json, truncate_to_tokens
+
+
+# Returned without an LLM call when there is neither a request nor any file content.
+_EMPTY_PLAN = {
+    "notes_markdown": "",
+    "yellow_sdk_version": "latest",
+    "needs_yellow": False,
+    "needs_simple_channel": False,
+    "needs_multiparty": False,
+    "needs_versioned": False,
+    "needs_tip": False,
+    "needs_deposit": False,
+}
+
 
 async def generate_plan(prompt: str, files: Dict[str, str], doc_context: str = "") -> dict:
     """
@@ -14,6 +29,10 @@ async def generate_plan(prompt: str, files: Dict[str, str], doc_context: str = "
     Returns dict like:
       {"notes_markdown": "...", "yellow_sdk_version": "^x.y.z"}
     """
+    # Nothing to plan from: no request and no non-blank file, so skip the LLM round trip.
+    if not (prompt or "").strip() and not any(content.strip() for content in (files or {}).values()):
+        return dict(_EMPTY_PLAN)
+
     if not settings.OPENROUTER_API_KEY:
         raise RuntimeError("OPENROUTER_API_KEY is not set. Cannot generate plan without LLM.")
 
@@ -24,9 +43,9 @@ async def generate_plan(prompt: str, files: Dict[str, str], doc_context: str = "
 
     # Keep context small to avoid huge prompts; just provide a snippet of a few files.
     snippets: list[str] = []
-    for path in sorted(files.keys())[:10]:
-        content = files.get(path, "")
-        snippet = content[:1200]
+    # Only the first 10 paths are needed: nsmallest avoids sorting the whole repo.
+    for path, content in heapq.nsmallest(10, files.items()):
+        snippet = truncate_to_tokens(content, 300)
         snippets.append(f"--- {path} ---\n{snippet}\n")
     codebase_context = "\n".join(snippets)
 
@@ -34,22 +53,10 @@ async def generate_plan(prompt: str, files: Dict[str, str], doc_context: str = "
 
     llm = get_llm(temperature=0.2, max_tokens=(8192 * 2))
 
-    resp = await llm.ainvoke(messages)
-    raw_content = getattr(resp, "content", "") or ""
-    
-    # Extract text from content (handles strings, lists, dicts)
-    content = extract_text_from_content(raw_content)
-    
-    obj = extract_json_from_response(content)
+    content, obj = await invoke_llm_json(llm, messages)
     if not obj:
         # Include a snippet of the actual response for debugging
-        content_snippet = content[:500] if len(content) > 500 else content
-        error_msg = (
-            f"Failed to generate plan from LLM. No valid JSON response received.\n"
-            f"Response preview (first 500 chars): {content_snippet!r}\n"
-            f"Full response length: {len(content)} chars"
-        )
-        raise RuntimeError(error_msg)
+        raise RuntimeError(format_llm_json_error(content, "plan"))
 
     notes = obj.get("notes_markdown")
     version = obj.get("yellow_sdk_version")
@@ -80,25 +87,6 @@ async def generate_architecture(prompt: str, files: Dict[str, str], research_not
     # Placeholder for now - reuses generate_plan logic
     return await generate_plan(prompt, files, doc_context)
 
-def _format_tree_for_prompt(tree: Dict[str, Any], indent: int = 0) -> str:
-    """Format file tree structure for LLM prompt."""
-    if not tree:
-        return ""
-    
-    lines = []
-    prefix = "  " * indent
-    name = tree.get("name", "")
-    node_type = tree.get("type", "")
-    
-    if node_type == "folder":
-        lines.append(f"{prefix}📁 {name}/")
-        for child in tree.get("children", []):
-            lines.append(_format_tree_for_prompt(child, indent + 1))
-    else:
-        lines.append(f"{prefix}📄 {name}")
-    
-    return "\n".join(lines)
-
 async def create_doc_retrieval_checklist(
     prompt: str,
     plan_notes: str,
@@ -120,7 +108,7 @@ async def create_doc_retrieval_checklist(
         raise RuntimeError(f"Failed to import required LLM libraries: {e}")
 
     # Format tree structure
-    tree_str = _format_tree_for_prompt(tree) if tree else "No tree structure available"
+    tree_str = format_tree_for_prompt(tree) if tree else "No tree structure available"
     
     # Format yellow requirements
     reqs_str = "\n".join([
@@ -139,9 +127,7 @@ async def create_doc_retrieval_checklist(
 
     llm = get_llm(temperature=0.2, max_tokens=2048)
 
-    resp = await llm.ainvoke(messages)
-    content = extract_text_from_content(getattr(resp, "content", ""))
-    obj = extract_json_from_response(content)
+    content, obj = await invoke_llm_json(llm, messages)
     
     if not obj:
         # Fallback: create basic checklist from requirements
@@ -187,7 +173,7 @@ async def review_and_correct_plan(
         raise RuntimeError(f"Failed to import required LLM libraries: {e}")
 
     # Format tree structure
-    tree_str = _format_tree_for_prompt(tree) if tree else "No tree structure available"
+    tree_str = format_tree_for_prompt(tree) if tree else "No tree structure available"
     
     # Format yellow requirements
     reqs_str = "\n".join([
@@ -206,9 +192,7 @@ async def review_and_correct_plan(
 
     llm = get_llm(temperature=0.2, max_tokens=4096)
 
-    resp = await llm.ainvoke(messages)
-    content = extract_text_from_content(getattr(resp, "content", ""))
-    obj = extract_json_from_response(content)
+    content, obj = await invoke_llm_json(llm, messages)
     
     if not obj:
         return {
@@ -4,7 +4,7 @@ from typing import List, Dict, Any
 
 from config import settings
 from agent import prompts
-from agent.llm.utils import extract_text_from_content
+from agent.llm.utils import extract_text_from_content, invoke_llm
 
 async def generate_summary(
     thinking_log: List[str], 
@@ -53,7 +53,7 @@ async def generate_summary(
     
     llm = get_llm(temperature=0.3, max_tokens=2048)
     
-    resp = await llm.ainvoke(messages)
+    resp = await invoke_llm(llm, messages)
     content = extract_text_from_content(getattr(resp, "content", ""))
     
     # LLM should return markdown directly, not JSON
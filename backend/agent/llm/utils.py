@@ -1,8 +1,15 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import json
 import re
-from typing import Any, Optional
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, Optional
+
+import orjson
 
 from logging import getLogger
 
@@ -13,7 +20,16 @@ OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
 
 
 def get_llm(**kwargs: Any):
-    """Build ChatOpenAI client for OpenRouter using OPENROUTER_API_KEY and OPENROUTER_MODEL from config."""
+    """Build ChatOpenAI client for OpenRouter using OPENROUTER_API_KEY and OPENROUTER_MODEL from config.
+
+    Clients are memoized per kwargs, so each call site reuses one instance (and its
+    HTTP connection pool) instead of constructing a new client on every node run.
+    """
+    return _cached_llm(tuple(sorted(kwargs.items())))
+
+
+@lru_cache(maxsize=32)
+def _cached_llm(kwargs_items: tuple[tuple[str, Any], ...]):
     from config import settings
     from langchain_openai import ChatOpenAI
     from pydantic import SecretStr
@@ -28,8 +44,259 @@ def get_llm(**kwargs: Any):
         base_url=OPENROUTER_BASE_URL,
         api_key=api_key,
         model=settings.OPENROUTER_MODEL,
-        **kwargs,
+        **dict(kwargs_items),
+    )
+
+# Bounds how many LLM requests the process has in flight at once. OpenRouter's chat
+# endpoint has no multi-prompt batch mode, so concurrent agent runs are gated here
+# instead of each opening its own unbounded request.
+@lru_cache(maxsize=None)
+def _llm_semaphore() -> asyncio.Semaphore:
+    from config import settings
+
+    return asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+
+
+class _RateLimiter:
+    """Token bucket that allows `per_minute` request starts per minute, with bursts up to that size."""
+
+    def __init__(self, per_minute: int) -> None:
+        self._rate = per_minute / 60.0
+        self._capacity = float(per_minute)
+        self._tokens = float(per_minute)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+
+
+@lru_cache(maxsize=None)
+def _llm_rate_limiter() -> _RateLimiter | None:
+    from config import settings
+
+    if settings.LLM_REQUESTS_PER_MINUTE <= 0:
+        return None
+    return _RateLimiter(settings.LLM_REQUESTS_PER_MINUTE)
+
+
+# Exact-match reply cache: retries in the fix loop often resend an identical payload.
+# Holds (stored_at, reply text) and only replies whose JSON parsed, so a truncated or
+# garbled reply is never replayed to a retry.
+_LLM_RESPONSE_CACHE: OrderedDict[str, tuple[float, str]] = OrderedDict()
+
+
+def _llm_cache_key(llm: Any, messages: Any) -> Optional[str]:
+    from config import settings
+
+    if settings.LLM_RESPONSE_CACHE_SIZE <= 0:
+        return None
+    params = (
+        getattr(llm, "model_name", None),
+        getattr(llm, "temperature", None),
+        getattr(llm, "max_tokens", None),
     )
+    payload = json.dumps([repr(params), messages], sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _cached_reply(key: Optional[str]) -> Optional[str]:
+    from config import settings
+
+    if key is None:
+        return None
+    entry = _LLM_RESPONSE_CACHE.get(key)
+    if entry is None:
+        return None
+    stored_at, text = entry
+    if time.monotonic() - stored_at > settings.LLM_RESPONSE_CACHE_TTL_SECONDS:
+        del _LLM_RESPONSE_CACHE[key]
+        return None
+    _LLM_RESPONSE_CACHE.move_to_end(key)
+    logger.debug("LLM response cache hit")
+    return text
+
+
+def cache_llm_reply(llm: Any, messages: Any, text: str) -> None:
+    """
+    Remember a reply for an identical (model params, messages) request. Callers store
+    only replies they have parsed and validated (LRU, LLM_RESPONSE_CACHE_SIZE entries,
+    expiring after LLM_RESPONSE_CACHE_TTL_SECONDS; size 0 disables the cache).
+    """
+    from config import settings
+
+    key = _llm_cache_key(llm, messages)
+    if key is None:
+        return
+    _LLM_RESPONSE_CACHE[key] = (time.monotonic(), text)
+    _LLM_RESPONSE_CACHE.move_to_end(key)
+    while len(_LLM_RESPONSE_CACHE) > settings.LLM_RESPONSE_CACHE_SIZE:
+        _LLM_RESPONSE_CACHE.popitem(last=False)
+
+
+async def invoke_llm(llm: Any, messages: Any) -> Any:
+    """`llm.ainvoke(messages)` behind the process-wide LLM concurrency and rate limits."""
+    async with _llm_semaphore():
+        limiter = _llm_rate_limiter()
+        if limiter is not None:
+            await limiter.acquire()
+        return await llm.ainvoke(messages)
+
+
+async def astream_llm_text(llm: Any, messages: Any) -> AsyncIterator[str]:
+    """
+    Streaming counterpart of invoke_llm: yields the reply text piece by piece as
+    `llm.astream(messages)` produces it, so callers can work on a long reply before
+    it has finished. Same concurrency/rate limits as invoke_llm. A reply the caller
+    stored with cache_llm_reply is yielded whole instead; nothing is cached here,
+    since only the caller knows whether the reply parsed.
+    """
+    cached = _cached_reply(_llm_cache_key(llm, messages))
+    if cached is not None:
+        yield cached
+        return
+
+    async with _llm_semaphore():
+        limiter = _llm_rate_limiter()
+        if limiter is not None:
+            await limiter.acquire()
+        async for chunk in llm.astream(messages):
+            text = extract_text_from_content(getattr(chunk, "content", "") or "")
+            if text:
+                yield text
+
+
+# Rough upper bound on characters per token, used to encode only a prefix of a
+# large file, and as a chars-per-token ratio when no tokenizer is available.
+_MAX_CHARS_PER_TOKEN = 8
+_FALLBACK_CHARS_PER_TOKEN = 4
+
+
+# Set by load_token_encoding(). The first get_encoding() call may download the BPE
+# file, so it runs from a startup thread; until it succeeds the char budget is used.
+_TOKEN_ENCODING = None
+
+
+def load_token_encoding() -> bool:
+    """
+    Load the cl100k_base tokenizer for truncate_to_tokens. Blocking (may fetch the BPE
+    file over the network), so call it off the event loop. Returns False, leaving the
+    char-based fallback in place, when tiktoken or its BPE file is unavailable; a
+    failure is not remembered, so a later call can retry.
+    """
+    global _TOKEN_ENCODING
+    if _TOKEN_ENCODING is not None:
+        return True
+    # tiktoken ships with langchain-openai
+    try:
+        import tiktoken
+
+        _TOKEN_ENCODING = tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        logger.warning("tiktoken encoding unavailable; truncating prompts by characters")
+        return False
+    return True
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Prefix of text holding at most max_tokens tokens, so file snippets take the same
+    share of the prompt whatever script they are written in.
+    """
+    enc = _TOKEN_ENCODING
+    if enc is None:
+        return text[: max_tokens * _FALLBACK_CHARS_PER_TOKEN]
+    head = text[: max_tokens * _MAX_CHARS_PER_TOKEN]
+    tokens = enc.encode(head, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return head
+    return enc.decode(tokens[:max_tokens])
+
+
+# Last (tree, text) formatted. get_file_tree() hands out one shared, read-only tree
+# object until the sandbox changes, and planning/analysis format it on every LLM call
+# of a run, so an identity check is enough to reuse the text.
+_LAST_FORMATTED_TREE: tuple[Optional[Dict[str, Any]], str] = (None, "")
+
+
+def format_tree_for_prompt(tree: Dict[str, Any]) -> str:
+    """
+    Format file tree structure for LLM prompt: one indented line per node, in tree order.
+    A single walk with an explicit stack and one join, rather than re-joining every
+    subtree's text at each level of nesting.
+    """
+    global _LAST_FORMATTED_TREE
+    if not tree:
+        return ""
+    last_tree, last_text = _LAST_FORMATTED_TREE
+    if tree is last_tree:
+        return last_text
+    text = _format_tree(tree)
+    _LAST_FORMATTED_TREE = (tree, text)
+    return text
+
+
+def _format_tree(tree: Dict[str, Any]) -> str:
+    lines: list[str] = []
+    stack: list[tuple[Dict[str, Any], int]] = [(tree, 0)]
+    while stack:
+        node, indent = stack.pop()
+        if not node:
+            lines.append("")
+            continue
+        prefix = "  " * indent
+        name = node.get("name", "")
+        if node.get("type", "") == "folder":
+            lines.append(f"{prefix}📁 {name}/")
+            stack.extend((child, indent + 1) for child in reversed(node.get("children", [])))
+        else:
+            lines.append(f"{prefix}📄 {name}")
+    return "\n".join(lines)
+
+
+def _text_block_text(block: dict) -> str:
+    # Only explicit text content blocks carry text; metadata blobs are ignored
+    if block.get("type") == "text":
+        return block.get("text", "") or ""
+    return ""
+
+
+def _item_text(item) -> str:
+    # Slow path for list items outside the exact-type table (str/dict subclasses);
+    # non-text items (tool calls, images, ...) contribute nothing to the text stream.
+    if isinstance(item, str):
+        return item
+    if isinstance(item, dict):
+        return _text_block_text(item)
+    return ""
+
+
+_ITEM_EXTRACTORS = {
+    str: lambda item: item,
+    dict: _text_block_text,
+}
+
+
+def _list_content_text(content: list) -> str:
+    extractors = _ITEM_EXTRACTORS
+    return "".join(extractors.get(type(item), _item_text)(item) for item in content)
+
+
+# One dict lookup on the exact type instead of an isinstance chain per response.
+_CONTENT_EXTRACTORS = {
+    str: lambda content: content,
+    list: _list_content_text,
+    dict: _text_block_text,
+}
+
 
 def extract_text_from_content(content) -> str:
     """
@@ -38,28 +305,53 @@ def extract_text_from_content(content) -> str:
     - A list of strings or dicts like {'type': 'text', 'text': '...'}
     - A dict like {'type': 'text', 'text': '...'}
     """
+    extractor = _CONTENT_EXTRACTORS.get(type(content))
+    if extractor is not None:
+        return extractor(content)
     if isinstance(content, str):
         return content
-    elif isinstance(content, list):
-        text_parts = []
-        for item in content:
-            if isinstance(item, str):
-                text_parts.append(item)
-            elif isinstance(item, dict):
-                # Only extract from explicit text content blocks; ignore metadata blobs
-                if item.get("type") == "text":
-                    text = item.get("text", "")
-                    if text:
-                        text_parts.append(text)
-            # Ignore non-text items entirely to avoid polluting the text stream
-        return "".join(text_parts)
-    elif isinstance(content, dict):
-        # Single dict content block (ignore non-text dicts)
-        if content.get("type") == "text":
-            return content.get("text", "") or ""
-        return ""
-    else:
-        return str(content)
+    if isinstance(content, list):
+        return _list_content_text(content)
+    if isinstance(content, dict):
+        return _text_block_text(content)
+    return str(content)
+
+
+# Fenced ```json ... ``` block in one search: a closed block, else one left open by truncation.
+_CODE_BLOCK_RE = re.compile(
+    r"```(?:json)?\s*(?:(?P<closed>[\s\S]*?)\s*```|(?P<open>[\s\S]+)$)",
+    re.IGNORECASE | re.DOTALL,
+)
+# Only these characters affect brace matching; everything else is skipped in C.
+_BRACE_TOKENS = re.compile(r'[{}"\\]')
+_JSON_DECODER = json.JSONDecoder()
+
+
+def _find_object_end(text: str, start: int) -> int:
+    """
+    Index of the '}' that closes the '{' at text[start], ignoring braces inside
+    strings and backslash-escaped characters; -1 if it never closes.
+    """
+    depth = 0
+    in_string = False
+    escaped = -1
+    for m in _BRACE_TOKENS.finditer(text, start):
+        i = m.start()
+        if i == escaped:
+            continue
+        char = text[i]
+        if char == "\\":
+            escaped = i + 1
+        elif char == '"':
+            in_string = not in_string
+        elif not in_string:
+            if char == "{":
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return i
+    return -1
 
 
 def extract_json_from_response(text: str) -> Optional[dict]:
@@ -70,10 +362,14 @@ def extract_json_from_response(text: str) -> Optional[dict]:
     if not text:
         return None
     s = text.strip()
+    # Every path below needs an opening brace somewhere.
+    if "{" not in s:
+        return None
     
-    # Try parsing the entire string as JSON first
+    # Try parsing the entire string as JSON first (orjson raises a json.JSONDecodeError
+    # subclass carrying .pos, so the handlers below work unchanged)
     try:
-        obj = json.loads(s)
+        obj = orjson.loads(s)
         return obj if isinstance(obj, dict) else None
     except json.JSONDecodeError as e:
         # If JSON is incomplete, try to fix it
@@ -91,7 +387,7 @@ def extract_json_from_response(text: str) -> Optional[dict]:
                 if open_brackets > 0:
                     fixed += "\n" + "]" * open_brackets
                 
-                obj = json.loads(fixed)
+                obj = orjson.loads(fixed)
                 return obj if isinstance(obj, dict) else None
             except Exception:
                 pass
@@ -100,128 +396,68 @@ def extract_json_from_response(text: str) -> Optional[dict]:
 
     # Try fenced ```json ... ``` or ``` ... ```
     # First, extract the entire content of code blocks, then find JSON within
-    code_block_patterns = [
-        r"```(?:json)?\s*([\s\S]*?)\s*```",  # Complete code block with closing ```
-        r"```(?:json)?\s*([\s\S]+)$",  # Code block without closing ``` (incomplete)
-    ]
-    
-    for pattern in code_block_patterns:
-        m = re.search(pattern, s, flags=re.IGNORECASE | re.DOTALL)
-        if m:
-            code_content = m.group(1).strip()
+    m = _CODE_BLOCK_RE.search(s)
+    if m:
+        code_content = (m.group("closed") if m.lastgroup == "closed" else m.group("open")).strip()
+        
+        # If code content starts with {, try parsing the whole thing as JSON
+        if code_content.startswith("{"):
+            try:
+                obj = orjson.loads(code_content)
+                return obj if isinstance(obj, dict) else None
+            except json.JSONDecodeError:
+                # Try to fix incomplete JSON
+                try:
+                    open_braces = code_content.count("{") - code_content.count("}")
+                    open_brackets = code_content.count("[") - code_content.count("]")
+                    fixed = code_content
+                    if open_braces > 0:
+                        fixed += "\n" + "}" * open_braces
+                    if open_brackets > 0:
+                        fixed += "\n" + "]" * open_brackets
+                    obj = orjson.loads(fixed)
+                    return obj if isinstance(obj, dict) else None
+                except Exception:
+                    pass
+        
+        # Try to find JSON object in the code block content
+        # Look for the first { that starts a JSON object
+        json_start = code_content.find("{")
+        if json_start != -1:
+            # Use brace matching to find the complete JSON object
+            json_end = _find_object_end(code_content, json_start)
             
-            # If code content starts with {, try parsing the whole thing as JSON
-            if code_content.startswith("{"):
+            if json_end != -1:
+                json_str = code_content[json_start : json_end + 1]
+                # Try parsing as-is first
                 try:
-                    obj = json.loads(code_content)
+                    obj = orjson.loads(json_str)
                     return obj if isinstance(obj, dict) else None
                 except json.JSONDecodeError:
                     # Try to fix incomplete JSON
                     try:
-                        open_braces = code_content.count("{") - code_content.count("}")
-                        open_brackets = code_content.count("[") - code_content.count("]")
-                        fixed = code_content
+                        open_braces = json_str.count("{") - json_str.count("}")
+                        open_brackets = json_str.count("[") - json_str.count("]")
+                        fixed = json_str
                         if open_braces > 0:
                             fixed += "\n" + "}" * open_braces
                         if open_brackets > 0:
                             fixed += "\n" + "]" * open_brackets
-                        obj = json.loads(fixed)
+                        obj = orjson.loads(fixed)
                         return obj if isinstance(obj, dict) else None
                     except Exception:
                         pass
-            
-            # Try to find JSON object in the code block content
-            # Look for the first { that starts a JSON object
-            json_start = code_content.find("{")
-            if json_start != -1:
-                # Use brace matching to find the complete JSON object
-                brace_count = 0
-                in_string = False
-                escape_next = False
-                json_end = json_start
-                
-                for i in range(json_start, len(code_content)):
-                    char = code_content[i]
-                    
-                    if escape_next:
-                        escape_next = False
-                        continue
-                    
-                    if char == "\\":
-                        escape_next = True
-                        continue
-                    
-                    if char == '"' and not escape_next:
-                        in_string = not in_string
-                        continue
-                    
-                    if not in_string:
-                        if char == "{":
-                            brace_count += 1
-                        elif char == "}":
-                            brace_count -= 1
-                            if brace_count == 0:
-                                json_end = i
-                                break
-                
-                if json_end > json_start:
-                    json_str = code_content[json_start : json_end + 1]
-                    # Try parsing as-is first
-                    try:
-                        obj = json.loads(json_str)
-                        return obj if isinstance(obj, dict) else None
-                    except json.JSONDecodeError:
-                        # Try to fix incomplete JSON
-                        try:
-                            open_braces = json_str.count("{") - json_str.count("}")
-                            open_brackets = json_str.count("[") - json_str.count("]")
-                            fixed = json_str
-                            if open_braces > 0:
-                                fixed += "\n" + "}" * open_braces
-                            if open_brackets > 0:
-                                fixed += "\n" + "]" * open_brackets
-                            obj = json.loads(fixed)
-                            return obj if isinstance(obj, dict) else None
-                        except Exception:
-                            pass
 
     # Try to find JSON object by matching braces more carefully
     # This handles both code-blocked and raw JSON
     start = s.find("{")
     if start != -1:
-        brace_count = 0
-        end = start
-        in_string = False
-        escape_next = False
-        
-        for i in range(start, len(s)):
-            char = s[i]
-            
-            if escape_next:
-                escape_next = False
-                continue
-            
-            if char == "\\":
-                escape_next = True
-                continue
-            
-            if char == '"' and not escape_next:
-                in_string = not in_string
-                continue
-            
-            if not in_string:
-                if char == "{":
-                    brace_count += 1
-                elif char == "}":
-                    brace_count -= 1
-                    if brace_count == 0:
-                        end = i
-                        break
+        end = _find_object_end(s, start)
         
-        if end > start:
+        if end != -1:
             try:
                 json_str = s[start : end + 1]
-                obj = json.loads(json_str)
+                obj = orjson.loads(json_str)
                 return obj if isinstance(obj, dict) else None
             except json.JSONDecodeError as e:
                 # If incomplete, try to close it
@@ -233,43 +469,46 @@ def extract_json_from_response(text: str) -> Optional[dict]:
                         fixed += "\n" + "}" * open_braces
                     if open_brackets > 0:
                         fixed += "\n" + "]" * open_brackets
-                    obj = json.loads(fixed)
+                    obj = orjson.loads(fixed)
                     return obj if isinstance(obj, dict) else None
                 except Exception:
                     pass
             except Exception:
                 pass
     
-    # Last resort: scanning
-    for i, char in enumerate(s):
-        if char == "{":
-            brace_count = 0
-            for j in range(i, len(s)):
-                if s[j] == "{":
-                    brace_count += 1
-                elif s[j] == "}":
-                    brace_count -= 1
-                    if brace_count == 0:
-                        try:
-                            json_str = s[i : j + 1]
-                            obj = json.loads(json_str)
-                            return obj if isinstance(obj, dict) else None
-                        except json.JSONDecodeError:
-                            # Try to fix incomplete JSON
-                            try:
-                                open_braces = json_str.count("{") - json_str.count("}")
-                                open_brackets = json_str.count("[") - json_str.count("]")
-                                fixed = json_str
-                                if open_braces > 0:
-                                    fixed += "\n" + "}" * open_braces
-                                if open_brackets > 0:
-                                    fixed += "\n" + "]" * open_brackets
-                                obj = json.loads(fixed)
-                                return obj if isinstance(obj, dict) else None
-                            except Exception:
-                                break
-                        except Exception:
-                            break
-            break  # Only try the first opening brace
+    # Last resort: let the C scanner parse an object at each '{' in turn; it balances
+    # braces (and skips those inside strings) itself and stops at the object's end.
+    idx = s.find("{")
+    while idx != -1:
+        try:
+            obj, _ = _JSON_DECODER.raw_decode(s, idx)
+            return obj if isinstance(obj, dict) else None
+        except ValueError:
+            idx = s.find("{", idx + 1)
     
     return None
+
+
+def format_llm_json_error(content: str, what: str, preview_chars: int = 500) -> str:
+    """Error message for an LLM reply that held no usable JSON: a short preview plus the full length."""
+    return (
+        f"Failed to generate {what} from LLM. No valid JSON response received.\n"
+        f"Response preview (first {preview_chars} chars): {content[:preview_chars]!r}\n"
+        f"Full response length: {len(content)} chars"
+    )
+
+
+async def invoke_llm_json(llm: Any, messages: Any) -> tuple[str, Optional[dict]]:
+    """
+    Invoke llm and return (reply text, first JSON object in it or None). Replies that
+    held a JSON object are cached for identical requests (see cache_llm_reply).
+    """
+    content = _cached_reply(_llm_cache_key(llm, messages))
+    if content is not None:
+        return content, extract_json_from_response(content)
+    resp = await invoke_llm(llm, messages)
+    content = extract_text_from_content(getattr(resp, "content", "") or "")
+    obj = extract_json_from_response(content)
+    if obj is not None:
+        cache_llm_reply(llm, messages, content)
+    return content, obj
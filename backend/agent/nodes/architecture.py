@@ -204,8 +204,8 @@ async def write_code_node(state: AgentState) -> AgentState:
         else:
             merged.append({
                 "file": file,
-                "old_code": file_to_tool_diff[file].get("old_code", ""),
-                "new_code": file_to_llm_diff[file].get("new_code", ""),
+                "oldCode": file_to_tool_diff[file].get("oldCode", ""),
+                "newCode": file_to_llm_diff[file].get("newCode", ""),
             })
             
     for file in llm_files:
@@ -5,6 +5,9 @@ from agent.llm.analysis import analyze_context, analyze_imports, conduct_researc
 from services.sandbox_fs_service import read_text_file, get_file_tree
 from utils.helper_functions import _search_docs_wrapper
 
+# Sandbox file reads in flight at once in read_code_node
+_READ_CONCURRENCY = 16
+
 async def context_check_node(state: AgentState) -> AgentState:
     """
     Decide if we have enough information (code + docs) to proceed.
@@ -62,19 +65,26 @@ async def read_code_node(state: AgentState) -> AgentState:
     new_contents = current_files.copy()
     read_count = 0
     read_list = []
-    
-    for path in files_to_read:
-        # Avoid re-reading if we have it (unless we want to refresh?)
-        if path in new_contents:
-            continue
-            
-        try:
-            res = await read_text_file(path)
-            new_contents[res["path"]] = res["content"]
-            read_count += 1
-            read_list.append(res["path"])
-        except Exception:
+
+    # Avoid re-reading if we have it (unless we want to refresh?)
+    pending = [path for path in dict.fromkeys(files_to_read) if path not in new_contents]
+    # Each read runs in a worker thread; issue them together, bounded so a long file
+    # list doesn't take over the default thread pool.
+    semaphore = asyncio.Semaphore(_READ_CONCURRENCY)
+
+    async def read_one(path: str):
+        async with semaphore:
+            return await read_text_file(path)
+
+    results = await asyncio.gather(*(read_one(path) for path in pending), return_exceptions=True)
+    for res in results:
+        if isinstance(res, BaseException):
             continue # Skip if not found
+        if res["path"] in new_contents:
+            continue
+        new_contents[res["path"]] = res["content"]
+        read_count += 1
+        read_list.append(res["path"])
     
     log_msg = f"Read {read_count} new files: {', '.join(read_list)}" if read_count > 0 else "No new files found."
     
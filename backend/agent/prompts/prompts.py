@@ -1,5 +1,8 @@
 from __future__ import annotations
 from typing import Any, Dict, List
+
+import orjson
+
 from agent.state import Diff
 
 
@@ -8,6 +11,13 @@ def _messages(*parts: tuple[str, str]) -> List[Dict[str, str]]:
     return [{"role": role, "content": content} for role, content in parts]
 
 
+def _as_json(value: Any) -> str:
+    """Compact JSON for structured values embedded in prompts (instead of Python repr)."""
+    if isinstance(value, str):
+        return value
+    return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
 def build_planner_prompt(prompt: str, docs_context: str, codebase_context: str) -> List[Dict[str, str]]:
     system = """
 You are an expert senior engineer specializing in integrating Node.js SDKs with existing applications. 
@@ -121,8 +131,8 @@ Focus on whether:
         f"Prompt:\n{prompt}\n\n"
         "Codebase context:\n"
         f"{code_context}\n\n"
-        "Session memory:\n"
-        f"{memory}\n\n"
+        "Session memory (JSON):\n"
+        f"{_as_json(memory)}\n\n"
         "Generate JSON now."
     )
 
@@ -240,8 +250,8 @@ def build_fix_plan_prompt(error_analysis: Dict[str, Any], file_context: str) ->
         "Only propose changes that address the root cause. No additional keys. No surrounding text."
     )
     user = (
-        "Error analysis (from previous step):\n"
-        f"{error_analysis}\n\n"
+        "Error analysis from previous step (JSON):\n"
+        f"{_as_json(error_analysis)}\n\n"
         "Relevant files (current content):\n"
         f"{file_context}\n\n"
         "Propose fixes as JSON with 'diffs' array."
@@ -1,12 +1,14 @@
 from __future__ import annotations
+from functools import lru_cache, partial
 from typing import Any, AsyncIterator, Dict, List
-import json
 import hashlib
+import logging
 
+import orjson
 from langgraph.types import Command
 
 from agent.graph import app_graph
-from services.pending_diff_service import set_pending_diff
+from services.pending_diff_service import set_pending_diffs_bulk
 from services.sandbox_fs_service import get_file_tree, require_root
 from utils.logger import get_logger
 
@@ -34,19 +36,120 @@ READ_ONLY_NODES = {
     "yellow_deposit",
 }
 
+# Thought shown when a node starts
+_NODE_THOUGHTS: Dict[str, str] = {
+    "context_check": "Analyzing context and requirements...",
+    "read_code": "Reading codebase files...",
+    "analyze_imports": "Analyzing project dependencies...",
+    "retrieve_docs": "Searching documentation...",
+    "research": "Researching implementation details...",
+    "architect": "Designing integration plan and detecting Yellow requirements...",
+    "yellow_init": "Initializing Yellow SDK in project...",
+    "yellow_workflow": "Running Yellow network workflow...",
+    "yellow_multiparty": "Setting up multiparty Yellow workflow...",
+    "yellow_versioned": "Creating versioned integration layer...",
+    "yellow_tip": "Injecting tipping utility...",
+    "yellow_deposit": "Injecting deposit utility...",
+    "write_code": "Generating code changes...",
+    "coding": "Verifying code syntax and logic...",
+    "build": "Running build and tests...",
+    "error_analysis": "Analyzing build errors...",
+    "fix_plan": "Planning fixes for errors...",
+    "summary": "Generating final summary...",
+}
+# After HITL approval only the coding/build/fix loop gets these thoughts
+_RESUME_THOUGHT_NODES = frozenset({"coding", "build", "error_analysis", "fix_plan", "summary"})
+
 # Last run id passed to run_agent (so apply/resume can use it when client omits runId)
 _LAST_AGENT_RUN_ID: str | None = None
 
 
+# An event dict or its pre-encoded JSON; a list of them is sent in one write.
+AgentEvent = Dict[str, Any] | bytes | List[Dict[str, Any] | bytes]
+
+
+@lru_cache(maxsize=512)
+def _node_event_json(event_type: str, runId: str, name: str) -> bytes:
+    """
+    JSON of a tool_start / tool_end frame. These only vary by run and node, and nodes
+    repeat across the fix loop, so each is encoded once and reused.
+    """
+    event = {"type": event_type, "runId": runId, "name": name}
+    if event_type == "tool_end":
+        event["status"] = "success"
+    return orjson.dumps(event)
+
+
+@lru_cache(maxsize=512)
+def _thought_json(runId: str, content: str) -> bytes:
+    """JSON of a thought frame with fixed text (node thoughts, status lines)."""
+    return orjson.dumps({"type": "thought", "runId": runId, "content": content})
+
+
+def _proposed_file_event(runId: str, file: str, content: str) -> Dict[str, Any]:
+    return {"type": "proposed_file", "runId": runId, "path": file, "content": content}
+
+
+def _diff_event(runId: str, file: str, oldCode: str, newCode: str) -> Dict[str, Any]:
+    # Back-compat: the old diff payload, emitted alongside proposed_file.
+    return {"type": "diff", "runId": runId, "file": file, "oldCode": oldCode, "newCode": newCode}
+
+
+# Graph stream at node granularity: state deltas plus debug task start/result events
+_astream_nodes = partial(app_graph.astream, stream_mode=["updates", "debug"])
+
+
+async def _node_events(stream_input: Any, config: Dict[str, Any]) -> AsyncIterator[tuple[str, str, Any]]:
+    """
+    Stream the graph at node granularity as (event_type, node name, data):
+    "node_start" / "node_end" from the debug task events, and "node_update" with the
+    node's state delta as data.
+
+    Uses astream(stream_mode=["updates", "debug"]) rather than astream_events, which
+    also traces every nested runnable and model call only for the runner to drop them.
+    """
+    async for mode, payload in _astream_nodes(stream_input, config=config):
+        if mode == "updates":
+            for name, update in payload.items():
+                # Skip graph bookkeeping such as "__interrupt__"
+                if not name.startswith("__"):
+                    yield "node_update", name, update
+            continue
+        task = payload.get("payload") or {}
+        name = task.get("name")
+        if not isinstance(name, str) or name.startswith("__"):
+            continue
+        if payload.get("type") == "task":
+            yield "node_start", name, None
+        elif payload.get("type") == "task_result":
+            yield "node_end", name, None
+
+
+def _print_state(config: Dict[str, Any], runId: str, name: str, title: str) -> None:
+    """Print the run's checkpointed state to the terminal under a banner."""
+    try:
+        snapshot = app_graph.get_state(config)
+        state_values = snapshot.values or {}
+        print("\n" + "="*80)
+        print(f"{title}: {name}")
+        print("="*80)
+        print(orjson.dumps(state_values, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS, default=str).decode())
+        print("="*80 + "\n")
+    except Exception as e:
+        logger.exception("Failed to print state", extra={"run_id": runId, "node": name})
+        print(f"\n[ERROR] Failed to print state for node {name}: {str(e)}\n")
+
+
 def get_last_agent_run_id() -> str | None:
     """Return the run id of the most recent agent stream (for apply/resume when client omits runId)."""
     return _LAST_AGENT_RUN_ID
 
 
-async def run_agent(runId: str, prompt: str) -> AsyncIterator[Dict[str, Any]]:
+async def run_agent(runId: str, prompt: str) -> AsyncIterator[AgentEvent]:
     """
     Minimal runner that emits frontend-compatible SSE events.
-    Backed by LangGraph workflow.
+    Backed by LangGraph workflow. Events produced together (e.g. tool_start and its
+    thought) are yielded as one list so the route can send them in a single write.
     """
     global _LAST_AGENT_RUN_ID
     _LAST_AGENT_RUN_ID = runId
@@ -54,16 +157,23 @@ async def run_agent(runId: str, prompt: str) -> AsyncIterator[Dict[str, Any]]:
         "run_agent started",
         extra={"run_id": runId, "prompt_length": len(prompt), "prompt_preview": prompt[:200]},
     )
-    yield {"type": "run_started", "runId": runId, "prompt": prompt}
-    yield {"type": "thought", "runId": runId, "content": "Starting Yellow agent..."}
+    yield [
+        {"type": "run_started", "runId": runId, "prompt": prompt},
+        _thought_json(runId, "Starting Yellow agent..."),
+    ]
 
     # Stream node lifecycle + state deltas from LangGraph.
     # We translate those into the SSEEvent schema the frontend understands.
     proposed_files: list[str] = []
-    graph_completed = False
     
-    # Track which files have been sent and tree state to avoid duplicate events
-    sent_file_contents: dict[str, str] = {}
+    # Track which files have been sent and tree state to avoid duplicate events.
+    # Content is remembered by hash (str hashes are cached on the object, so an
+    # unchanged string re-sent by the next node costs nothing to check) rather than by
+    # holding on to every version of every file.
+    sent_file_contents: dict[str, int] = {}
+    # file -> hash((oldCode, newCode)) last emitted; nodes hand back the whole diffs
+    # list in every update, so only diffs not yet seen are stored and sent.
+    sent_diffs: dict[str, int] = {}
     last_tree_hash: str | None = None
 
     try:
@@ -91,145 +201,53 @@ async def run_agent(runId: str, prompt: str) -> AsyncIterator[Dict[str, Any]]:
             initial_state["repo_path"] = ""
 
         config = {"configurable": {"thread_id": runId}}
-        async for ev in app_graph.astream_events(
-            initial_state, config=config, version="v2"
-        ):
-            name = ev.get("name")
-            event_type = ev.get("event")
-            data = ev.get("data") or {}
+        _debug_enabled = logger.isEnabledFor(logging.DEBUG)
+        async for event_type, name, data in _node_events(initial_state, config):
+            # Per-event logging: only build the extra dict when DEBUG is actually on.
+            if _debug_enabled:
+                logger.debug(
+                    "LangGraph event received",
+                    extra={"run_id": runId, "event_type": event_type, "node_name": name},
+                )
 
-            logger.debug(
-                "LangGraph event received",
-                extra={"run_id": runId, "event_type": event_type, "node_name": name},
-            )
+            # Node lifecycle => tool events
+            if event_type == "node_start":
+                # tool_start and its thought go out as one batch (one SSE write)
+                events: List[Dict[str, Any] | bytes] = [_node_event_json("tool_start", runId, name)]
 
-            # Check for graph completion
-            if event_type == "on_chain_end" and name == "LangGraph":
-                graph_completed = True
-                logger.debug("LangGraph chain completed", extra={"run_id": runId})
+                # Context-aware thought for the node, if it has one
+                thought = _NODE_THOUGHTS.get(name)
+                if thought:
+                    events.append(_thought_json(runId, thought))
+                yield events
 
-            # Node lifecycle => tool events
-            if event_type == "on_chain_start" and name not in (None, "LangGraph"):
-                yield {"type": "tool_start", "runId": runId, "name": name}
-
-                # Context-aware thoughts
-                if name == "context_check":
-                    yield {"type": "thought", "runId": runId, "content": "Analyzing context and requirements..."}
-                elif name == "read_code":
-                    yield {"type": "thought", "runId": runId, "content": "Reading codebase files..."}
-                elif name == "analyze_imports":
-                    yield {"type": "thought", "runId": runId, "content": "Analyzing project dependencies..."}
-                elif name == "retrieve_docs":
-                    yield {"type": "thought", "runId": runId, "content": "Searching documentation..."}
-                elif name == "research":
-                    yield {"type": "thought", "runId": runId, "content": "Researching implementation details..."}
-                elif name == "architect":
-                    yield {"type": "thought", "runId": runId, "content": "Designing integration plan and detecting Yellow requirements..."}
-                elif name == "yellow_init":
-                    yield {"type": "thought", "runId": runId, "content": "Initializing Yellow SDK in project..."}
-                elif name == "yellow_workflow":
-                    yield {"type": "thought", "runId": runId, "content": "Running Yellow network workflow..."}
-                elif name == "yellow_multiparty":
-                    yield {"type": "thought", "runId": runId, "content": "Setting up multiparty Yellow workflow..."}
-                elif name == "yellow_versioned":
-                    yield {"type": "thought", "runId": runId, "content": "Creating versioned integration layer..."}
-                elif name == "yellow_tip":
-                    yield {"type": "thought", "runId": runId, "content": "Injecting tipping utility..."}
-                elif name == "yellow_deposit":
-                    yield {"type": "thought", "runId": runId, "content": "Injecting deposit utility..."}
-                elif name == "write_code":
-                    yield {"type": "thought", "runId": runId, "content": "Generating code changes..."}
-                elif name == "coding":
-                    yield {"type": "thought", "runId": runId, "content": "Verifying code syntax and logic..."}
-                elif name == "build":
-                    yield {"type": "thought", "runId": runId, "content": "Running build and tests..."}
-                elif name == "error_analysis":
-                    yield {"type": "thought", "runId": runId, "content": "Analyzing build errors..."}
-                elif name == "fix_plan":
-                    yield {"type": "thought", "runId": runId, "content": "Planning fixes for errors..."}
-                elif name == "summary":
-                    yield {"type": "thought", "runId": runId, "content": "Generating final summary..."}
-
-            if event_type == "on_chain_end" and name not in (None, "LangGraph"):
+            elif event_type == "node_end":
                 logger.debug(
                     "Tool finished",
                     extra={"run_id": runId, "name": name},
                 )
-                yield {"type": "tool_end", "runId": runId, "name": name, "status": "success"}
+                yield _node_event_json("tool_end", runId, name)
                 
-                # Print state to terminal after each node completes
-                try:
-                    snapshot = app_graph.get_state(config)
-                    state_values = snapshot.values or {}
-                    
-                    # Format state for terminal output
-                    print("\n" + "="*80)
-                    print(f"STATE AFTER NODE: {name}")
-                    print("="*80)
-                    print(json.dumps(state_values, indent=2, default=str))
-                    print("="*80 + "\n")
-                except Exception as e:
-                    logger.exception("Failed to print state after node", extra={"run_id": runId, "node": name})
-                    print(f"\n[ERROR] Failed to print state after node {name}: {str(e)}\n")
-
-            # Handle custom events emitted by nodes (e.g. build output, awaiting approval)
-            if event_type == "on_custom_event":
-                event_name = ev.get("name")
-                event_data = data
-
-                logger.debug(
-                    "Custom event received",
-                    extra={"run_id": runId, "event_name": event_name},
-                )
-
-                if event_name == "terminal_output":
-                    # Stream terminal output
-                    yield {"type": "terminal", "runId": runId, "line": event_data.get("data", "")}
-
-                elif event_name == "build_status":
-                    # Stream build lifecycle
-                    yield {
-                        "type": "build",
-                        "runId": runId,
-                        "status": event_data.get("status"),
-                        "data": event_data.get("data"),
-                    }
-
-                elif event_name == "awaiting_approval":
-                    # HITL pause
-                    files = event_data.get("files", [])
-                    logger.debug(
-                        "Awaiting user approval for files",
-                        extra={"run_id": runId, "files": files},
-                    )
-                    yield {"type": "awaiting_user_review", "runId": runId, "files": files}
-                    yield {"type": "thought", "runId": runId, "content": "Waiting for user approval..."}
+                # Dump the full state to the terminal (debug only: a checkpoint read plus a
+                # full JSON dump per node event)
+                if _debug_enabled:
+                    _print_state(config, runId, name, "STATE AFTER NODE")
 
             # Streamed state chunks
-            if event_type == "on_chain_stream" and name not in (None, "LangGraph"):
-                chunk = data.get("chunk") or {}
+            elif event_type == "node_update":
+                chunk = data
                 if not isinstance(chunk, dict):
                     continue
 
-                # Print state update to terminal after each state change
-                try:
-                    snapshot = app_graph.get_state(config)
-                    state_values = snapshot.values or {}
-                    
-                    # Format state for terminal output
-                    print("\n" + "="*80)
-                    print(f"STATE UPDATE AFTER NODE: {name}")
-                    print("="*80)
-                    print(json.dumps(state_values, indent=2, default=str))
-                    print("="*80 + "\n")
-                except Exception as e:
-                    logger.exception("Failed to print state update", extra={"run_id": runId, "node": name})
-                    print(f"\n[ERROR] Failed to print state update for node {name}: {str(e)}\n")
+                # Dump the full state to the terminal (debug only: a checkpoint read plus a
+                # full JSON dump per node event)
+                if _debug_enabled:
+                    _print_state(config, runId, name, "STATE UPDATE AFTER NODE")
 
                 # Only emit file_tree if it actually changed
                 if "tree" in chunk:
-                    tree_str = json.dumps(chunk["tree"], sort_keys=True)
-                    tree_hash = hashlib.md5(tree_str.encode()).hexdigest()
+                    tree_json = orjson.dumps(chunk["tree"], option=orjson.OPT_SORT_KEYS)
+                    tree_hash = hashlib.md5(tree_json).hexdigest()
                     if tree_hash != last_tree_hash:
                         logger.debug("State update: tree (changed)", extra={"run_id": runId})
                         yield {"type": "file_tree", "runId": runId, "tree": chunk["tree"]}
@@ -245,9 +263,10 @@ async def run_agent(runId: str, prompt: str) -> AsyncIterator[Dict[str, Any]]:
                         for path, content in chunk["file_contents"].items():
                             if isinstance(path, str) and isinstance(content, str):
                                 # Only emit if this is a new file or content changed
-                                if path not in sent_file_contents or sent_file_contents[path] != content:
+                                content_hash = hash(content)
+                                if sent_file_contents.get(path) != content_hash:
                                     yield {"type": "file_content", "runId": runId, "path": path, "content": content}
-                                    sent_file_contents[path] = content
+                                    sent_file_contents[path] = content_hash
                                     new_or_changed.append(path)
                         
                         if new_or_changed:
@@ -259,7 +278,7 @@ async def run_agent(runId: str, prompt: str) -> AsyncIterator[Dict[str, Any]]:
                         # For read-only nodes, just track the files internally without emitting events
                         for path, content in chunk["file_contents"].items():
                             if isinstance(path, str) and isinstance(content, str):
-                                sent_file_contents[path] = content
+                                sent_file_contents[path] = hash(content)
 
                 # Handle diffs
                 if "diffs" in chunk and isinstance(chunk["diffs"], list):
@@ -267,6 +286,7 @@ async def run_agent(runId: str, prompt: str) -> AsyncIterator[Dict[str, Any]]:
                         "State update: diffs",
                         extra={"run_id": runId, "diff_count": len(chunk["diffs"])},
                     )
+                    valid_diffs = []
                     for d in chunk["diffs"]:
                         if not isinstance(d, dict):
                             continue
@@ -277,13 +297,18 @@ async def run_agent(runId: str, prompt: str) -> AsyncIterator[Dict[str, Any]]:
                             continue
                         if not isinstance(oldCode, str) or not isinstance(newCode, str):
                             continue
+                        diff_hash = hash((oldCode, newCode))
+                        if sent_diffs.get(file) == diff_hash:
+                            continue
+                        sent_diffs[file] = diff_hash
+                        valid_diffs.append((file, oldCode, newCode))
 
-                        # Store for approval/apply endpoints
-                        await set_pending_diff(runId, file, oldCode, newCode)
+                    # Store for approval/apply endpoints, the whole chunk in one update
+                    if valid_diffs:
+                        await set_pending_diffs_bulk(runId, valid_diffs)
+                    for file, oldCode, newCode in valid_diffs:
                         proposed_files.append(file)
-                        yield {"type": "proposed_file", "runId": runId, "path": file, "content": newCode}
-                        # Back-compat: emit the old diff payload too.
-                        yield {"type": "diff", "runId": runId, "file": file, "oldCode": oldCode, "newCode": newCode}
+                        yield [_proposed_file_event(runId, file, newCode), _diff_event(runId, file, oldCode, newCode)]
 
                 # Handle pending approval files
                 if "pending_approval_files" in chunk and chunk.get("awaiting_approval"):
@@ -329,39 +354,40 @@ async def run_agent(runId: str, prompt: str) -> AsyncIterator[Dict[str, Any]]:
         yield {"type": "run_finished", "runId": runId}
         return
 
-    # If graph ended without completing, check for HITL interrupt at await_approval
-    if not graph_completed:
-        try:
-            config = {"configurable": {"thread_id": runId}}
-            snapshot = app_graph.get_state(config)
-            next_nodes = getattr(snapshot, "next", ()) or ()
-            if next_nodes and "await_approval" in next_nodes:
-                values = snapshot.values or {}
-                diffs = values.get("diffs", [])
-                files = [d.get("file", "") for d in diffs if isinstance(d, dict) and d.get("file")]
-                if files:
-                    logger.debug(
-                        "Graph interrupted at await_approval, emitting awaiting_user_review",
-                        extra={"run_id": runId, "files": files},
-                    )
-                    yield {"type": "awaiting_user_review", "runId": runId, "files": files}
-                    yield {"type": "thought", "runId": runId, "content": "Waiting for user approval..."}
-                    # Signal paused for HITL so frontend keeps activeRunId for resume
-                    yield {"type": "run_finished", "runId": runId, "interrupted": True}
-                    return
-        except Exception:
-            logger.exception("Failed to check interrupt state", extra={"run_id": runId})
+    # If the graph stopped with nodes still pending, check for HITL interrupt at await_approval
+    try:
+        config = {"configurable": {"thread_id": runId}}
+        snapshot = app_graph.get_state(config)
+        next_nodes = getattr(snapshot, "next", ()) or ()
+        if next_nodes and "await_approval" in next_nodes:
+            values = snapshot.values or {}
+            diffs = values.get("diffs", [])
+            files = [d.get("file", "") for d in diffs if isinstance(d, dict) and d.get("file")]
+            if files:
+                logger.debug(
+                    "Graph interrupted at await_approval, emitting awaiting_user_review",
+                    extra={"run_id": runId, "files": files},
+                )
+                yield [
+                    {"type": "awaiting_user_review", "runId": runId, "files": files},
+                    _thought_json(runId, "Waiting for user approval..."),
+                ]
+                # Signal paused for HITL so frontend keeps activeRunId for resume
+                yield {"type": "run_finished", "runId": runId, "interrupted": True}
+                return
+    except Exception:
+        logger.exception("Failed to check interrupt state", extra={"run_id": runId})
 
     logger.debug(
         "run_agent finished",
-        extra={"run_id": runId, "graph_completed": graph_completed, "proposed_files": proposed_files},
+        extra={"run_id": runId, "proposed_files": proposed_files},
     )
     yield {"type": "run_finished", "runId": runId}
 
 
 async def resume_agent(
     runId: str, approved: bool, approved_files: List[str]
-) -> AsyncIterator[Dict[str, Any]]:
+) -> AsyncIterator[AgentEvent]:
     """
     Resume the graph after HITL approval. Uses checkpoint state + resume_from_approval
     so the entry router sends the run to coding → build → ... (no interrupt resume).
@@ -370,13 +396,14 @@ async def resume_agent(
         "resume_agent started",
         extra={"run_id": runId, "approved": approved, "approved_files_count": len(approved_files)},
     )
-    yield {"type": "thought", "runId": runId, "content": "Resuming after user approval..."}
+    yield _thought_json(runId, "Resuming after user approval...")
 
     config = {"configurable": {"thread_id": runId}}
+    _debug_enabled = logger.isEnabledFor(logging.DEBUG)
     
-    # Track tree and file contents to avoid duplicate events
+    # Track tree and file contents (by hash) to avoid duplicate events
     last_tree_hash: str | None = None
-    sent_file_contents: dict[str, str] = {}
+    sent_file_contents: dict[str, int] = {}
 
     try:
         # Load checkpoint state from the interrupted run, then continue from coding
@@ -386,7 +413,7 @@ async def resume_agent(
             resume_value = {"approved": approved, "approved_files": approved_files}
             stream_input = Command(resume=resume_value)
         else:
-            # Merge approval into checkpoint state and run from entry (resume_router → coding)
+            # Merge approval into checkpoint state and run from entry (route_resume → coding)
             values = dict(snapshot.values)
             values["resume_from_approval"] = True
             values["approved"] = approved
@@ -395,80 +422,35 @@ async def resume_agent(
             values["pending_approval_files"] = []
             stream_input = values
 
-        async for ev in app_graph.astream_events(
-            stream_input, config=config, version="v2"
-        ):
-            name = ev.get("name")
-            event_type = ev.get("event")
-            data = ev.get("data") or {}
-
-            if event_type == "on_chain_start" and name not in (None, "LangGraph"):
-                yield {"type": "tool_start", "runId": runId, "name": name}
-                if name == "coding":
-                    yield {"type": "thought", "runId": runId, "content": "Verifying code syntax and logic..."}
-                elif name == "build":
-                    yield {"type": "thought", "runId": runId, "content": "Running build and tests..."}
-                elif name == "error_analysis":
-                    yield {"type": "thought", "runId": runId, "content": "Analyzing build errors..."}
-                elif name == "fix_plan":
-                    yield {"type": "thought", "runId": runId, "content": "Planning fixes for errors..."}
-                elif name == "summary":
-                    yield {"type": "thought", "runId": runId, "content": "Generating final summary..."}
-
-            if event_type == "on_chain_end" and name not in (None, "LangGraph"):
-                yield {"type": "tool_end", "runId": runId, "name": name, "status": "success"}
+        async for event_type, name, data in _node_events(stream_input, config):
+            if event_type == "node_start":
+                events: List[Dict[str, Any] | bytes] = [_node_event_json("tool_start", runId, name)]
+                if name in _RESUME_THOUGHT_NODES:
+                    events.append(_thought_json(runId, _NODE_THOUGHTS[name]))
+                yield events
+
+            elif event_type == "node_end":
+                yield _node_event_json("tool_end", runId, name)
                 
-                # Print state to terminal after each node completes
-                try:
-                    snapshot = app_graph.get_state(config)
-                    state_values = snapshot.values or {}
-                    
-                    # Format state for terminal output
-                    print("\n" + "="*80)
-                    print(f"STATE AFTER NODE: {name}")
-                    print("="*80)
-                    print(json.dumps(state_values, indent=2, default=str))
-                    print("="*80 + "\n")
-                except Exception as e:
-                    logger.exception("Failed to print state after node", extra={"run_id": runId, "node": name})
-                    print(f"\n[ERROR] Failed to print state after node {name}: {str(e)}\n")
-
-            if event_type == "on_custom_event":
-                event_data = data
-                if ev.get("name") == "terminal_output":
-                    yield {"type": "terminal", "runId": runId, "line": event_data.get("data", "")}
-                elif ev.get("name") == "build_status":
-                    yield {
-                        "type": "build",
-                        "runId": runId,
-                        "status": event_data.get("status"),
-                        "data": event_data.get("data"),
-                    }
+                # Dump the full state to the terminal (debug only: a checkpoint read plus a
+                # full JSON dump per node event)
+                if _debug_enabled:
+                    _print_state(config, runId, name, "STATE AFTER NODE")
 
-            if event_type == "on_chain_stream" and name not in (None, "LangGraph"):
-                chunk = data.get("chunk") or {}
+            elif event_type == "node_update":
+                chunk = data
                 if not isinstance(chunk, dict):
                     continue
 
-                # Print state update to terminal after each state change
-                try:
-                    snapshot = app_graph.get_state(config)
-                    state_values = snapshot.values or {}
-                    
-                    # Format state for terminal output
-                    print("\n" + "="*80)
-                    print(f"STATE UPDATE AFTER NODE: {name}")
-                    print("="*80)
-                    print(json.dumps(state_values, indent=2, default=str))
-                    print("="*80 + "\n")
-                except Exception as e:
-                    logger.exception("Failed to print state update", extra={"run_id": runId, "node": name})
-                    print(f"\n[ERROR] Failed to print state update for node {name}: {str(e)}\n")
+                # Dump the full state to the terminal (debug only: a checkpoint read plus a
+                # full JSON dump per node event)
+                if _debug_enabled:
+                    _print_state(config, runId, name, "STATE UPDATE AFTER NODE")
 
                 # Only emit file_tree if it actually changed
                 if "tree" in chunk:
-                    tree_str = json.dumps(chunk["tree"], sort_keys=True)
-                    tree_hash = hashlib.md5(tree_str.encode()).hexdigest()
+                    tree_json = orjson.dumps(chunk["tree"], option=orjson.OPT_SORT_KEYS)
+                    tree_hash = hashlib.md5(tree_json).hexdigest()
                     if tree_hash != last_tree_hash:
                         yield {"type": "file_tree", "runId": runId, "tree": chunk["tree"]}
                         last_tree_hash = tree_hash
@@ -480,9 +462,10 @@ async def resume_agent(
                     for path, content in chunk["file_contents"].items():
                         if isinstance(path, str) and isinstance(content, str):
                             # Only emit if this is a new file or content changed
-                            if path not in sent_file_contents or sent_file_contents[path] != content:
+                            content_hash = hash(content)
+                            if sent_file_contents.get(path) != content_hash:
                                 yield {"type": "file_content", "runId": runId, "path": path, "content": content}
-                                sent_file_contents[path] = content
+                                sent_file_contents[path] = content_hash
                                 new_or_changed.append(path)
                     
                     if new_or_changed:
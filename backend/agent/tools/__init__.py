@@ -1,5 +1,27 @@
 """Agent tools for the Yellow Network SDK integration agent."""
 
-from agent.tools.vector_store import YellowVectorStore
+from __future__ import annotations
+
+import importlib
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from agent.tools.vector_store import YellowVectorStore
+
+# Re-exports resolved on first access, so importing a light submodule (e.g.
+# agent.tools.command_executor or the Yellow tools) doesn't pull in Chroma,
+# LangChain and the embedding clients through this package.
+_LAZY_EXPORTS = {
+    "YellowVectorStore": "agent.tools.vector_store",
+}
 
 __all__ = ["YellowVectorStore"]
+
+
+def __getattr__(name: str) -> Any:
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value  # cache: later lookups skip __getattr__
+    return value
@@ -1,9 +1,15 @@
 from __future__ import annotations
 
+import functools
+import hashlib
 import os
+import threading
+import time
 from typing import List, Optional
 from pathlib import Path
 
+import numpy as np
+import orjson
 from langchain_core.documents import Document
 from langchain_chroma import Chroma
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
@@ -11,6 +17,32 @@ from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from config import settings
 
 
+# Inputs sent per /embeddings request; the OpenAI-compatible endpoint takes a list.
+_EMBED_BATCH_SIZE = 128
+
+
+def document_id(page_content: str) -> str:
+    """Stable Chroma id for a chunk: a 64-bit hash of its text, so identical chunks share one id."""
+    return hashlib.blake2b(page_content.encode("utf-8"), digest_size=8).hexdigest()
+
+@functools.lru_cache(maxsize=None)
+def _http_session():
+    """Shared requests session: keeps the TLS connection alive and retries 429/5xx."""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"POST"}),
+    )
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=8, pool_maxsize=32, max_retries=retry))
+    return session
+
+
 class OpenRouterEmbeddings:
     """Custom embedding class that uses OpenRouter API for embeddings."""
     
@@ -24,8 +56,6 @@ class OpenRouterEmbeddings:
                    - text-embedding-3-large (3072 dims)
                    - text-embedding-ada-002 (1536 dims)
         """
-        import requests
-        
         self.api_key = settings.OPENROUTER_API_KEY
         if not self.api_key:
             raise ValueError("OPENROUTER_API_KEY is not set")
@@ -38,9 +68,7 @@ class OpenRouterEmbeddings:
         return self.embed_documents([text])[0]
     
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        """Embed multiple documents."""
-        import requests
-        
+        """Embed multiple documents, sending up to _EMBED_BATCH_SIZE texts per request."""
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
@@ -50,23 +78,82 @@ class OpenRouterEmbeddings:
         
         # OpenRouter uses OpenAI-compatible endpoint
         url = f"{self.base_url}/embeddings"
+        session = _http_session()
         
         embeddings = []
-        for text in texts:
+        for start in range(0, len(texts), _EMBED_BATCH_SIZE):
             payload = {
                 "model": self.model,
-                "input": text,
+                "input": texts[start:start + _EMBED_BATCH_SIZE],
             }
             
-            response = requests.post(url, headers=headers, json=payload)
+            response = session.post(url, headers=headers, json=payload)
             response.raise_for_status()
             
-            data = response.json()
-            embeddings.append(data["data"][0]["embedding"])
+            # Results carry their input index; don't rely on response order.
+            data = sorted(orjson.loads(response.content)["data"], key=lambda d: d["index"])
+            embeddings.extend(d["embedding"] for d in data)
         
         return embeddings
 
 
+class _SemanticSearchCache:
+    """
+    Recent search results keyed by their unit-norm query embedding.
+
+    A lookup is one matrix-vector product over the cached embeddings; the closest entry
+    with the same search params is returned if its cosine similarity clears the
+    threshold. Entries expire after ttl seconds and the oldest is dropped past
+    max_entries. Locked because searches run in worker threads.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, threshold: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._matrix: Optional[np.ndarray] = None  # (N, dim) float32, row i = entry i
+        self._entries: List[tuple[float, tuple, str]] = []  # (created_at, params, result)
+
+    def get(self, vector: np.ndarray, params: tuple) -> Optional[str]:
+        with self._lock:
+            self._expire(time.monotonic())
+            if not self._entries or self._matrix.shape[1] != vector.shape[0]:
+                return None
+            similarities = self._matrix @ vector
+            for i in np.argsort(similarities)[::-1]:
+                if similarities[i] <= self.threshold:
+                    break
+                if self._entries[i][1] == params:
+                    return self._entries[i][2]
+            return None
+
+    def put(self, vector: np.ndarray, params: tuple, result: str) -> None:
+        with self._lock:
+            if self._matrix is not None and self._matrix.shape[1] != vector.shape[0]:
+                self._matrix, self._entries = None, []
+            row = vector[np.newaxis, :]
+            self._matrix = row if self._matrix is None else np.vstack((self._matrix, row))
+            self._entries.append((time.monotonic(), params, result))
+            overflow = len(self._entries) - self.max_entries
+            if overflow > 0:
+                self._drop_oldest(overflow)
+
+    def _expire(self, now: float) -> None:
+        # Entries are appended in time order, so expired ones form a prefix.
+        expired = 0
+        for created_at, _, _ in self._entries:
+            if now - created_at < self.ttl:
+                break
+            expired += 1
+        if expired:
+            self._drop_oldest(expired)
+
+    def _drop_oldest(self, count: int) -> None:
+        del self._entries[:count]
+        self._matrix = np.ascontiguousarray(self._matrix[count:]) if self._entries else None
+
+
 class YellowVectorStore:
     def __init__(self, use_openrouter: bool = True):
         """
@@ -106,6 +193,44 @@ class YellowVectorStore:
             persist_directory=self.persist_directory,
         )
 
+        self._search_cache = (
+            _SemanticSearchCache(
+                max_entries=settings.DOCS_SEARCH_CACHE_SIZE,
+                ttl=settings.DOCS_SEARCH_CACHE_TTL_SECONDS,
+                threshold=settings.DOCS_SEARCH_CACHE_SIMILARITY,
+            )
+            if settings.DOCS_SEARCH_CACHE_SIZE > 0
+            else None
+        )
+
+    def warmup(self) -> None:
+        """
+        Pay Chroma's cold-start cost up front: hint the kernel to read the persisted
+        SQLite/HNSW files ahead (POSIX_FADV_WILLNEED, where supported), then run one
+        throwaway query so the index is loaded before the first real search.
+        """
+        fadvise = getattr(os, "posix_fadvise", None)  # not available on macOS
+        if fadvise is not None:
+            for dir_path, _, file_names in os.walk(self.persist_directory):
+                for name in file_names:
+                    try:
+                        fd = os.open(os.path.join(dir_path, name), os.O_RDONLY)
+                    except OSError:
+                        continue
+                    try:
+                        fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+                    except OSError:
+                        pass
+                    finally:
+                        os.close(fd)
+
+        # Query with a stored vector: it has the right dimension and, unlike a zero
+        # vector, a defined cosine distance. An empty collection has nothing to load.
+        collection = self.vector_store._collection
+        sample = collection.get(limit=1, include=["embeddings"]).get("embeddings")
+        if sample is not None and len(sample) > 0:
+            collection.query(query_embeddings=[list(sample[0])], n_results=1, include=["distances"])
+
     def _normalize_metadata_for_chromadb(self, metadata: dict) -> dict:
         """
         Convert list metadata fields to strings for ChromaDB compatibility.
@@ -141,19 +266,43 @@ class YellowVectorStore:
         Add documents to the vector store.
         Normalizes metadata to be ChromaDB-compatible.
         """
-        if not documents:
+        self.add_texts(
+            [doc.page_content for doc in documents],
+            [doc.metadata for doc in documents],
+        )
+
+    def add_texts(self, texts: List[str], metadatas: List[dict]):
+        """
+        Add chunk texts with their metadata, without building a Document per chunk.
+        Normalizes metadata to be ChromaDB-compatible.
+        """
+        if not texts:
             return
         
-        # Normalize metadata for ChromaDB (convert lists to strings, remove enriched flag)
-        normalized_docs = []
-        for doc in documents:
-            normalized_metadata = self._normalize_metadata_for_chromadb(doc.metadata)
-            normalized_docs.append(Document(
-                page_content=doc.page_content,
-                metadata=normalized_metadata
-            ))
+        # Normalize metadata for ChromaDB (convert lists to strings, remove enriched flag).
+        # Keyed by content hash: a chunk repeated across pages/enrichment runs is embedded once.
+        normalized = {}
+        for text, metadata in zip(texts, metadatas):
+            doc_id = document_id(text)
+            if doc_id in normalized:
+                continue
+            normalized[doc_id] = (text, self._normalize_metadata_for_chromadb(metadata))
         
-        self.vector_store.add_documents(normalized_docs)
+        # Mid-sized inserts: one huge call spikes memory, tiny ones pay per-call overhead
+        batch_size = settings.CHROMA_BATCH_SIZE
+        ids = list(normalized)
+        collection = self.vector_store._collection
+        for start in range(0, len(ids), batch_size):
+            batch_ids = ids[start:start + batch_size]
+            # Chunks already stored under the same id skip the embeddings call entirely
+            existing = set(collection.get(ids=batch_ids, include=[])["ids"])
+            new_ids = [doc_id for doc_id in batch_ids if doc_id not in existing]
+            if new_ids:
+                self.vector_store.add_texts(
+                    [normalized[doc_id][0] for doc_id in new_ids],
+                    metadatas=[normalized[doc_id][1] for doc_id in new_ids],
+                    ids=new_ids,
+                )
 
     def search(self, query: str, k: int = 5, use_metadata_filter: bool = True) -> str:
         """
@@ -169,7 +318,7 @@ class YellowVectorStore:
         """
         # Get more candidates for re-ranking
         candidate_count = k * 2 if use_metadata_filter else k
-        results = self.vector_store.similarity_search(query, k=candidate_count)
+        results = self._query_by_vectors([self.embeddings.embed_query(query)], candidate_count)[0]
         
         # If metadata filtering is enabled, re-rank by relevance
         if use_metadata_filter and results:
@@ -181,6 +330,103 @@ class YellowVectorStore:
         # Format results with enhanced metadata
         return self._format_results(results)
     
+    def search_batch(self, queries: List[str], k: int = 5, use_metadata_filter: bool = True) -> List[List[Document]]:
+        """
+        Search for several queries at once.
+
+        All queries are embedded up front and sent to Chroma as a single multi-embedding
+        query, instead of one embedding call and one Chroma query per item.
+
+        Returns:
+            One list of (re-ranked) Documents per query, in the same order as queries
+        """
+        if not queries:
+            return []
+
+        candidate_count = k * 2 if use_metadata_filter else k
+        raw = self._query_by_vectors(self._embed_queries(queries), candidate_count)
+
+        batched: List[List[Document]] = []
+        for query, results in zip(queries, raw):
+            if use_metadata_filter and results:
+                results = [doc for _, doc in self._score_and_rerank(results, query)[:k]]
+            else:
+                results = results[:k]
+            batched.append(results)
+        return batched
+
+    def search_multi(self, texts: List[str], k: int = 5, use_metadata_filter: bool = True) -> str:
+        """
+        Search for one combined intent made of several short texts (e.g. a prompt plus
+        its missing_info items).
+
+        Each text is embedded separately in one batched call and the unit-normalised
+        mean vector is sent as a single Chroma query. This avoids embedding one long
+        concatenated string, whose signal gets diluted as it grows.
+
+        Results go through a semantic cache: a query vector nearly identical to a
+        recent one (DOCS_SEARCH_CACHE_SIMILARITY) returns that search's result.
+
+        Returns:
+            Formatted string with search results, like search()
+        """
+        texts = [t for t in texts if t and t.strip()]
+        if not texts:
+            return self.search("", k=k, use_metadata_filter=use_metadata_filter)
+
+        vectors = np.asarray(self._embed_queries(texts), dtype=np.float32)
+        query_vector = vectors.mean(axis=0)
+        norm = np.linalg.norm(query_vector)
+        if norm > 0:
+            query_vector /= norm
+
+        params = (k, use_metadata_filter)
+        if self._search_cache is not None:
+            cached = self._search_cache.get(query_vector, params)
+            if cached is not None:
+                return cached
+
+        candidate_count = k * 2 if use_metadata_filter else k
+        results = self._query_by_vectors([query_vector.tolist()], candidate_count)[0]
+
+        if use_metadata_filter and results:
+            # Metadata re-ranking is lexical, so score against all texts together.
+            results = [doc for _, doc in self._score_and_rerank(results, " ".join(texts))[:k]]
+        else:
+            results = results[:k]
+        formatted = self._format_results(results)
+
+        if self._search_cache is not None:
+            self._search_cache.put(query_vector, params, formatted)
+        return formatted
+
+    def _embed_queries(self, queries: List[str]) -> List[List[float]]:
+        if isinstance(self.embeddings, OpenRouterEmbeddings):
+            return self.embeddings.embed_documents(queries)
+        # Google embeddings use a different task type for queries vs documents.
+        return [self.embeddings.embed_query(q) for q in queries]
+
+    def _query_by_vectors(self, vectors: List[List[float]], n_results: int) -> List[List[Document]]:
+        """
+        One Chroma query for all vectors; returns the candidate Documents per vector.
+
+        include is explicit so Chroma never ships stored embeddings (or the unused
+        distances) back with the results.
+        """
+        raw = self.vector_store._collection.query(
+            query_embeddings=vectors,
+            n_results=n_results,
+            include=["documents", "metadatas"],
+        )
+        return [
+            [
+                Document(page_content=doc, metadata=metadata or {})
+                for doc, metadata in zip(docs, metadatas)
+                if doc is not None
+            ]
+            for docs, metadatas in zip(raw.get("documents") or [], raw.get("metadatas") or [])
+        ]
+
     def _score_and_rerank(self, results: List[Document], query: str) -> List[tuple[float, Document]]:
         """
         Score and re-rank results based on metadata matches.
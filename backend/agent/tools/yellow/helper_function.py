@@ -1,73 +1,96 @@
 from __future__ import annotations
 
+import re
 from pathlib import Path
 from typing import Optional
 from agent.state import Diff
 
+try:
+    # optional: RE2's linear-time engine; the keyword patterns are plain literal alternations
+    import re2 as _fast_re
+except ImportError:
+    _fast_re = re
+
+
+def _keyword_pattern(*keywords: str):
+    # One alternation per keyword list, compiled at import: a prompt is scanned once
+    # per check instead of once per keyword.
+    return _fast_re.compile("|".join(map(re.escape, keywords)))
+
+
+_YELLOW_KEYWORDS = _keyword_pattern(
+    "yellow", "nitrolite", "state channel", "state channels",
+    "clear node", "clearnode", "off-chain", "l3", "yellow network", "nitro",
+)
+_VERSIONED_INTEGRATION_KEYWORDS = _keyword_pattern(
+    "integration layer", "versioned", "version control",
+    "library setup", "initialize", "scaffold",
+    "abstract", "abstraction", "helper", "wrapper",
+    "reusable", "framework", "sdk layer",
+    "config", "configuration", "session",
+)
+_DEPOSIT_KEYWORDS = _keyword_pattern(
+    "deposit", "custody", "fund", "add funds", "top up", "top-up",
+    "deposit usdc", "custody contract", "nitrolite deposit",
+)
+_MULTIPARTY_KEYWORDS = _keyword_pattern(
+    "multiparty", "multi-party", "multi party",
+    "two wallet", "two wallets", "dual wallet", "multiple wallet",
+    "collaborative", "collaboration", "multi-sig", "multisig",
+    "shared state", "shared session", "joint session",
+    "participant", "counterparty", "peer", "partner",
+    "bilateral", "mutual", "consensus", "agreement",
+    "allocate", "allocation", "distribution",
+)
+_TIP_KEYWORDS = _keyword_pattern(
+    "tip", "tipping", "send tip", "transfer", "pay", "payment", "donate", "donation",
+)
+_SIMPLE_CHANNEL_KEYWORDS = _keyword_pattern(
+    "channel", "nitrolite", "create channel", "open channel", "state update", "stateless",
+)
+
+
+def _mentions(pattern, prompt: Optional[str]) -> bool:
+    return pattern.search((prompt or "").lower()) is not None
+
 
 def detect_yellow_requirement(prompt: str) -> bool:
     """Detect whether the user's prompt indicates Yellow SDK is required."""
-    kw = [
-        "yellow", "nitrolite", "state channel", "state channels",
-        "clear node", "clearnode", "off-chain", "l3", "yellow network", "nitro",
-    ]
-    pl = (prompt or "").lower()
-    return any(k in pl for k in kw)
+    return _mentions(_YELLOW_KEYWORDS, prompt)
 
 
 def detect_versioned_integration_requirement(prompt: str) -> bool:
     """Detect if user prompt requires versioned Yellow integration layer."""
-    keywords = [
-        "integration layer", "versioned", "version control",
-        "library setup", "initialize", "scaffold",
-        "abstract", "abstraction", "helper", "wrapper",
-        "reusable", "framework", "sdk layer",
-        "config", "configuration", "session",
-    ]
-    return any(kw in (prompt or "").lower() for kw in keywords)
+    return _mentions(_VERSIONED_INTEGRATION_KEYWORDS, prompt)
 
 
 def detect_deposit_requirement(prompt: str) -> bool:
     """Detect whether the user's prompt indicates deposit functionality is required."""
-    keywords = [
-        "deposit", "custody", "fund", "add funds", "top up", "top-up",
-        "deposit usdc", "custody contract", "nitrolite deposit",
-    ]
-    pl = (prompt or "").lower()
-    return any(k in pl for k in keywords)
+    return _mentions(_DEPOSIT_KEYWORDS, prompt)
 
 def detect_multiparty_requirement(prompt: str) -> bool:
     """Detect if user prompt requires multiparty Yellow workflow."""
-    keywords = [
-        "multiparty", "multi-party", "multi party",
-        "two wallet", "two wallets", "dual wallet", "multiple wallet",
-        "collaborative", "collaboration", "multi-sig", "multisig",
-        "shared state", "shared session", "joint session",
-        "participant", "counterparty", "peer", "partner",
-        "bilateral", "mutual", "consensus", "agreement",
-        "allocate", "allocation", "distribution",
-    ]
-    return any(kw in (prompt or "").lower() for kw in keywords)
+    return _mentions(_MULTIPARTY_KEYWORDS, prompt)
 
 def detect_tip_requirement(prompt: str) -> bool:
     """Detect whether the user's prompt indicates tipping functionality is required."""
-    keywords = [
-        "tip", "tipping", "send tip", "transfer", "pay", "payment", "donate", "donation",
-    ]
-    pl = (prompt or "").lower()
-    return any(k in pl for k in keywords)
+    return _mentions(_TIP_KEYWORDS, prompt)
+
+def detect_simple_channel_requirement(prompt: str) -> bool:
+    """Detect whether the user's prompt asks for a simple state channel workflow."""
+    return _mentions(_SIMPLE_CHANNEL_KEYWORDS, prompt)
 
 def read_text_safe(path: Path) -> Optional[str]:
+    # Just try the read: a missing file fails the open, no separate exists() stat needed.
     try:
-        if not path.exists():
-            return None
         return path.read_text(encoding="utf-8", errors="replace")
     except Exception:
         return None
     
-def make_diff(repo_root: Path, rel_path: str, new_content: str) -> Optional[Diff]:
-    abs_path = repo_root / rel_path
-    old_content = read_text_safe(abs_path)
+def make_diff(repo_root: Path, rel_path: str, new_content: str, old_content: Optional[str] = None) -> Optional[Diff]:
+    # Callers that already read the file pass its content instead of having it read again.
+    if old_content is None:
+        old_content = read_text_safe(repo_root / rel_path)
 
     if old_content is None:
         old_content = ""
@@ -2,6 +2,7 @@
 Template content for Yellow SDK initialization.
 All file contents written to the repo are defined here for single-source updates.
 """
+from functools import lru_cache
 
 # Default .env content for Yellow / ClearNode
 DEFAULT_ENV = """PRIVATE_KEY=
@@ -77,6 +78,9 @@ WORKFLOW_SANDBOX_FAUCET = "https://clearnet-sandbox.yellow.com/faucet/requestTok
 WORKFLOW_DEFAULT_SEPOLIA_RPC = "https://rpc.sepolia.org"
 
 # src/yellowWorkflow.ts – run with npx tsx (deps and .env assumed from initialiser)
+# The template getters are cached: tools call them with the same defaults on every
+# agent run, so each rendered file is built once per process.
+@lru_cache(maxsize=None)
 def get_yellow_workflow_ts(rpc_url: str = WORKFLOW_DEFAULT_SEPOLIA_RPC, ws_url: str = WORKFLOW_SANDBOX_WS) -> str:
     return f"""import {{ NitroliteClient, WalletStateSigner, createECDSAMessageSigner, createAuthRequestMessage }} from '@erc7824/nitrolite';
 import {{ createPublicClient, createWalletClient, http }} from 'viem';
@@ -115,6 +119,7 @@ MULTIPARTY_SANDBOX_URL = "wss://clearnet-sandbox.yellow.com/ws"
 MULTIPARTY_SCRIPT_CMD = "curl http://localhost:3000/api/yellow/multi-party"
 
 
+@lru_cache(maxsize=None)
 def get_multiparty_route_ts(sandbox_url: str = MULTIPARTY_SANDBOX_URL) -> str:
     """Next.js API route for full multi-party Yellow session lifecycle (create session, submit state, close)."""
     return f'''
@@ -235,6 +240,7 @@ export async function GET() {{
 VERSIONED_INTEGRATION_VERSION = "1.0.0"
 
 
+@lru_cache(maxsize=None)
 def get_versioned_version_ts(version: str = VERSIONED_INTEGRATION_VERSION) -> str:
     return f'export const YELLOW_INTEGRATION_VERSION = "{version}";'
 
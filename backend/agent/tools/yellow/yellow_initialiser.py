@@ -4,11 +4,15 @@ Merge of invoke + _execute_init; uses make_diff only (diffs proposed, not writte
 """
 
 import json
+import re
+from json.decoder import scanstring
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
 
 from agent.state import AgentState, Diff
-from agent.tools.yellow.helper_function import make_diff
+from agent.tools.yellow.helper_function import make_diff, read_text_safe
 from agent.tools.yellow.template_code import (
     DEFAULT_ENV,
     YELLOW_SCAFFOLD,
@@ -19,6 +23,74 @@ from logging import getLogger
 
 logger = getLogger(__name__)
 
+_JSON_DECODER = json.JSONDecoder()
+_WS = re.compile(r"\s*")
+# Indentation of the first entry line inside an object body
+_ENTRY_INDENT = re.compile(r"\n([ \t]*)\S")
+
+
+def _top_level_spans(text: str) -> Dict[str, Tuple[int, int]]:
+    """(start, end) offsets of each top-level value in a JSON object document."""
+    spans: Dict[str, Tuple[int, int]] = {}
+    pos = _WS.match(text, 0).end()
+    if text[pos:pos + 1] != "{":
+        raise ValueError("package.json is not an object")
+    pos = _WS.match(text, pos + 1).end()
+    while text[pos] != "}":
+        key, pos = scanstring(text, pos + 1)
+        pos = _WS.match(text, pos).end() + 1  # past ':'
+        start = _WS.match(text, pos).end()
+        _, end = _JSON_DECODER.raw_decode(text, start)
+        spans[key] = (start, end)
+        pos = _WS.match(text, end).end()
+        if text[pos] == ",":
+            pos = _WS.match(text, pos + 1).end()
+    return spans
+
+
+def _object_insertion(text: str, start: int, end: int, entries: Dict[str, str]) -> Optional[Tuple[int, str]]:
+    """
+    Where and what to insert to append entries to the non-empty object text[start:end],
+    matching its layout; None for an empty object (no entry to copy the layout from).
+    """
+    last = end - 2
+    while last > start and text[last].isspace():
+        last -= 1
+    if last == start:
+        return None
+    rendered = [f"{json.dumps(k)}: {json.dumps(v)}" for k, v in entries.items()]
+    m = _ENTRY_INDENT.search(text, start, end)
+    if m is None:  # single-line object
+        return last + 1, "".join(f", {entry}" for entry in rendered)
+    return last + 1, "".join(f",\n{m.group(1)}{entry}" for entry in rendered)
+
+
+def _add_package_json_entries(text: str, additions: Dict[str, Dict[str, str]]) -> Optional[str]:
+    """
+    Append new entries to existing objects in package.json text, leaving every other
+    byte (formatting, key order, indentation) as it was. None when a section is
+    missing or empty, or the file can't be scanned; callers then re-serialize.
+    """
+    try:
+        spans = _top_level_spans(text)
+    except (ValueError, IndexError):
+        return None
+    edits = []
+    for section, entries in additions.items():
+        if not entries:
+            continue
+        span = spans.get(section)
+        if span is None or text[span[0]] != "{":
+            return None
+        edit = _object_insertion(text, span[0], span[1], entries)
+        if edit is None:
+            return None
+        edits.append(edit)
+    out = text
+    for pos, insert in sorted(edits, reverse=True):
+        out = out[:pos] + insert + out[pos:]
+    return out
+
 class YellowInitializerTool:
     """
     Proposes Yellow SDK setup as diffs only (package.json, tsconfig, .env, src/yellow.ts).
@@ -45,8 +117,9 @@ class YellowInitializerTool:
             state["thinking_log"] = state.get("thinking_log", []) + [f"Repo not found: {repo_path}"]
             return
 
-        pkg_path = repo / "package.json"
-        if not pkg_path.exists():
+        # package.json is read and parsed once here and shared by every step below.
+        pkg_text = read_text_safe(repo / "package.json")
+        if pkg_text is None:
             state["yellow_initialized"] = False
             state["yellow_framework"] = ""
             state["yellow_init_status"] = "failed"
@@ -54,11 +127,12 @@ class YellowInitializerTool:
             return
 
         try:
-            framework = framework_hint or self._detect_framework(pkg_path)
+            pkg_data = orjson.loads(pkg_text)
+            framework = framework_hint or self._detect_framework(pkg_data)
             diffs: List[Diff] = []
 
             # 1) package.json: merge Yellow deps
-            pkg_diff = self._propose_package_json_diff(repo)
+            pkg_diff = self._propose_package_json_diff(repo, pkg_data, pkg_text)
             if pkg_diff:
                 diffs.append(pkg_diff)
 
@@ -86,7 +160,7 @@ class YellowInitializerTool:
             if diffs:
                 state["tool_diffs"] = (state.get("tool_diffs") or []) + diffs
 
-            pkg_info = self._read_package_json_yellow_fields(repo)
+            pkg_info = self._read_package_json_yellow_fields(pkg_data)
             if pkg_info:
                 state["yellow_version"] = pkg_info.get("yellow_version", "")
                 state["yellow_dependencies"] = pkg_info.get("yellow_dependencies", [])
@@ -102,9 +176,8 @@ class YellowInitializerTool:
             state["yellow_init_status"] = "failed"
             state["thinking_log"] = state.get("thinking_log", []) + [f"Yellow SDK initialization failed: {str(e)}"]
 
-    def _detect_framework(self, package_json_path: Path) -> str:
+    def _detect_framework(self, data: Dict[str, Any]) -> str:
         try:
-            data = json.loads(package_json_path.read_text())
             deps = {**data.get("dependencies", {}), **data.get("devDependencies", {})}
             if "next" in deps:
                 return "nextjs"
@@ -118,19 +191,25 @@ class YellowInitializerTool:
         except Exception:
             return "node"
 
-    def _propose_package_json_diff(self, repo: Path) -> Optional[Diff]:
-        pkg_path = repo / "package.json"
-        data = json.loads(pkg_path.read_text())
+    def _propose_package_json_diff(self, repo: Path, data: Dict[str, Any], old_text: str) -> Optional[Diff]:
         deps = dict(data.get("dependencies") or {})
         dev_deps = dict(data.get("devDependencies") or {})
-        for dep in YELLOW_DEPENDENCIES:
-            deps.setdefault(dep, "latest")
-        for dep in YELLOW_DEV_DEPENDENCIES:
-            dev_deps.setdefault(dep, "latest")
-        data["dependencies"] = deps
-        data["devDependencies"] = dev_deps
-        content = json.dumps(data, indent=2)
-        return make_diff(repo, "package.json", content)
+        additions = {
+            "dependencies": {dep: "latest" for dep in YELLOW_DEPENDENCIES if dep not in deps},
+            "devDependencies": {dep: "latest" for dep in YELLOW_DEV_DEPENDENCIES if dep not in dev_deps},
+        }
+        if not any(additions.values()):
+            return None
+        deps.update(additions["dependencies"])
+        dev_deps.update(additions["devDependencies"])
+        # New dict so the parsed package.json stays as read for the other steps
+        merged = {**data, "dependencies": deps, "devDependencies": dev_deps}
+        # Insert just the new lines so the diff is only those lines; re-serialize the
+        # whole file only when that isn't possible (or wouldn't parse back to `merged`).
+        content = _add_package_json_entries(old_text, additions)
+        if content is None or orjson.loads(content) != merged:
+            content = orjson.dumps(merged, option=orjson.OPT_INDENT_2).decode()
+        return make_diff(repo, "package.json", content, old_text)
 
     def _propose_tsconfig_diff(self, repo: Path) -> Optional[Diff]:
         yellow_config = {
@@ -169,12 +248,8 @@ class YellowInitializerTool:
             return None
         return make_diff(repo, rel, YELLOW_SCAFFOLD)
 
-    def _read_package_json_yellow_fields(self, repo: Path) -> Optional[Dict[str, Any]]:
-        pkg_path = repo / "package.json"
-        if not pkg_path.exists():
-            return None
+    def _read_package_json_yellow_fields(self, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         try:
-            data = json.loads(pkg_path.read_text())
             return {
                 "yellow_version": data.get("version", ""),
                 "yellow_dependencies": list((data.get("dependencies") or {}).keys()),
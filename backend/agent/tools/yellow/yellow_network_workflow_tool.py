@@ -1,7 +1,7 @@
 from pathlib import Path
 from typing import Optional
 
-from agent.tools.yellow.helper_function import make_diff
+from agent.tools.yellow.helper_function import detect_simple_channel_requirement, make_diff
 from agent.tools.yellow.template_code import (
     get_yellow_workflow_ts,
     WORKFLOW_DEFAULT_SEPOLIA_RPC,
@@ -23,20 +23,10 @@ class YellowNetworkWorkflowTool:
     async def invoke(self, state: AgentState) -> None:
         """Update state in place: propose workflow file as tool_diffs; set yellow_workflow_status, thinking_log."""
         repo_path = state.get("repo_path") or "./sandbox"
-        prompt = (state.get("prompt") or "").lower()
+        prompt = state.get("prompt") or ""
         requires_simple = state.get("needs_simple_channel")
         if requires_simple is None:
-            requires_simple = any(
-                k in prompt
-                for k in (
-                    "channel",
-                    "nitrolite",
-                    "create channel",
-                    "open channel",
-                    "state update",
-                    "stateless",
-                )
-            )
+            requires_simple = detect_simple_channel_requirement(prompt)
         requires_yellow = state.get("needs_yellow")
 
         if not (requires_yellow or requires_simple):
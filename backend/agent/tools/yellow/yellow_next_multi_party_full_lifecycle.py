@@ -1,7 +1,8 @@
-import json
 from pathlib import Path
 from typing import List
 
+import orjson
+
 from agent.tools.yellow.helper_function import make_diff, read_text_safe
 from agent.tools.yellow.template_code import (
     get_multiparty_route_ts,
@@ -86,7 +87,7 @@ class YellowNextMultiPartyFullLifecycle:
         if not content:
             return False
         try:
-            pkg = json.loads(content)
+            pkg = orjson.loads(content)
             deps = {**pkg.get("dependencies", {}), **pkg.get("devDependencies", {})}
             return "next" in deps
         except Exception:
@@ -98,11 +99,11 @@ class YellowNextMultiPartyFullLifecycle:
         if not content:
             return None
         try:
-            pkg = json.loads(content)
+            pkg = orjson.loads(content)
             if "scripts" not in pkg:
                 pkg["scripts"] = {}
             pkg["scripts"]["yellow:multi"] = MULTIPARTY_SCRIPT_CMD
-            new_content = json.dumps(pkg, indent=2)
+            new_content = orjson.dumps(pkg, option=orjson.OPT_INDENT_2).decode()
             return make_diff(repo, "package.json", new_content)
         except Exception:
             return None
@@ -11,11 +11,37 @@ class Settings:
     SANDBOX_DIR: str = str((Path(__file__).resolve().parent / "sandbox"))
 
     # CORS
-    CORS_ALLOW_ORIGINS: list[str] = _os.getenv("CORS_ALLOW_ORIGINS", "*").split(",")
+    CORS_ALLOW_ORIGINS: list[str] = [
+        o.strip() for o in _os.getenv("CORS_ALLOW_ORIGINS", "*").split(",") if o.strip()
+    ]
 
     # OpenRouter (LLM) – used for all agent LLM calls (e.g. Claude Sonnet)
     OPENROUTER_API_KEY: str | None = _os.getenv("OPENROUTER_API_KEY")
     OPENROUTER_MODEL: str = _os.getenv("OPENROUTER_MODEL", "qwen/qwen3-coder-next")
+    # Max concurrent LLM requests across all agent runs
+    LLM_MAX_CONCURRENCY: int = int(_os.getenv("LLM_MAX_CONCURRENCY", "8"))
+    # Max LLM requests started per minute across all agent runs (0 disables the limit)
+    LLM_REQUESTS_PER_MINUTE: int = int(_os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+    # Exact-match LLM reply cache entries, keyed on model params + messages. Off by
+    # default (0): a cached reply makes "try again" return the identical answer
+    LLM_RESPONSE_CACHE_SIZE: int = int(_os.getenv("LLM_RESPONSE_CACHE_SIZE", "0"))
+    # Seconds a cached LLM reply stays valid
+    LLM_RESPONSE_CACHE_TTL_SECONDS: float = float(_os.getenv("LLM_RESPONSE_CACHE_TTL_SECONDS", "300"))
+
+    # Pending (proposed, not yet applied) diffs kept in memory: least recently updated
+    # runs, and oldest diffs within a run, are evicted past these caps
+    PENDING_DIFF_MAX_RUNS: int = int(_os.getenv("PENDING_DIFF_MAX_RUNS", "32"))
+    PENDING_DIFF_MAX_FILES_PER_RUN: int = int(_os.getenv("PENDING_DIFF_MAX_FILES_PER_RUN", "1000"))
+
+    # Semantic cache for docs searches: a query whose embedding has cosine similarity
+    # above the threshold to a recent one reuses its result (size 0 disables)
+    DOCS_SEARCH_CACHE_SIZE: int = int(_os.getenv("DOCS_SEARCH_CACHE_SIZE", "256"))
+    DOCS_SEARCH_CACHE_TTL_SECONDS: float = float(_os.getenv("DOCS_SEARCH_CACHE_TTL_SECONDS", "300"))
+    DOCS_SEARCH_CACHE_SIMILARITY: float = float(_os.getenv("DOCS_SEARCH_CACHE_SIMILARITY", "0.97"))
+
+    # Documents per Chroma insert (each batch is one embeddings call + one transaction),
+    # kept within the 50-250 range Chroma handles best
+    CHROMA_BATCH_SIZE: int = min(max(int(_os.getenv("CHROMA_BATCH_SIZE", "200")), 50), 250)
 
     # Legacy Google Gemini (optional; kept for embeddings or fallback)
     GOOGLE_API_KEY: str | None = _os.getenv("GOOGLE_API_KEY")
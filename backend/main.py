@@ -1,6 +1,12 @@
 
+import asyncio
+from contextlib import asynccontextmanager
+from pathlib import Path
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 
 from utils.dotenv import load_dotenv
 from utils.logger import get_logger
@@ -8,30 +14,95 @@ from utils.logger import get_logger
 # Load environment variables BEFORE importing config
 load_dotenv()
 
+from agent.llm.utils import load_token_encoding
 from config import settings
 from routes import router as api_router
+from services.sandbox_fs_service import prewarm_sandbox
+from services.upload_service import sweep_sandbox_trash
+from utils.helper_functions import warmup_docs_store
 
 
 logger = get_logger(__name__)
 
 logger.info("Initializing FastAPI application with CORS and API routes")
 
-app = FastAPI()
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=settings.CORS_ALLOW_ORIGINS,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-logger.info(
-    "CORS configured",
-    extra={
-        "allow_origins": settings.CORS_ALLOW_ORIGINS,
-    },
-)
+async def _prewarm_sandbox_in_background() -> None:
+    try:
+        count = await asyncio.to_thread(prewarm_sandbox, settings.SANDBOX_DIR)
+        logger.info("Sandbox prewarmed", extra={"files": count})
+    except Exception:
+        logger.exception("Sandbox prewarm failed")
+
+
+async def _warmup_docs_store_in_background() -> None:
+    try:
+        await asyncio.to_thread(warmup_docs_store)
+        logger.info("Docs vector store warmed up")
+    except Exception:
+        logger.exception("Docs vector store warmup failed")
+
+
+async def _load_token_encoding_in_background() -> None:
+    if await asyncio.to_thread(load_token_encoding):
+        logger.info("Prompt tokenizer loaded")
+
+
+async def _sweep_sandbox_trash_in_background() -> None:
+    try:
+        removed = await asyncio.to_thread(sweep_sandbox_trash)
+        if removed:
+            logger.info("Removed leftover sandbox trash", extra={"count": removed})
+    except Exception:
+        logger.exception("Sandbox trash sweep failed")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Clear sandbox trash a previous process didn't finish deleting, and warm the page
+    # cache for a sandbox left over from a previous run so the first file tree / file
+    # content requests don't pay cold-disk latency. The docs vector store is built and
+    # its index loaded so the first retrieve_docs doesn't either, and the prompt tokenizer
+    # (whose BPE file may need downloading) is loaded off the loop. None are awaited.
+    tasks = [
+        asyncio.create_task(_sweep_sandbox_trash_in_background()),
+        asyncio.create_task(_load_token_encoding_in_background()),
+    ]
+    if Path(settings.SANDBOX_DIR).is_dir():
+        tasks.append(asyncio.create_task(_prewarm_sandbox_in_background()))
+    if settings.OPENROUTER_API_KEY:
+        tasks.append(asyncio.create_task(_warmup_docs_store_in_background()))
+    yield
+    for task in tasks:
+        if not task.done():
+            task.cancel()
+
+
+# JSON endpoints (notably /files/tree) serialize through orjson instead of stdlib json.
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
+
+# Single app, single middleware stack. With no allowed origins the CORS middleware
+# would reject every cross-origin request anyway, so don't pay for it per request.
+if settings.CORS_ALLOW_ORIGINS:
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=settings.CORS_ALLOW_ORIGINS,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    logger.info(
+        "CORS configured",
+        extra={
+            "allow_origins": settings.CORS_ALLOW_ORIGINS,
+        },
+    )
+else:
+    logger.info("CORS disabled (CORS_ALLOW_ORIGINS is empty)")
+
+# Large JSON bodies (file tree, file content) are gzip'd at level 1 when the client
+# accepts it; Starlette handles Accept-Encoding q-values and Vary, and leaves SSE streams
+# (text/event-stream) uncompressed.
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=1)
 
 app.include_router(api_router)
 logger.info("API router included and application startup completed")
@@ -1,22 +1,32 @@
 import asyncio
+import hashlib
 import subprocess
 
-import io
-import json
 import os
-import uuid
+import secrets
+import shlex
+import signal
+import time
 import zipfile
 from pathlib import Path
 
+import orjson
 from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
 
 from agent.runner import get_last_agent_run_id, resume_agent, run_agent
 from config import settings
-from fastapi.responses import Response, StreamingResponse, FileResponse
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse, FileResponse
 from services.upload_service import upload_from_github
-from services.pending_diff_service import clear_pending_diffs, get_last_run_id, list_pending_diffs, pop_pending_diff
-from services.sandbox_fs_service import SKIP_DIRS, delete_file, get_file_tree, read_text_file, require_root, write_text_file
+from services.pending_diff_service import (
+    PendingDiff,
+    clear_pending_diffs,
+    get_last_run_id,
+    pop_all_pending_diffs,
+    pop_pending_diff,
+    set_pending_diffs_bulk,
+)
+from services.sandbox_fs_service import SKIP_DIRS, delete_file, get_file_tree, read_text_file, require_root, stream_text_file, write_text_file
 from utils.logger import get_logger
 from utils.schemas.agent import AgentPromptRequest, ApplyAllRequest, DiffApproveRequest, ResumeRequest
 from utils.schemas.upload import UploadRequest
@@ -26,6 +36,9 @@ logger = get_logger(__name__)
 
 router = APIRouter()
 
+# The sandbox directory is fixed for the lifetime of the process; resolve it once.
+_SANDBOX_RESOLVED = Path(settings.SANDBOX_DIR).resolve()
+
 class FileWriteRequest(BaseModel):
     path: str
     content: str
@@ -41,25 +54,134 @@ class TerminalExecResponse(BaseModel):
     exitCode: int
 
 
+_SSE_PREFIX = b"data: "
+_SSE_SUFFIX = b"\n\n"
+
+
+def _event_json(event: dict | bytes) -> bytes:
+    # The runner pre-encodes its fixed-shape frames; only dicts still need encoding.
+    return event if isinstance(event, bytes) else orjson.dumps(event)
+
+
+def _sse_frame(event: dict | bytes | list) -> bytes:
+    """
+    Encode one agent event as an SSE `data:` frame. Yielded as bytes so Starlette
+    doesn't have to re-encode a str per event (orjson already emits UTF-8).
+    A list of events (batched by the runner) becomes consecutive frames in one chunk,
+    so it goes out in a single write.
+    """
+    if isinstance(event, list):
+        return b"".join(_SSE_PREFIX + _event_json(e) + _SSE_SUFFIX for e in event)
+    return _SSE_PREFIX + _event_json(event) + _SSE_SUFFIX
+
+
 @router.post("/upload")
 async def upload(req: UploadRequest):
     # Validated by Pydantic schema (UploadRequest)
     github_url = str(req.github_url).strip()
-    logger.info("Received /upload request", extra={"github_url": github_url})
+    logger.info("Received /upload request (github_url=%s)", github_url)
 
     try:
         await upload_from_github(github_url)
         logger.info("GitHub project uploaded successfully")
         return {"ok": True}
     except subprocess.TimeoutExpired:
-        logger.info("Git clone timed out", extra={"github_url": github_url})
+        logger.info("Git clone timed out (github_url=%s)", github_url)
         raise HTTPException(status_code=408, detail="git clone timed out")
     except subprocess.CalledProcessError as e:
         msg = (e.stderr or e.stdout or "unknown error").strip()
-        logger.info("Git clone failed", extra={"github_url": github_url, "error": msg})
+        logger.info("Git clone failed (github_url=%s): %s", github_url, msg)
         raise HTTPException(status_code=400, detail=f"git clone failed: {msg}")
 
 
+_TERMINAL_TIMEOUT_SECONDS = 30
+# Anything that needs /bin/sh to interpret (pipes, redirects, globs, expansion, ...).
+_SHELL_METACHARS = frozenset("|&;<>()$`*?[]{}~#\n")
+
+
+# Builtins and keywords only exist inside the shell (cd, export, source, ...), so
+# commands starting with one can't be exec'd directly.
+_SHELL_BUILTINS = frozenset(
+    {
+        ".", ":", "alias", "bg", "bind", "break", "builtin", "case", "cd", "command",
+        "continue", "declare", "dirs", "disown", "do", "done", "echo", "elif", "else",
+        "enable", "esac", "eval", "exec", "exit", "export", "false", "fc", "fg", "fi",
+        "for", "function", "getopts", "hash", "help", "history", "if", "jobs", "kill",
+        "let", "local", "logout", "popd", "printf", "pushd", "pwd", "read", "readonly",
+        "return", "select", "set", "shift", "shopt", "source", "test", "then", "time",
+        "times", "trap", "true", "type", "typeset", "ulimit", "umask", "unalias",
+        "unset", "until", "wait", "while", "!", "[", "[[", "{", "}",
+    }
+)
+
+
+def _direct_argv(command: str) -> list[str] | None:
+    """
+    Return argv for a plain external command that can be exec'd without /bin/sh,
+    or None when the command needs the shell (metacharacters, leading VAR=value
+    assignments, builtins/keywords, or quoting shlex can't parse - the shell then
+    reports its own syntax error).
+    """
+    if any(c in _SHELL_METACHARS for c in command):
+        return None
+    try:
+        argv = shlex.split(command)
+    except ValueError:
+        return None
+    if not argv or "=" in argv[0] or argv[0] in _SHELL_BUILTINS:
+        return None
+    return argv
+
+
+async def _run_terminal_command(command: str, cwd: Path) -> tuple[int, str, str]:
+    """
+    Run a terminal command asynchronously in its own process group.
+
+    Plain external commands are tokenized with shlex and exec'd directly (no /bin/sh
+    hop); anything using shell syntax or builtins still goes through the shell. On timeout the whole
+    process group is killed so no children are left running.
+    """
+    argv = _direct_argv(command)
+    if argv:
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *argv,
+                cwd=cwd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                start_new_session=True,
+            )
+        except FileNotFoundError:
+            # Match what the shell would report for an unknown / non-executable command.
+            return 127, "", f"{argv[0]}: command not found"
+        except PermissionError:
+            return 126, "", f"{argv[0]}: permission denied"
+    else:
+        proc = await asyncio.create_subprocess_shell(
+            command,
+            cwd=cwd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True,
+        )
+
+    try:
+        out, err = await asyncio.wait_for(proc.communicate(), timeout=_TERMINAL_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        await proc.wait()
+        raise
+
+    return (
+        proc.returncode if proc.returncode is not None else -1,
+        out.decode("utf-8", errors="replace"),
+        err.decode("utf-8", errors="replace"),
+    )
+
+
 @router.post("/api/terminal/exec", response_model=TerminalExecResponse)
 async def terminal_exec(req: TerminalExecRequest) -> TerminalExecResponse:
     """
@@ -69,83 +191,79 @@ async def terminal_exec(req: TerminalExecRequest) -> TerminalExecResponse:
     - This is further validated against `settings.SANDBOX_DIR` to ensure we never
       escape the configured `/sandbox` folder.
     """
-    logger.info("Received /api/terminal/exec request", extra={"command": req.command})
+    logger.info("Received /api/terminal/exec request (command=%r)", req.command)
 
-    root = require_root()
-    sandbox_from_settings = Path(settings.SANDBOX_DIR).resolve()
-    root_resolved = root.resolve()
+    root_resolved = require_root()
 
     # Extra safety: ensure the runtime sandbox root matches config.
-    if root_resolved != sandbox_from_settings:
+    # The root is always stored resolved (see upload_service / require_root).
+    if root_resolved != _SANDBOX_RESOLVED:
         logger.info(
-            "Sandbox root mismatch detected",
-            extra={"root": str(root_resolved), "settings_sandbox_dir": str(sandbox_from_settings)},
+            "Sandbox root mismatch detected: root=%s settings_sandbox_dir=%s",
+            root_resolved,
+            _SANDBOX_RESOLVED,
         )
         raise HTTPException(status_code=500, detail="Sandbox root is not correctly configured")
 
-    # Run the command in a thread to avoid blocking the event loop.
     try:
-        completed: subprocess.CompletedProcess[str] = await asyncio.to_thread(
-            subprocess.run,
-            req.command,
-            shell=True,
-            cwd=root_resolved,
-            capture_output=True,
-            text=True,
-            timeout=30,
-        )
-    except subprocess.TimeoutExpired:
-        logger.info("Terminal command timed out", extra={"command": req.command, "timeout_seconds": 30})
+        returncode, stdout, stderr = await _run_terminal_command(req.command, root_resolved)
+    except asyncio.TimeoutError:
+        logger.info("Terminal command timed out after %ss (command=%r)", _TERMINAL_TIMEOUT_SECONDS, req.command)
         raise HTTPException(status_code=408, detail="Command execution timed out")
     except Exception as e:  # pragma: no cover - safety net
-        logger.info("Terminal command failed to start", extra={"command": req.command, "error": str(e)})
+        logger.info("Terminal command failed to start (command=%r): %s", req.command, e)
         raise HTTPException(status_code=500, detail="Failed to execute command")
 
-    stdout_lines = completed.stdout.splitlines() if completed.stdout else []
-    stderr_lines = completed.stderr.splitlines() if completed.stderr else []
+    stdout_lines = stdout.splitlines() if stdout else []
+    stderr_lines = stderr.splitlines() if stderr else []
 
     logger.info(
-        "Terminal command completed",
-        extra={
-            "command": req.command,
-            "exit_code": completed.returncode,
-            "stdout_lines": len(stdout_lines),
-            "stderr_lines": len(stderr_lines),
-        },
+        "Terminal command completed (exit_code=%s, stdout_lines=%d, stderr_lines=%d)",
+        returncode,
+        len(stdout_lines),
+        len(stderr_lines),
     )
 
-    return TerminalExecResponse(stdout=stdout_lines, stderr=stderr_lines, exitCode=completed.returncode)
+    return TerminalExecResponse(stdout=stdout_lines, stderr=stderr_lines, exitCode=returncode)
 
 
 @router.get("/files/tree")
 async def files_tree():
     logger.info("Received /files/tree request")
     tree = await get_file_tree()
-    logger.info("Returning file tree", extra={"has_tree": bool(tree)})
-    return {"tree": tree}
+    logger.info("Returning file tree (has_tree=%s)", tree is not None)
+    return ORJSONResponse({"tree": tree})
 
 
 @router.get("/files/content")
 async def file_content(path: str = Query(...)):
-    logger.info("Received /files/content request", extra={"path": path})
+    logger.info("Received /files/content request (path=%s)", path)
     result = await read_text_file(path)
-    logger.info("Returning file content", extra={"path": result.get("path")})
-    return result
+    logger.info("Returning file content (path=%s)", result.get("path"))
+    return ORJSONResponse(result)
+
+
+@router.get("/files/raw")
+async def file_raw(path: str = Query(...)):
+    """Stream a sandbox file as plain text, for files too large to return inline as JSON."""
+    logger.info("Received /files/raw request (path=%s)", path)
+    chunks = await stream_text_file(path)
+    return StreamingResponse(chunks, media_type="text/plain; charset=utf-8")
 
 
 @router.put("/files/content")
 async def put_file_content(req: FileWriteRequest):
-    logger.info("Received PUT /files/content request", extra={"path": req.path})
+    logger.info("Received PUT /files/content request (path=%s)", req.path)
     result = await write_text_file(req.path, req.content)
-    logger.info("File write completed", extra={"path": result.get("path")})
+    logger.info("File write completed (path=%s)", result.get("path"))
     return result
 
 
 @router.delete("/files")
 async def delete_file_endpoint(path: str = Query(...)):
-    logger.info("Received DELETE /files request", extra={"path": path})
+    logger.info("Received DELETE /files request (path=%s)", path)
     result = await delete_file(path)
-    logger.info("File delete completed", extra={"path": result.get("path")})
+    logger.info("File delete completed (path=%s)", result.get("path"))
     return result
 
 
@@ -156,61 +274,79 @@ async def yellow_agent_stream(req: AgentPromptRequest):
       data: <json>\n\n
     """
 
-    logger.info(
-        "Received /api/yellow-agent/stream request",
-        extra={"prompt_length": len(req.prompt or ""), "has_run_id": bool(getattr(req, "runId", None))},
-    )
+    logger.info("Received /api/yellow-agent/stream request (prompt_length=%d)", len(req.prompt))
 
     async def gen():
         # Ensure sandbox exists early (gives a clean HTTP error before streaming).
         require_root()
         logger.info("Sandbox root verified for yellow agent stream")
 
-        run_id = uuid.uuid4().hex
-        logger.info("Starting yellow agent run", extra={"runId": run_id})
+        run_id = secrets.token_hex(16)
+        logger.info("Starting yellow agent run (runId=%s)", run_id)
         async for event in run_agent(run_id, req.prompt):
-            payload = json.dumps(event, ensure_ascii=False)
-            
-            yield f"data: {payload}\n\n"
+            yield _sse_frame(event)
 
     headers = {
         "Cache-Control": "no-cache",
         "X-Accel-Buffering": "no",
         "Connection": "keep-alive",
     }
-    logger.info("Returning StreamingResponse for yellow agent", extra={"headers": headers})
+    logger.info("Returning StreamingResponse for yellow agent")
     return StreamingResponse(gen(), media_type="text/event-stream", headers=headers)
 
 
+async def _apply_pending_diffs(run_id: str | None) -> tuple[list[str], list[str]]:
+    """
+    Pop every pending diff for the run and write them to the sandbox concurrently.
+    Diffs whose write fails are put back as pending so they can be approved again.
+    Returns (applied files, failed files).
+    """
+    rid = run_id or get_last_run_id()
+    diffs = await pop_all_pending_diffs(runId=rid)
+    results = await asyncio.gather(
+        *(write_text_file(d.file, d.newCode) for d in diffs), return_exceptions=True
+    )
+    applied: list[str] = []
+    failed: list[PendingDiff] = []
+    for d, result in zip(diffs, results):
+        if isinstance(result, BaseException):
+            logger.warning("Failed to apply pending diff (runId=%s, file=%s): %s", rid, d.file, result)
+            failed.append(d)
+        else:
+            applied.append(d.file)
+    if failed and rid:
+        await set_pending_diffs_bulk(rid, ((d.file, d.oldCode, d.newCode) for d in failed))
+    return applied, [d.file for d in failed]
+
+
+def _apply_failed_event(run_id: str | None, failed: list[str]) -> dict:
+    return {
+        "type": "thought",
+        "runId": run_id,
+        "content": f"Could not apply {len(failed)} file(s), kept as pending diffs: {', '.join(failed)}",
+    }
+
+
 @router.post("/api/yellow-agent/resume")
 async def yellow_agent_resume(req: ResumeRequest):
     """
     Resume the graph after HITL approval. Applies pending diffs if approved, then continues execution.
     """
-    logger.info(
-        "Received /api/yellow-agent/resume request",
-        extra={"runId": req.runId, "approved": req.approved},
-    )
+    logger.info("Received /api/yellow-agent/resume request (runId=%s, approved=%s)", req.runId, req.approved)
 
     async def gen():
         require_root()
         approved_files: list[str] = []
         if req.approved:
-            diffs = await list_pending_diffs(runId=req.runId)
-            for d in diffs:
-                await write_text_file(d.file, d.newCode)
-                approved_files.append(d.file)
-            await clear_pending_diffs(runId=req.runId)
-            logger.info(
-                "Applied pending diffs before resume",
-                extra={"runId": req.runId, "applied": len(approved_files)},
-            )
+            approved_files, failed_files = await _apply_pending_diffs(req.runId)
+            logger.info("Applied %d pending diffs before resume (runId=%s)", len(approved_files), req.runId)
+            if failed_files:
+                yield _sse_frame(_apply_failed_event(req.runId, failed_files))
         else:
             await clear_pending_diffs(runId=req.runId)
 
         async for event in resume_agent(req.runId, req.approved, approved_files):
-            payload = json.dumps(event, ensure_ascii=False)
-            yield f"data: {payload}\n\n"
+            yield _sse_frame(event)
 
     headers = {
         "Cache-Control": "no-cache",
@@ -227,29 +363,22 @@ async def approve_diff(req: DiffApproveRequest):
     If approved, writes newCode into the sandbox.
     """
     logger.info(
-        "Received /api/diff/approve request",
-        extra={"file": req.file, "approved": req.approved, "runId": req.runId},
+        "Received /api/diff/approve request (file=%s, approved=%s, runId=%s)",
+        req.file,
+        req.approved,
+        req.runId,
     )
     diff = await pop_pending_diff(req.file, runId=req.runId)
     if diff is None:
-        logger.info(
-            "No pending diff found for file on approval",
-            extra={"file": req.file, "runId": req.runId},
-        )
+        logger.info("No pending diff found for file on approval (file=%s, runId=%s)", req.file, req.runId)
         raise HTTPException(status_code=404, detail="No pending diff for file")
 
     if req.approved:
         await write_text_file(diff.file, diff.newCode)
-        logger.info(
-            "Approved and applied diff",
-            extra={"file": diff.file, "runId": req.runId},
-        )
+        logger.info("Approved and applied diff (file=%s, runId=%s)", diff.file, req.runId)
         return {"ok": True, "applied": True, "file": diff.file}
 
-    logger.info(
-        "Rejected diff (no changes applied)",
-        extra={"file": diff.file, "runId": req.runId},
-    )
+    logger.info("Rejected diff, no changes applied (file=%s, runId=%s)", diff.file, req.runId)
     return {"ok": True, "applied": False, "file": diff.file}
 
 
@@ -265,25 +394,21 @@ async def apply_all(req: ApplyAllRequest):
     When runId is omitted, returns JSON only (no resume).
     """
     logger.info(
-        "Received /api/yellow-agent/apply request",
-        extra={"approved": req.approved, "runId": req.runId, "andResume": req.andResume},
+        "Received /api/yellow-agent/apply request (approved=%s, runId=%s, andResume=%s)",
+        req.approved,
+        req.runId,
+        req.andResume,
     )
     require_root()
     approved_files: list[str] = []
+    failed_files: list[str] = []
 
     if not req.approved:
         await clear_pending_diffs(runId=req.runId)
-        logger.info("Discarded all pending diffs", extra={"runId": req.runId})
+        logger.info("Discarded all pending diffs (runId=%s)", req.runId)
     else:
-        diffs = await list_pending_diffs(runId=req.runId)
-        for d in diffs:
-            await write_text_file(d.file, d.newCode)
-            approved_files.append(d.file)
-        await clear_pending_diffs(runId=req.runId)
-        logger.info(
-            "Applied all pending diffs",
-            extra={"runId": req.runId, "applied": len(approved_files)},
-        )
+        approved_files, failed_files = await _apply_pending_diffs(req.runId)
+        logger.info("Applied all %d pending diffs (runId=%s)", len(approved_files), req.runId)
 
     # Force resume when andResume: resolve run_id from client, pending-diff last run, or agent last run
     run_id = (
@@ -291,22 +416,28 @@ async def apply_all(req: ApplyAllRequest):
         or get_last_run_id()
         or get_last_agent_run_id()
     )
+    result = {
+        "ok": not failed_files,
+        "applied": len(approved_files),
+        "appliedFiles": approved_files,
+        "failedFiles": failed_files,
+    }
     if not req.andResume:
-        return {"ok": True, "applied": len(approved_files) if req.approved else 0}
+        return result
     if not run_id:
         logger.warning("apply_all: andResume=True but no run_id available; returning JSON only")
-        return {"ok": True, "applied": len(approved_files) if req.approved else 0}
+        return result
 
     logger.info(
         "apply_all: streaming resume for run_id=%s (approved=%s)",
         run_id,
         req.approved,
-        extra={"run_id": run_id},
     )
     async def gen():
+        if failed_files:
+            yield _sse_frame(_apply_failed_event(run_id, failed_files))
         async for event in resume_agent(run_id, req.approved, approved_files):
-            payload = json.dumps(event, ensure_ascii=False)
-            yield f"data: {payload}\n\n"
+            yield _sse_frame(event)
 
     headers = {
         "Cache-Control": "no-cache",
@@ -316,6 +447,86 @@ async def apply_all(req: ApplyAllRequest):
     return StreamingResponse(gen(), media_type="text/event-stream", headers=headers)
 
 
+def _list_sandbox_files(root: Path) -> list[tuple[str, str]]:
+    """Return (abs_path, arcname) for every non-skipped file under root."""
+    skip = SKIP_DIRS
+    root_str = str(root)
+    # os.walk yields dirpaths that start with root_str, so slicing the prefix off
+    # gives the relative path without os.path.relpath (and can never contain "..").
+    prefix_len = len(root_str) + 1
+    files: list[tuple[str, str]] = []
+    for dirpath, dirnames, filenames in os.walk(root_str):
+        # Skip ignored dirs
+        dirnames[:] = [d for d in dirnames if d not in skip]
+
+        for filename in filenames:
+            abs_path = os.path.join(dirpath, filename)
+            files.append((abs_path, abs_path[prefix_len:]))
+    return files
+
+
+def _zip_sandbox_tree(zf: zipfile.ZipFile, root: Path) -> None:
+    """Add every non-skipped file under root to zf, with root-relative arcnames."""
+    for abs_path, arcname in _list_sandbox_files(root):
+        zf.write(abs_path, arcname=arcname)
+
+
+_ZIP_CACHE_DIR = Path(__file__).parent / "data" / "zip_cache"
+
+
+def _build_cached_project_zip(root: Path) -> Path:
+    """
+    Return a zip of the sandbox from the on-disk cache, building it if needed.
+
+    The cache key is a blake2b fingerprint of every file's (arcname, mtime_ns, size),
+    so repeated downloads without edits reuse the same archive.
+    """
+    files = _list_sandbox_files(root)
+    h = hashlib.blake2b(digest_size=16)
+    for abs_path, arcname in files:
+        try:
+            st = os.stat(abs_path)
+        except OSError:
+            continue
+        h.update(f"{arcname}\0{st.st_mtime_ns}\0{st.st_size}\n".encode())
+    zip_path = _ZIP_CACHE_DIR / f"{h.hexdigest()}.zip"
+    try:
+        # Bump the mtime so a concurrent prune treats it as in use while it is served.
+        os.utime(zip_path)
+        return zip_path
+    except FileNotFoundError:
+        pass
+
+    _ZIP_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = zip_path.with_name(f"{zip_path.name}.{secrets.token_hex(4)}.tmp")
+    try:
+        with zipfile.ZipFile(tmp_path, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for abs_path, arcname in files:
+                zf.write(abs_path, arcname=arcname)
+        os.replace(tmp_path, zip_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    _prune_zip_cache(keep=zip_path)
+    return zip_path
+
+
+# Archives touched within this window may still be opened by a pending FileResponse.
+_ZIP_PRUNE_MIN_AGE_SECONDS = 300
+
+
+def _prune_zip_cache(keep: Path) -> None:
+    """Drop archives for older sandbox states, sparing `keep` and recently used ones."""
+    cutoff = time.time() - _ZIP_PRUNE_MIN_AGE_SECONDS
+    for stale in _ZIP_CACHE_DIR.glob("*.zip"):
+        if stale == keep:
+            continue
+        try:
+            if stale.stat().st_mtime < cutoff:
+                stale.unlink()
+        except FileNotFoundError:
+            pass
+
+
 @router.get("/api/project/download")
 async def download_project():
     """
@@ -323,29 +534,12 @@ async def download_project():
     """
     logger.info("Received /api/project/download request")
     root = require_root()
-    logger.info("Preparing project zip from sandbox root", extra={"root": str(root)})
-
-    buf = io.BytesIO()
-    with zipfile.ZipFile(buf, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
-        for dirpath, dirnames, filenames in os.walk(root):
-            # Skip ignored dirs
-            dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
-
-            for filename in filenames:
-                abs_path = os.path.join(dirpath, filename)
-                rel_path = os.path.relpath(abs_path, root)
-                # Avoid absolute/parent references in zip entries
-                if rel_path.startswith(".."):
-                    continue
-                zf.write(abs_path, arcname=rel_path)
-
-    data = buf.getvalue()
-    headers = {"Content-Disposition": 'attachment; filename="yellow-fied-project.zip"'}
-    logger.info(
-        "Returning project zip download",
-        extra={"size_bytes": len(data), "root": str(root)},
-    )
-    return Response(content=data, media_type="application/zip", headers=headers)
+    logger.info("Preparing project zip from sandbox root %s", root)
+
+    zip_path = await asyncio.to_thread(_build_cached_project_zip, root)
+
+    logger.info("Returning project zip download %s from %s", zip_path.name, root)
+    return FileResponse(path=zip_path, media_type="application/zip", filename="yellow-fied-project.zip")
 
 
 @router.post("/api/project/save")
@@ -356,7 +550,7 @@ async def save_project():
     """
     logger.info("Received /api/project/save request")
     root = require_root()
-    project_id = uuid.uuid4().hex
+    project_id = secrets.token_hex(16)
     
     # Ensure projects directory exists
     projects_dir = Path(__file__).parent / "data" / "projects"
@@ -364,21 +558,12 @@ async def save_project():
     
     zip_path = projects_dir / f"{project_id}.zip"
     
-    logger.info("Saving project zip", extra={"root": str(root), "zip_path": str(zip_path)})
+    logger.info("Saving project zip from %s to %s", root, zip_path)
 
     with zipfile.ZipFile(zip_path, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
-        for dirpath, dirnames, filenames in os.walk(root):
-            # Skip ignored dirs
-            dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
-
-            for filename in filenames:
-                abs_path = os.path.join(dirpath, filename)
-                rel_path = os.path.relpath(abs_path, root)
-                if rel_path.startswith(".."):
-                    continue
-                zf.write(abs_path, arcname=rel_path)
+        _zip_sandbox_tree(zf, root)
                 
-    logger.info("Project saved successfully", extra={"project_id": project_id})
+    logger.info("Project saved successfully (project_id=%s)", project_id)
     return {"ok": True, "projectId": project_id}
 
 @router.get("/api/project/load/{project_id}")
@@ -387,19 +572,19 @@ async def load_project(project_id: str):
     Load a project from backend/data/projects/{id}.zip into the sandbox.
     Clears existing sandbox content first.
     """
-    logger.info("Received /api/project/load request", extra={"project_id": project_id})
+    logger.info("Received /api/project/load request (project_id=%s)", project_id)
     
     projects_dir = Path(__file__).parent / "data" / "projects"
     zip_path = projects_dir / f"{project_id}.zip"
     
     if not zip_path.exists():
-        logger.warning("Project zip not found", extra={"zip_path": str(zip_path)})
+        logger.warning("Project zip not found: %s", zip_path)
         raise HTTPException(status_code=404, detail="Project not found")
 
-    sandbox_root = Path(settings.SANDBOX_DIR).resolve()
+    sandbox_root = _SANDBOX_RESOLVED
     
     if not str(sandbox_root).endswith("sandbox"):
-         logger.error("Sandbox path suspicious, aborting load", extra={"path": str(sandbox_root)})
+         logger.error("Sandbox path suspicious, aborting load: %s", sandbox_root)
          raise HTTPException(status_code=500, detail="Sandbox configuration error")
 
     if sandbox_root.exists():
@@ -413,7 +598,7 @@ async def load_project(project_id: str):
     else:
         sandbox_root.mkdir(parents=True, exist_ok=True)
 
-    logger.info("Extracting project zip to sandbox", extra={"zip_path": str(zip_path), "sandbox": str(sandbox_root)})
+    logger.info("Extracting project zip %s to sandbox %s", zip_path, sandbox_root)
     
     with zipfile.ZipFile(zip_path, 'r') as zf:
         zf.extractall(sandbox_root)
@@ -426,17 +611,17 @@ async def load_project(project_id: str):
 
 
 @router.get("/api/project/download/{project_id}")
-async def download_project(project_id: str):
+async def download_saved_project(project_id: str):
     """
     Download a project zip file from backend/data/projects/{id}.zip.
     """
-    logger.info("Received /api/project/download request", extra={"project_id": project_id})
+    logger.info("Received /api/project/download request (project_id=%s)", project_id)
     
     projects_dir = Path(__file__).parent / "data" / "projects"
     zip_path = projects_dir / f"{project_id}.zip"
     
     if not zip_path.exists():
-        logger.warning("Project zip not found for download", extra={"zip_path": str(zip_path)})
+        logger.warning("Project zip not found for download: %s", zip_path)
         raise HTTPException(status_code=404, detail="Project not found")
 
     return FileResponse(
@@ -1,37 +1,70 @@
 from __future__ import annotations
 
-import asyncio
+import sys
+import time
+from collections import OrderedDict
 from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import Dict, List, Optional
+from typing import Iterable, List, Optional, Tuple
 
+from config import settings
 from utils.logger import get_logger
 
 
 logger = get_logger(__name__)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class PendingDiff:
     file: str
     oldCode: str
     newCode: str
-    created_at: datetime
+    # Epoch nanoseconds: a plain int per diff; the datetime is only built on access.
+    created_at_ns: int
 
+    @property
+    def created_at(self) -> datetime:
+        return datetime.fromtimestamp(self.created_at_ns / 1e9, timezone.utc)
 
-_LOCK = asyncio.Lock()
-_PENDING_BY_RUN: Dict[str, Dict[str, PendingDiff]] = {}
+
+# No locks: every operation below is plain dict work with no await in between, so on
+# the single-threaded event loop it can't interleave with another coroutine. The
+# functions stay async so callers don't change.
+# Both levels are kept in least-recently-updated order so the caps evict the oldest.
+_PENDING_BY_RUN: "OrderedDict[str, OrderedDict[str, PendingDiff]]" = OrderedDict()
 _LAST_RUN_ID: Optional[str] = None
 
 
-def _now() -> datetime:
-    return datetime.now(timezone.utc)
+def _resolve_run_id(runId: Optional[str]) -> Optional[str]:
+    return runId or _LAST_RUN_ID
 
 
-def _resolve_run_id(runId: Optional[str]) -> Optional[str]:
-    resolved = runId or _LAST_RUN_ID
-    logger.info("Resolved runId for pending diffs", extra={"requested_runId": runId, "resolved_runId": resolved})
-    return resolved
+def _store(runId: str, diffs: Iterable[PendingDiff]) -> OrderedDict[str, PendingDiff]:
+    """
+    Put diffs under runId (replacing any for the same file), mark the run and files as
+    most recently updated, and evict past PENDING_DIFF_MAX_RUNS /
+    PENDING_DIFF_MAX_FILES_PER_RUN.
+    """
+    global _LAST_RUN_ID
+    _LAST_RUN_ID = runId
+    per_run = _PENDING_BY_RUN.get(runId)
+    if per_run is None:
+        per_run = _PENDING_BY_RUN[runId] = OrderedDict()
+    else:
+        _PENDING_BY_RUN.move_to_end(runId)
+    for diff in diffs:
+        per_run[diff.file] = diff
+        per_run.move_to_end(diff.file)
+
+    max_files = settings.PENDING_DIFF_MAX_FILES_PER_RUN
+    while max_files > 0 and len(per_run) > max_files:
+        file, _ = per_run.popitem(last=False)
+        logger.warning("Evicted oldest pending diff runId=%s file=%s (max %d per run)", runId, file, max_files)
+    max_runs = settings.PENDING_DIFF_MAX_RUNS
+    while max_runs > 0 and len(_PENDING_BY_RUN) > max_runs:
+        evicted, removed = _PENDING_BY_RUN.popitem(last=False)
+        logger.info("Evicted pending diffs of least recent run runId=%s count=%d", evicted, len(removed))
+    return per_run
 
 
 def get_last_run_id() -> Optional[str]:
@@ -43,82 +76,84 @@ async def set_pending_diff(runId: str, file: str, oldCode: str, newCode: str) ->
     """
     Store/replace the pending diff for a given file under a runId (single-session, in-memory).
     """
-    diff = PendingDiff(file=file, oldCode=oldCode, newCode=newCode, created_at=_now())
-    async with _LOCK:
-        global _LAST_RUN_ID
-        _LAST_RUN_ID = runId
-        per_run = _PENDING_BY_RUN.setdefault(runId, {})
-        per_run[file] = diff
-    logger.info(
-        "Set pending diff",
-        extra={
-            "runId": runId,
-            "file": file,
-            "total_files_for_run": len(_PENDING_BY_RUN.get(runId, {})),
-        },
-    )
+    # The same paths come back on every fix-loop iteration; share one string per path.
+    file = sys.intern(file)
+    diff = PendingDiff(file=file, oldCode=oldCode, newCode=newCode, created_at_ns=time.time_ns())
+    per_run = _store(runId, (diff,))
+    logger.debug("Set pending diff runId=%s file=%s total_files_for_run=%d", runId, file, len(per_run))
     return diff
 
 
+async def set_pending_diffs_bulk(runId: str, items: Iterable[Tuple[str, str, str]]) -> List[PendingDiff]:
+    """
+    Store/replace several (file, oldCode, newCode) pending diffs for a runId in one
+    update. Later items win when a file repeats, as with repeated
+    set_pending_diff calls.
+    """
+    now = time.time_ns()
+    diffs = [
+        PendingDiff(file=sys.intern(file), oldCode=oldCode, newCode=newCode, created_at_ns=now)
+        for file, oldCode, newCode in items
+    ]
+    if not diffs:
+        return diffs
+    per_run = _store(runId, diffs)
+    logger.debug("Set %d pending diffs runId=%s total_files_for_run=%d", len(diffs), runId, len(per_run))
+    return diffs
+
+
 async def get_pending_diff(file: str, runId: Optional[str] = None) -> Optional[PendingDiff]:
     rid = _resolve_run_id(runId)
     if not rid:
-        logger.info("No runId resolved when getting pending diff", extra={"file": file})
+        logger.debug("No runId resolved when getting pending diff file=%s", file)
         return None
-    async with _LOCK:
-        diff = (_PENDING_BY_RUN.get(rid) or {}).get(file)
-    logger.info(
-        "Get pending diff",
-        extra={"runId": rid, "file": file, "found": diff is not None},
-    )
+    diff = (_PENDING_BY_RUN.get(rid) or {}).get(file)
+    logger.debug("Get pending diff runId=%s file=%s found=%s", rid, file, diff is not None)
     return diff
 
 
 async def pop_pending_diff(file: str, runId: Optional[str] = None) -> Optional[PendingDiff]:
     rid = _resolve_run_id(runId)
     if not rid:
-        logger.info("No runId resolved when popping pending diff", extra={"file": file})
+        logger.debug("No runId resolved when popping pending diff file=%s", file)
         return None
-    async with _LOCK:
-        per_run = _PENDING_BY_RUN.get(rid)
-        if not per_run:
-            logger.info("No pending diffs for run when popping", extra={"runId": rid, "file": file})
-            return None
-        diff = per_run.pop(file, None)
-    logger.info(
-        "Popped pending diff",
-        extra={"runId": rid, "file": file, "found": diff is not None},
-    )
+    per_run = _PENDING_BY_RUN.get(rid)
+    if not per_run:
+        logger.debug("No pending diffs for run when popping runId=%s file=%s", rid, file)
+        return None
+    diff = per_run.pop(file, None)
+    logger.debug("Popped pending diff runId=%s file=%s found=%s", rid, file, diff is not None)
     return diff
 
 
-async def list_pending_diffs(runId: Optional[str] = None) -> List[PendingDiff]:
+async def list_pending_diffs(runId: Optional[str] = None) -> Tuple[PendingDiff, ...]:
+    """Return an immutable snapshot of a run's pending diffs."""
+    rid = _resolve_run_id(runId)
+    if not rid:
+        logger.debug("No runId resolved when listing pending diffs")
+        return ()
+    diffs = tuple((_PENDING_BY_RUN.get(rid) or {}).values())
+    logger.debug("Listed pending diffs runId=%s count=%d", rid, len(diffs))
+    return diffs
+
+
+async def pop_all_pending_diffs(runId: Optional[str] = None) -> List[PendingDiff]:
+    """Return and remove every pending diff for a run in one step."""
     rid = _resolve_run_id(runId)
     if not rid:
-        logger.info("No runId resolved when listing pending diffs")
+        logger.debug("No runId resolved when popping all pending diffs")
         return []
-    async with _LOCK:
-        diffs = list((_PENDING_BY_RUN.get(rid) or {}).values())
-    logger.info(
-        "Listed pending diffs",
-        extra={"runId": rid, "count": len(diffs)},
-    )
+    removed = _PENDING_BY_RUN.pop(rid, None)
+    diffs = list((removed or {}).values())
+    logger.debug("Popped all pending diffs runId=%s count=%d", rid, len(diffs))
     return diffs
 
 
 async def clear_pending_diffs(runId: Optional[str] = None) -> None:
     rid = _resolve_run_id(runId)
-    async with _LOCK:
-        if rid:
-            removed = _PENDING_BY_RUN.pop(rid, None)
-            logger.info(
-                "Cleared pending diffs for run",
-                extra={"runId": rid, "removed_count": len(removed or {})},
-            )
-        else:
-            removed_total = sum(len(v) for v in _PENDING_BY_RUN.values())
-            _PENDING_BY_RUN.clear()
-            logger.info(
-                "Cleared all pending diffs (no runId provided)",
-                extra={"removed_total": removed_total},
-            )
+    if rid:
+        removed = _PENDING_BY_RUN.pop(rid, None)
+        logger.debug("Cleared pending diffs for run runId=%s removed_count=%d", rid, len(removed or {}))
+    else:
+        _PENDING_BY_RUN.clear()
+        logger.debug("Cleared all pending diffs (no runId provided)")
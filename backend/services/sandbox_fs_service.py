@@ -1,16 +1,20 @@
+import asyncio
+import functools
+import os
 import posixpath
+import re
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, AsyncIterator, Dict, Optional
 
 from fastapi import HTTPException
 
-from services.upload_service import get_current_root
+from services.upload_service import get_current_root, get_current_root_resolved
 from utils.logger import get_logger
 
 
 logger = get_logger(__name__)
 
-SKIP_DIRS = {
+SKIP_DIRS: frozenset[str] = frozenset({
     ".git",
     "node_modules",
     ".next",
@@ -19,7 +23,40 @@ SKIP_DIRS = {
     "venv",
     "dist",
     "build",
-}
+    # JS tool caches and test output: large, generated, never useful to the agent
+    ".turbo",
+    ".cache",
+    ".parcel-cache",
+    "coverage",
+})
+
+
+@functools.lru_cache(maxsize=1)
+def _detect_existing_sandbox() -> Optional[Path]:
+    """
+    Look for a populated sandbox left over from a previous server process.
+
+    Cached so that, before any upload, every request doesn't repeat the stat/iterdir
+    work just to find nothing. Uploads and project loads set the in-memory root
+    directly, and setting it clears this cache via invalidate_root().
+    """
+    from config import settings
+
+    sandbox_path = Path(settings.SANDBOX_DIR).resolve()
+    if sandbox_path.exists() and sandbox_path.is_dir():
+        # Check if it has content (not just empty directory)
+        try:
+            # Filter out just .git (common in cloned repos)
+            if any(e.name != ".git" for e in sandbox_path.iterdir()):
+                return sandbox_path
+        except Exception:
+            logger.info("Failed to auto-detect sandbox root from filesystem")
+    return None
+
+
+def invalidate_root() -> None:
+    """Forget the cached auto-detection result; called whenever the sandbox root is set."""
+    _detect_existing_sandbox.cache_clear()
 
 
 def require_root() -> Path:
@@ -27,33 +64,28 @@ def require_root() -> Path:
     if root is None:
         logger.info("No in-memory sandbox root; attempting auto-detection from settings")
         # Auto-detect existing sandbox if server was restarted
-        from config import settings
-
-        sandbox_path = Path(settings.SANDBOX_DIR).resolve()
-        if sandbox_path.exists() and sandbox_path.is_dir():
-            # Check if it has content (not just empty directory)
-            try:
-                entries = list(sandbox_path.iterdir())
-                # Filter out just .git (common in cloned repos)
-                non_git_entries = [e for e in entries if e.name != ".git"]
-                if non_git_entries:
-                    # Sandbox exists with content, auto-initialize
-                    from services.upload_service import _set_current_root
-
-                    logger.info(
-                        "Auto-initializing sandbox root from existing directory",
-                        extra={"sandbox_path": str(sandbox_path)},
-                    )
-                    _set_current_root(sandbox_path)
-                    return sandbox_path
-            except Exception:
-                logger.info("Failed to auto-detect sandbox root from filesystem")
+        sandbox_path = _detect_existing_sandbox()
+        if sandbox_path is not None:
+            # Sandbox exists with content, auto-initialize
+            from services.upload_service import _set_current_root
+
+            logger.info(
+                "Auto-initializing sandbox root from existing directory",
+                extra={"sandbox_path": str(sandbox_path)},
+            )
+            _set_current_root(sandbox_path)
+            return sandbox_path
         logger.info("No project uploaded yet when requiring sandbox root")
         raise HTTPException(status_code=400, detail="No project uploaded yet")
     logger.info("Using existing sandbox root", extra={"root": str(root)})
     return root
 
 
+# Anything posixpath.normpath would change in a relative path: "." / ".." segments,
+# empty segments and a trailing slash. Paths without these are already normal.
+_NEEDS_NORMALIZING = re.compile(r"(?:^|/)\.\.?(?:/|$)|//|/$")
+
+
 def normalize_and_validate_rel_path(requested_path: str, *, for_directory: bool = False) -> str:
     """
     Relative paths only.
@@ -70,6 +102,11 @@ def normalize_and_validate_rel_path(requested_path: str, *, for_directory: bool
         logger.info("Rejected absolute path", extra={"requested_path": requested_path})
         raise HTTPException(status_code=400, detail="Path must be relative")
 
+    # Paths from the UI and the agent are nearly always clean already; skip normpath for them.
+    if p and not _NEEDS_NORMALIZING.search(p):
+        logger.info("Normalized relative path", extra={"requested_path": requested_path, "normalized": p})
+        return p
+
     norm = posixpath.normpath(p)
     if norm in (".", ""):
         if for_directory:
@@ -87,32 +124,151 @@ def normalize_and_validate_rel_path(requested_path: str, *, for_directory: bool
     return norm
 
 
-async def get_file_tree() -> Dict[str, Any]:
-    root = require_root()
-    logger.info("Building file tree", extra={"root": str(root)})
+def _resolve_in_root(root: Path, norm: str, action: str) -> Path:
+    """
+    Resolve a normalized relative path under root, following symlinks, and reject
+    anything that lands outside it. The resolved root is cached by upload_service,
+    so only the target path pays for a realpath.
+    """
+    root_resolved = get_current_root_resolved() or root.resolve()
+    abs_path = (root_resolved / norm).resolve()
+    if not abs_path.is_relative_to(root_resolved):
+        logger.info(
+            "Rejected %s outside sandbox root",
+            action,
+            extra={"abs_path": str(abs_path), "root": str(root_resolved)},
+        )
+        raise HTTPException(status_code=403, detail="Path is outside sandbox root")
+    return abs_path
+
+
+def prewarm_sandbox(root: str) -> int:
+    """
+    Walk the sandbox once so its dentries/inodes are cached and, where the platform
+    supports it, hint the kernel to read file contents ahead (POSIX_FADV_WILLNEED).
+    Meant to run in a background thread at startup; returns the number of files seen.
+    """
+    fadvise = getattr(os, "posix_fadvise", None)  # not available on macOS
+    count = 0
+    stack = [root]
+    while stack:
+        dir_path = stack.pop()
+        try:
+            with os.scandir(dir_path) as it:
+                for entry in it:
+                    if entry.name in SKIP_DIRS:
+                        continue
+                    if entry.is_dir():
+                        stack.append(entry.path)
+                        continue
+                    count += 1
+                    if fadvise is None:
+                        continue
+                    try:
+                        fd = os.open(entry.path, os.O_RDONLY)
+                    except OSError:
+                        continue
+                    try:
+                        fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+                    except OSError:
+                        pass
+                    finally:
+                        os.close(fd)
+        except OSError:
+            continue
+    return count
+
+
+# Last built tree, reused while no directory under the root has changed. The signature
+# is the (dir path, mtime_ns) list recorded while building it.
+_TREE_CACHE: Dict[str, Any] = {"root": None, "signature": None, "tree": None}
+
+
+def _tree_unchanged(signature: tuple) -> bool:
+    """
+    True when every directory recorded by the last build still has its recorded mtime.
+
+    The tree only records names and file/folder types, and any create/delete/rename
+    bumps the mtime of the containing directory (a new subdirectory bumps its parent),
+    so matching mtimes mean an unchanged tree. One stat per known directory; nothing
+    is listed.
+    """
+    for dir_path, mtime_ns in signature:
+        try:
+            if os.stat(dir_path).st_mtime_ns != mtime_ns:
+                return False
+        except OSError:
+            return False
+    return True
+
 
-    def build(abs_path: Path, rel_path: str) -> Dict[str, Any]:
-        name = abs_path.name if rel_path else abs_path.name  # root name too
-        if abs_path.is_dir():
-            children: list[Dict[str, Any]] = []
-            try:
-                entries = sorted(abs_path.iterdir(), key=lambda p: (p.is_file(), p.name.lower()))
-            except Exception:
-                entries = []
+def invalidate_file_tree_cache() -> None:
+    """Drop the cached file tree so the next get_file_tree() rebuilds it."""
+    _TREE_CACHE["signature"] = None
+    _TREE_CACHE["tree"] = None
 
-            for entry in entries:
-                if entry.name in SKIP_DIRS:
-                    continue
-                child_rel = entry.name if not rel_path else f"{rel_path}/{entry.name}"
-                children.append(build(entry, child_rel))
 
-            node: Dict[str, Any] = {"path": rel_path, "name": name, "type": "folder", "children": children}
-            return node
+def _build_tree_sync(root_path: Path, dir_mtimes: Optional[list] = None) -> Dict[str, Any]:
+    """
+    Walk root_path into the nested {path, name, type, children} tree the frontend renders.
+    When dir_mtimes is given, (dir path, mtime_ns) of every directory walked is appended
+    to it, for _tree_unchanged.
+    """
+    if not root_path.is_dir():
+        return {"path": "", "name": root_path.name, "type": "file"}
+
+    tree: Dict[str, Any] = {"path": "", "name": root_path.name, "type": "folder", "children": []}
+    # Explicit DFS stack of (abs dir path, rel prefix for children, children list to fill).
+    # DirEntry caches its stat results, so sorting and type checks cost no extra syscalls.
+    stack: list[tuple[str, str, list]] = [(str(root_path), "", tree["children"])]
+    while stack:
+        dir_path, rel_prefix, children = stack.pop()
+        try:
+            if dir_mtimes is not None:
+                # Stat before listing, so a change during the walk shows up next check.
+                dir_mtimes.append((dir_path, os.stat(dir_path).st_mtime_ns))
+            with os.scandir(dir_path) as it:
+                # Drop skipped names before sorting, so e.g. node_modules never enters the sort.
+                entries = [e for e in it if e.name not in SKIP_DIRS]
+        except OSError:
+            continue
+        entries.sort(key=lambda e: (e.is_file(), e.name.lower()))
+
+        for entry in entries:
+            name = entry.name
+            child_rel = rel_prefix + name
+            if entry.is_dir():
+                child_children: list[Dict[str, Any]] = []
+                children.append({"path": child_rel, "name": name, "type": "folder", "children": child_children})
+                stack.append((entry.path, child_rel + "/", child_children))
+            else:
+                children.append({"path": child_rel, "name": name, "type": "file"})
+    return tree
+
 
-        return {"path": rel_path, "name": name, "type": "file"}
+async def get_file_tree() -> Dict[str, Any]:
+    """
+    Return the sandbox file tree. The result is cached and shared between callers,
+    so treat it as read-only.
+    """
+    root = require_root()
+    # Both the mtime check and the build are blocking filesystem work; keep them off the loop.
+    signature = _TREE_CACHE["signature"]
+    if (
+        _TREE_CACHE["tree"] is not None
+        and _TREE_CACHE["root"] == root
+        and signature
+        and await asyncio.to_thread(_tree_unchanged, signature)
+    ):
+        logger.info("Returning cached file tree", extra={"root": str(root)})
+        return _TREE_CACHE["tree"]
+
+    logger.info("Building file tree", extra={"root": str(root)})
 
     try:
-        tree = build(root, "")
+        dir_mtimes: list = []
+        tree = await asyncio.to_thread(_build_tree_sync, root, dir_mtimes)
+        _TREE_CACHE.update(root=root, signature=tuple(dir_mtimes), tree=tree)
         logger.info("File tree built successfully")
         return tree
     except Exception:
@@ -124,17 +280,10 @@ async def read_text_file(path: str) -> Dict[str, str]:
     root = require_root()
     norm = normalize_and_validate_rel_path(path)
     logger.info("Reading text file from sandbox", extra={"requested_path": path, "normalized": norm})
-    abs_path = (root / norm).resolve()
-    root_resolved = root.resolve()
-    if abs_path != root_resolved and not str(abs_path).startswith(str(root_resolved) + "/"):
-        logger.info(
-            "Rejected read outside sandbox root",
-            extra={"abs_path": str(abs_path), "root": str(root_resolved)},
-        )
-        raise HTTPException(status_code=403, detail="Path is outside sandbox root")
+    abs_path = _resolve_in_root(root, norm, "read")
 
     try:
-        content = abs_path.read_text(encoding="utf-8", errors="replace")
+        content = await asyncio.to_thread(abs_path.read_text, encoding="utf-8", errors="replace")
     except Exception:
         logger.info("File not found or unreadable", extra={"abs_path": str(abs_path)})
         raise HTTPException(status_code=404, detail="File not found or unreadable")
@@ -143,6 +292,75 @@ async def read_text_file(path: str) -> Dict[str, str]:
     return {"path": norm, "content": content}
 
 
+# Chunk size (in characters) for stream_text_file reads.
+_STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def _is_readable_file(abs_path: Path) -> bool:
+    return abs_path.is_file() and os.access(abs_path, os.R_OK)
+
+
+async def stream_text_file(path: str) -> AsyncIterator[str]:
+    """
+    Check a sandbox file and return an async iterator over its text in fixed-size chunks.
+
+    Validation and a readability check happen up front, so a missing file raises before
+    any response starts. The file is only opened once iteration begins (and closed when
+    it ends), so a response that is never iterated holds no descriptor; the content is
+    read in a worker thread one chunk at a time, keeping memory flat for large files.
+    """
+    root = require_root()
+    norm = normalize_and_validate_rel_path(path)
+    logger.info("Streaming text file from sandbox", extra={"requested_path": path, "normalized": norm})
+    abs_path = _resolve_in_root(root, norm, "read")
+
+    if not await asyncio.to_thread(_is_readable_file, abs_path):
+        logger.info("File not found or unreadable", extra={"abs_path": str(abs_path)})
+        raise HTTPException(status_code=404, detail="File not found or unreadable")
+
+    async def chunks() -> AsyncIterator[str]:
+        f = await asyncio.to_thread(open, abs_path, "r", encoding="utf-8", errors="replace")
+        try:
+            while True:
+                chunk = await asyncio.to_thread(f.read, _STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            f.close()
+
+    return chunks()
+
+
+def _write_file_sync(abs_path: Path, content: str) -> None:
+    # is_dir() is False for a missing path, so one stat covers both checks.
+    if abs_path.is_dir():
+        logger.info("Rejected write to existing directory", extra={"abs_path": str(abs_path)})
+        raise HTTPException(status_code=400, detail="Path points to a directory")
+    data = content.encode("utf-8")
+    # The parent almost always exists already (edits to existing files), so only walk
+    # and create parent directories when the write says they are missing.
+    try:
+        _write_bytes(abs_path, data)
+    except FileNotFoundError:
+        abs_path.parent.mkdir(parents=True, exist_ok=True)
+        _write_bytes(abs_path, data)
+
+
+def _write_bytes(abs_path: Path, data: bytes) -> None:
+    """
+    Replace a file's contents straight through an fd: no file object or text layer.
+    Same bytes as write_text(encoding="utf-8") on POSIX, where "\n" is not translated.
+    """
+    fd = os.open(abs_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+
 async def write_text_file(path: str, content: str) -> Dict[str, str]:
     root = require_root()
     if path.strip().endswith("/"):
@@ -150,31 +368,32 @@ async def write_text_file(path: str, content: str) -> Dict[str, str]:
         raise HTTPException(status_code=400, detail="Path must be a file, not a directory")
     norm = normalize_and_validate_rel_path(path)
     logger.info("Writing text file to sandbox", extra={"requested_path": path, "normalized": norm})
-    abs_path = (root / norm).resolve()
-    root_resolved = root.resolve()
-    if abs_path != root_resolved and not str(abs_path).startswith(str(root_resolved) + "/"):
-        logger.info(
-            "Rejected write outside sandbox root",
-            extra={"abs_path": str(abs_path), "root": str(root_resolved)},
-        )
-        raise HTTPException(status_code=403, detail="Path is outside sandbox root")
+    abs_path = _resolve_in_root(root, norm, "write")
 
     try:
-        if abs_path.exists() and abs_path.is_dir():
-            logger.info("Rejected write to existing directory", extra={"abs_path": str(abs_path)})
-            raise HTTPException(status_code=400, detail="Path points to a directory")
-        abs_path.parent.mkdir(parents=True, exist_ok=True)
-        abs_path.write_text(content, encoding="utf-8")
+        # Blocking filesystem work runs in a thread so the event loop stays free.
+        await asyncio.to_thread(_write_file_sync, abs_path, content)
     except HTTPException:
         raise
     except Exception:
         logger.info("Failed to write file", extra={"abs_path": str(abs_path)})
         raise HTTPException(status_code=500, detail="Failed to write file")
 
+    invalidate_file_tree_cache()
     logger.info("Write text file successful", extra={"path": norm})
     return {"path": norm}
 
 
+def _delete_file_sync(abs_path: Path) -> None:
+    if not abs_path.exists():
+        logger.info("File not found for delete", extra={"abs_path": str(abs_path)})
+        raise HTTPException(status_code=404, detail="File not found")
+    if abs_path.is_dir():
+        logger.info("Rejected delete for directory path", extra={"abs_path": str(abs_path)})
+        raise HTTPException(status_code=400, detail="Path points to a directory")
+    abs_path.unlink()
+
+
 async def delete_file(path: str) -> Dict[str, str]:
     root = require_root()
     if path.strip().endswith("/"):
@@ -182,29 +401,17 @@ async def delete_file(path: str) -> Dict[str, str]:
         raise HTTPException(status_code=400, detail="Path must be a file, not a directory")
     norm = normalize_and_validate_rel_path(path)
     logger.info("Deleting file from sandbox", extra={"requested_path": path, "normalized": norm})
-    abs_path = (root / norm).resolve()
-    root_resolved = root.resolve()
-    if abs_path != root_resolved and not str(abs_path).startswith(str(root_resolved) + "/"):
-        logger.info(
-            "Rejected delete outside sandbox root",
-            extra={"abs_path": str(abs_path), "root": str(root_resolved)},
-        )
-        raise HTTPException(status_code=403, detail="Path is outside sandbox root")
+    abs_path = _resolve_in_root(root, norm, "delete")
 
     try:
-        if not abs_path.exists():
-            logger.info("File not found for delete", extra={"abs_path": str(abs_path)})
-            raise HTTPException(status_code=404, detail="File not found")
-        if abs_path.is_dir():
-            logger.info("Rejected delete for directory path", extra={"abs_path": str(abs_path)})
-            raise HTTPException(status_code=400, detail="Path points to a directory")
-        abs_path.unlink()
+        await asyncio.to_thread(_delete_file_sync, abs_path)
     except HTTPException:
         raise
     except Exception:
         logger.info("Failed to delete file", extra={"abs_path": str(abs_path)})
         raise HTTPException(status_code=500, detail="Failed to delete file")
 
+    invalidate_file_tree_cache()
     logger.info("Delete file successful", extra={"path": norm})
     return {"path": norm}
 
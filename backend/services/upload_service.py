@@ -1,5 +1,7 @@
 import asyncio
+from collections import deque
 from pathlib import Path
+import secrets
 import shutil
 import subprocess
 
@@ -11,6 +13,7 @@ logger = get_logger(__name__)
 
 _UPLOAD_LOCK = asyncio.Lock()
 _CURRENT_ROOT: Path | None = None
+_CURRENT_ROOT_RESOLVED: Path | None = None
 
 
 def get_current_root() -> Path | None:
@@ -20,30 +23,110 @@ def get_current_root() -> Path | None:
     return _CURRENT_ROOT
 
 
+def get_current_root_resolved() -> Path | None:
+    """
+    Returns the current sandbox root with symlinks resolved, computed once when the root is set.
+    """
+    return _CURRENT_ROOT_RESOLVED
+
+
 def _set_current_root(root: Path) -> None:
-    global _CURRENT_ROOT
+    from services.sandbox_fs_service import invalidate_root
+
+    global _CURRENT_ROOT, _CURRENT_ROOT_RESOLVED
     _CURRENT_ROOT = root
+    _CURRENT_ROOT_RESOLVED = root.resolve()
+    # The sandbox was just (re)populated: drop any cached "no sandbox on disk" result.
+    invalidate_root()
     logger.info("Sandbox root updated", extra={"root": str(root)})
 
 
-def _git_clone_repo(github_url: str, dest_dir: str) -> None:
+# Lines of git's stderr kept for the error message if the clone fails.
+_CLONE_STDERR_TAIL_LINES = 50
+
+
+async def _git_clone_repo(github_url: str, dest_dir: str) -> None:
+    """
+    Shallow-clone github_url into dest_dir as an asyncio subprocess.
+
+    stderr is streamed to the debug log line by line rather than buffered whole; only
+    a short tail is kept for the error. Raises subprocess.TimeoutExpired /
+    subprocess.CalledProcessError like subprocess.run did, so callers keep their
+    existing error handling.
+    """
     logger.info("Cloning GitHub repository", extra={"github_url": github_url, "dest_dir": dest_dir})
-    subprocess.run(
-        ["git", "clone", "--depth", "1", github_url, dest_dir],
-        check=True,
-        capture_output=True,
-        text=True,
-        timeout=settings.GIT_CLONE_TIMEOUT_SECONDS,
+    # --quiet: no progress meter, so stderr carries only warnings and errors
+    cmd = ["git", "clone", "--quiet", "--depth", "1", github_url, dest_dir]
+    proc = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE,
     )
+    stderr_tail: deque[str] = deque(maxlen=_CLONE_STDERR_TAIL_LINES)
+
+    async def drain_stderr() -> None:
+        async for raw in proc.stderr:
+            line = raw.decode("utf-8", errors="replace").rstrip()
+            stderr_tail.append(line)
+            logger.debug("git clone: %s", line)
+
+    timeout = settings.GIT_CLONE_TIMEOUT_SECONDS
+    try:
+        await asyncio.wait_for(asyncio.gather(drain_stderr(), proc.wait()), timeout=timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise subprocess.TimeoutExpired(cmd, timeout)
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd, output="", stderr="\n".join(stderr_tail))
     logger.info("Git clone completed", extra={"github_url": github_url, "dest_dir": dest_dir})
 
 
-def _ensure_empty_dir(path: Path) -> None:
+# Old sandboxes are renamed to "<name>.trash-<hex>" and deleted in the background.
+_TRASH_MARKER = ".trash-"
+# Strong references to fire-and-forget cleanup tasks so they aren't garbage collected mid-run.
+_BACKGROUND_TASKS: set[asyncio.Task] = set()
+
+
+def _ensure_empty_dir(path: Path) -> Path | None:
+    """
+    Make path an empty directory.
+
+    An existing directory is renamed aside (a single rename, however big it is) and the
+    trash path is returned so the caller can delete it without waiting.
+    """
+    trash: Path | None = None
     if path.exists():
-        logger.info("Existing sandbox directory found; removing", extra={"path": str(path)})
-        shutil.rmtree(path, ignore_errors=True)
+        trash = path.with_name(f"{path.name}{_TRASH_MARKER}{secrets.token_hex(8)}")
+        logger.info("Existing sandbox directory found; moving aside", extra={"path": str(path), "trash": str(trash)})
+        try:
+            path.rename(trash)
+        except OSError:
+            logger.info("Rename failed; removing sandbox directory in place", extra={"path": str(path)})
+            shutil.rmtree(path, ignore_errors=True)
+            trash = None
     path.mkdir(parents=True, exist_ok=True)
     logger.info("Sandbox directory prepared", extra={"path": str(path)})
+    return trash
+
+
+def _delete_in_background(path: Path) -> None:
+    task = asyncio.create_task(asyncio.to_thread(shutil.rmtree, path, ignore_errors=True))
+    _BACKGROUND_TASKS.add(task)
+    task.add_done_callback(_BACKGROUND_TASKS.discard)
+
+
+def sweep_sandbox_trash() -> int:
+    """
+    Delete trash directories left next to the sandbox by a previous process (e.g. after
+    a crash mid-cleanup). Blocking; returns how many were removed.
+    """
+    sandbox_root = Path(settings.SANDBOX_DIR).resolve()
+    removed = 0
+    for trash in sandbox_root.parent.glob(f"{sandbox_root.name}{_TRASH_MARKER}*"):
+        shutil.rmtree(trash, ignore_errors=True)
+        removed += 1
+    return removed
 
 
 async def upload_from_github(github_url: str) -> None:
@@ -57,8 +140,10 @@ async def upload_from_github(github_url: str) -> None:
     async with _UPLOAD_LOCK:
         logger.info("Starting upload_from_github", extra={"github_url": github_url})
         sandbox_root = Path(settings.SANDBOX_DIR).resolve()
-        await asyncio.to_thread(_ensure_empty_dir, sandbox_root)
+        trash = await asyncio.to_thread(_ensure_empty_dir, sandbox_root)
+        if trash is not None:
+            _delete_in_background(trash)
 
-        await asyncio.to_thread(_git_clone_repo, github_url, str(sandbox_root))
+        await _git_clone_repo(github_url, str(sandbox_root))
         _set_current_root(sandbox_root)
         logger.info("Upload from GitHub completed", extra={"sandbox_root": str(sandbox_root)})
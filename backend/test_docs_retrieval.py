@@ -9,12 +9,18 @@ This script tests:
 
 Run from backend/ directory:
     python test_docs_retrieval.py
+    TEST_VERBOSE=1 python test_docs_retrieval.py   # include tracebacks on failure
 """
 
 from __future__ import annotations
 
+import asyncio
+import atexit
+import io
 import os
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Any, Dict, List
 
@@ -31,10 +37,24 @@ except Exception as e:
 
 from config import settings
 from agent.tools.vector_store import YellowVectorStore
-from utils.helper_functions import _search_docs_wrapper
+from utils.helper_functions import _search_docs_wrapper, warmup_docs_store
 from agent.state import AgentState
 
 
+# Full tracebacks on failure are only formatted when TEST_VERBOSE is set.
+VERBOSE = bool(os.getenv("TEST_VERBOSE"))
+
+# Event loop for the async retrieve-docs check (test 6), kept for the whole run so
+# clients bound to the loop (httpx, Chroma's embedding transport) are built once.
+_LOOP = asyncio.new_event_loop()
+atexit.register(_LOOP.close)
+
+
+def run(coro):
+    """Run a coroutine to completion on the test loop."""
+    return _LOOP.run_until_complete(coro)
+
+
 def print_section(title: str):
     """Print a formatted section header."""
     print("\n" + "=" * 80)
@@ -105,8 +125,9 @@ def test_2_chromadb_initialization():
             return False, None
     except Exception as e:
         print_result("YellowVectorStore initialization", False, f"Unexpected error: {type(e).__name__}: {e}")
-        import traceback
-        print(f"   Traceback:\n{traceback.format_exc()}")
+        if VERBOSE:
+            import traceback
+            print(f"   Traceback:\n{traceback.format_exc()}")
         return False, None
 
 
@@ -136,8 +157,9 @@ def test_3_chromadb_collection():
             
     except Exception as e:
         print_result("Collection check", False, f"Error: {type(e).__name__}: {e}")
-        import traceback
-        print(f"   Traceback:\n{traceback.format_exc()}")
+        if VERBOSE:
+            import traceback
+            print(f"   Traceback:\n{traceback.format_exc()}")
         return False, None
 
 
@@ -177,8 +199,9 @@ def test_4_search_functionality():
         
     except Exception as e:
         print_result("Search functionality", False, f"Error: {type(e).__name__}: {e}")
-        import traceback
-        print(f"   Traceback:\n{traceback.format_exc()}")
+        if VERBOSE:
+            import traceback
+            print(f"   Traceback:\n{traceback.format_exc()}")
         return False
 
 
@@ -224,8 +247,6 @@ def test_6_retrieve_docs_node_simulation():
     """Test 6: Simulate retrieve_docs_node execution."""
     print_section("Test 6: retrieve_docs_node Simulation")
     
-    import asyncio
-    
     async def simulate_retrieve_docs_node():
         """Simulate the actual retrieve_docs_node logic."""
         state: AgentState = {
@@ -259,69 +280,66 @@ def test_6_retrieve_docs_node_simulation():
                 
         except Exception as e:
             print_result("retrieve_docs_node simulation", False, f"Exception: {type(e).__name__}: {e}")
-            import traceback
-            print(f"   Traceback:\n{traceback.format_exc()}")
+            if VERBOSE:
+                import traceback
+                print(f"   Traceback:\n{traceback.format_exc()}")
             return False, state
     
     try:
-        passed, final_state = asyncio.run(simulate_retrieve_docs_node())
+        passed, final_state = run(simulate_retrieve_docs_node())
         return passed
     except Exception as e:
         print_result("retrieve_docs_node simulation", False, f"Failed to run: {type(e).__name__}: {e}")
         return False
 
 
+# Routing state every test 7 scenario starts from. Scenarios override keys with new
+# objects and never mutate the shared lists/dicts.
+BASE_ROUTING_STATE: Dict[str, Any] = {
+    "context_ready": False,
+    "context_loop_count": 1,
+    "files_to_read": [],
+    "file_contents": {},
+    "missing_info": [],
+    "docs_retrieved": False,
+}
+
+
 def test_7_routing_logic():
     """Test 7: Analyze routing logic to see when retrieve_docs would be called."""
     print_section("Test 7: Routing Logic Analysis")
     
-    # Simulate different state scenarios
+    # Simulate different state scenarios; each one overrides a shared base state
     scenarios = [
         {
             "name": "Scenario 1: No files, no docs retrieved",
-            "state": {
-                "context_ready": False,
-                "context_loop_count": 1,
-                "files_to_read": [],
-                "file_contents": {},
-                "missing_info": ["documentation", "API reference"],
-                "docs_retrieved": False,
-            },
+            "state": {**BASE_ROUTING_STATE, "missing_info": ["documentation", "API reference"]},
             "expected": "retrieve_docs",
         },
         {
             "name": "Scenario 2: Has files_to_read (should prioritize read_code)",
             "state": {
-                "context_ready": False,
-                "context_loop_count": 1,
+                **BASE_ROUTING_STATE,
                 "files_to_read": ["package.json", "src/main.ts"],
-                "file_contents": {},
                 "missing_info": ["documentation"],
-                "docs_retrieved": False,
             },
             "expected": "read_code",  # This is why retrieve_docs might be skipped!
         },
         {
             "name": "Scenario 3: Has file_contents, no docs yet",
             "state": {
-                "context_ready": False,
-                "context_loop_count": 1,
-                "files_to_read": [],
+                **BASE_ROUTING_STATE,
                 "file_contents": {"package.json": "{}"},
                 "missing_info": ["Yellow SDK documentation"],
-                "docs_retrieved": False,
             },
             "expected": "retrieve_docs",
         },
         {
             "name": "Scenario 4: Loop count exceeded (should force ready)",
             "state": {
-                "context_ready": False,
+                **BASE_ROUTING_STATE,
                 "context_loop_count": 5,  # > 4
-                "files_to_read": [],
-                "file_contents": {},
                 "missing_info": ["documentation"],
-                "docs_retrieved": False,
             },
             "expected": "ready",
         },
@@ -351,6 +369,41 @@ def test_7_routing_logic():
     return all_correct
 
 
+class _ThreadLocalStdout:
+    """stdout proxy that sends a thread's prints to its own buffer while one is set."""
+
+    def __init__(self, real):
+        self.real = real
+        self._local = threading.local()
+
+    def capture(self, buffer: io.StringIO | None) -> None:
+        self._local.buffer = buffer
+
+    def write(self, text: str) -> int:
+        return (getattr(self._local, "buffer", None) or self.real).write(text)
+
+    def flush(self) -> None:
+        self.real.flush()
+
+    def __getattr__(self, name: str):
+        # encoding, isatty(), fileno(), ... come from the real stream
+        return getattr(self.real, name)
+
+
+def _run_captured(test) -> tuple[bool, str]:
+    """Run a test in a worker thread, returning (passed, everything it printed)."""
+    buffer = io.StringIO()
+    sys.stdout.capture(buffer)
+    try:
+        passed = bool(test())
+    except Exception as e:
+        print_result(getattr(test, "__name__", "test"), False, f"Exception: {type(e).__name__}: {e}")
+        passed = False
+    finally:
+        sys.stdout.capture(None)
+    return passed, buffer.getvalue()
+
+
 def main():
     """Run all tests."""
     print("\n" + "=" * 80)
@@ -362,6 +415,12 @@ def main():
     # Test 1: API Key
     results["api_key"] = test_1_google_api_key()
     
+    # Warm the shared store once so later tests don't each pay Chroma's cold start
+    try:
+        warmup_docs_store()
+    except Exception as e:
+        print(f"⚠️  Warning: Could not warm up vector store: {type(e).__name__}: {e}")
+    
     # Test 2: ChromaDB Initialization
     init_passed, vs = test_2_chromadb_initialization()
     results["chromadb_init"] = init_passed
@@ -371,20 +430,26 @@ def main():
         print_summary(results)
         return
     
-    # Test 3: Collection Check
-    collection_passed, vs = test_3_chromadb_collection()
-    results["chromadb_collection"] = collection_passed
-    
-    # Test 4: Search
-    results["search"] = test_4_search_functionality()
-    
-    # Test 5: Wrapper
-    results["wrapper"] = test_5_search_docs_wrapper()
-    
-    # Test 6: Node Simulation
-    results["node_simulation"] = test_6_retrieve_docs_node_simulation()
-    
-    # Test 7: Routing
+    # Tests 3-6 are independent I/O-bound checks (Chroma reads, embedding calls): run
+    # them concurrently, then print each one's captured output in order.
+    independent_tests = [
+        ("chromadb_collection", lambda: test_3_chromadb_collection()[0]),
+        ("search", test_4_search_functionality),
+        ("wrapper", test_5_search_docs_wrapper),
+        ("node_simulation", test_6_retrieve_docs_node_simulation),
+    ]
+    sys.stdout = _ThreadLocalStdout(sys.stdout)
+    try:
+        with ThreadPoolExecutor(max_workers=len(independent_tests)) as pool:
+            futures = [(name, pool.submit(_run_captured, test)) for name, test in independent_tests]
+            outcomes = [(name, future.result()) for name, future in futures]
+    finally:
+        sys.stdout = sys.stdout.real
+    for name, (passed, output) in outcomes:
+        print(output, end="")
+        results[name] = passed
+    
+    # Test 7: Routing (serial: relies on import side effects)
     results["routing"] = test_7_routing_logic()
     
     # Summary
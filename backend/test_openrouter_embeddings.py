@@ -9,6 +9,9 @@ import sys
 from pathlib import Path
 from typing import List
 
+import orjson
+import requests
+
 # Add backend to path
 backend_dir = Path(__file__).resolve().parent
 sys.path.insert(0, str(backend_dir))
@@ -18,6 +21,9 @@ load_dotenv()
 
 from config import settings
 
+# One session for every embedding request so the TLS connection is reused.
+_SESSION = requests.Session()
+
 
 class OpenRouterEmbeddings:
     """Custom embedding class that uses OpenRouter API for embeddings."""
@@ -32,16 +38,12 @@ class OpenRouterEmbeddings:
                    - text-embedding-3-large (3072 dims)
                    - text-embedding-ada-002 (1536 dims)
         """
-        import requests
-        from pydantic import SecretStr
-        
         self.api_key = settings.OPENROUTER_API_KEY
         if not self.api_key:
             raise ValueError("OPENROUTER_API_KEY is not set")
         
         self.model = model
         self.base_url = "https://openrouter.ai/api/v1"
-        self.requests = requests
         
     def embed_query(self, text: str) -> List[float]:
         """Embed a single query string."""
@@ -49,8 +51,6 @@ class OpenRouterEmbeddings:
     
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """Embed multiple documents."""
-        import requests
-        
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
@@ -61,20 +61,17 @@ class OpenRouterEmbeddings:
         # OpenRouter uses OpenAI-compatible endpoint
         url = f"{self.base_url}/embeddings"
         
-        embeddings = []
-        for text in texts:
-            payload = {
-                "model": self.model,
-                "input": text,
-            }
-            
-            response = requests.post(url, headers=headers, json=payload)
-            response.raise_for_status()
-            
-            data = response.json()
-            embeddings.append(data["data"][0]["embedding"])
+        # The endpoint accepts a list of inputs; embed them all in one request.
+        payload = {
+            "model": self.model,
+            "input": texts,
+        }
+        
+        response = _SESSION.post(url, headers=headers, json=payload, timeout=30)
+        response.raise_for_status()
         
-        return embeddings
+        data = sorted(orjson.loads(response.content)["data"], key=lambda d: d["index"])
+        return [d["embedding"] for d in data]
 
 
 def test_openrouter_embeddings():
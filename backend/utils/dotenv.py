@@ -3,27 +3,31 @@ from __future__ import annotations
 from pathlib import Path
 import os
 
+# Resolved once at import; resolve() touches the filesystem.
+_BACKEND_DIR = Path(__file__).resolve().parents[1]
+_ROOT_DIR = _BACKEND_DIR.parent
+
+
 
 def _load_env_file(p: Path) -> None:
     """Load KEY=VALUE pairs from a file into os.environ (does not override existing)."""
     try:
-        raw = p.read_text(encoding="utf-8", errors="replace")
-    except Exception:
+        f = open(p, "r", encoding="utf-8", errors="replace")
+    except OSError:
         return
-    for line in raw.splitlines():
-        s = line.strip()
-        if not s or s.startswith("#"):
-            continue
-        if "=" not in s:
-            continue
-        key, value = s.split("=", 1)
-        key = key.strip()
-        value = value.strip().strip('"').strip("'")
-        if not key:
-            continue
-        if key in os.environ:
-            continue
-        os.environ[key] = value
+    with f:
+        # Iterate the file lazily instead of reading it whole and splitting it into a list.
+        for line in f:
+            s = line.strip()
+            if not s or s[0] == "#":
+                continue
+            key, sep, value = s.partition("=")
+            if not sep:
+                continue
+            key = key.strip()
+            if not key:
+                continue
+            os.environ.setdefault(key, value.strip().strip('"').strip("'"))
 
 
 def load_dotenv(dotenv_path: str | os.PathLike[str] | None = None) -> None:
@@ -35,14 +39,9 @@ def load_dotenv(dotenv_path: str | os.PathLike[str] | None = None) -> None:
     - Loads backend/.env, backend/.env.local, root .env, root .env.local (later overrides earlier).
     """
     if dotenv_path is not None:
-        p = Path(dotenv_path)
-        if p.exists() and p.is_file():
-            _load_env_file(p)
+        _load_env_file(Path(dotenv_path))
         return
-    backend_dir = Path(__file__).resolve().parents[1]
-    root_dir = Path(__file__).resolve().parents[2]
-    for base in (backend_dir, root_dir):
+    for base in (_BACKEND_DIR, _ROOT_DIR):
         for name in (".env", ".env.local"):
-            p = base / name
-            if p.exists() and p.is_file():
-                _load_env_file(p)
+            # A missing file (or a directory) simply fails to open.
+            _load_env_file(base / name)
@@ -1,68 +1,101 @@
-from typing import List
+import functools
+import re
+import threading
+from itertools import islice
+from typing import Callable, List
 from agent.tools.vector_store import YellowVectorStore
 
+_STORE_LOCK = threading.Lock()
+
+
+@functools.lru_cache(maxsize=2)
+def _cached_store(use_openrouter: bool) -> YellowVectorStore:
+    return YellowVectorStore(use_openrouter=use_openrouter)
+
+
+def _get_store(use_openrouter: bool = True) -> YellowVectorStore:
+    """
+    Shared YellowVectorStore per embedding backend, so searches reuse one embeddings
+    client and Chroma handle. Locked because callers run in worker threads and could
+    otherwise race to build the first instance.
+    """
+    with _STORE_LOCK:
+        return _cached_store(use_openrouter)
+
+
+def warmup_docs_store() -> None:
+    """Build the shared store and warm its Chroma index (blocking; run in a thread)."""
+    _get_store().warmup()
+
+
 def _search_docs_wrapper(query: str, missing_info: list[str] | None) -> str:
     """Helper to run blocking vector store operations in a thread."""
     try:
-        vs = YellowVectorStore()
-        final_query = query
-        if missing_info:
-            final_query += " " + " ".join(missing_info)
-        return vs.search(final_query)
+        vs = _get_store()
+        # Embed the prompt and each missing_info item separately and search once on
+        # their mean, rather than embedding one long concatenated string.
+        return vs.search_multi([query, *(missing_info or [])])
     except Exception as e:
         return f"Error searching docs: {str(e)}"
 
+def _checklist_matcher(checklist_item: str) -> Callable[[str], bool]:
+    """
+    Build a test for "the item, or any word of it, occurs in this lowercased text".
+    The words are compiled into one alternation so each document is scanned once
+    instead of once per word. (A match on the whole item implies a word match.)
+    """
+    item_lower = checklist_item.lower()
+    words = item_lower.split()
+    if not words:
+        return lambda text: item_lower in text
+    pattern = re.compile("|".join(map(re.escape, words)))
+    return lambda text: pattern.search(text) is not None
+
+
 def _search_docs_with_checklist(checklist: List[str]) -> str:
     """
     Search vector database using checklist items.
     Each checklist item becomes a search query.
     """
-    vector_store = YellowVectorStore(use_openrouter=True)
+    vector_store = _get_store(use_openrouter=True)
     all_results = []
-    
-    for checklist_item in checklist:
-        try:
-            # Search with each checklist item as a query
-            results = vector_store.search(checklist_item, k=5)  # Top 5 results per item
+
+    try:
+        # One batched embedding + Chroma query for every checklist item; top 5 per item
+        for results in vector_store.search_batch(checklist, k=5):
             all_results.extend(results)
-        except Exception as e:
-            print(f"Error searching for '{checklist_item}': {e}")
-            continue
+    except Exception as e:
+        print(f"Error searching checklist: {e}")
     
-    # Deduplicate results
-    seen = set()
-    unique_results = []
-    for result in all_results:
-        content = result.page_content
-        if content not in seen:
-            seen.add(content)
-            unique_results.append(result)
+    # Deduplicate results; dict keeps first-seen order
+    unique_contents = list(dict.fromkeys(r.page_content for r in all_results))
+    # Lowercase each document once, not once per checklist item
+    lowered = [content.lower() for content in unique_contents]
     
     # Combine into context string, organized by checklist item
     combined_parts = []
-    used_content = set()
+    # Track used documents by index so we never re-hash or compare long strings
+    used = [False] * len(unique_contents)
     
     for checklist_item in checklist:
-        # Find results that match this checklist item
-        matching_results = [
-            r for r in unique_results 
-            if r.page_content not in used_content and (
-                checklist_item.lower() in r.page_content.lower() or 
-                any(word in r.page_content.lower() for word in checklist_item.lower().split())
-            )
-        ][:3]  # Top 3 matches per item
+        # Find results that match this checklist item (top 3, stop scanning once found)
+        matches = _checklist_matcher(checklist_item)
+        matching = list(islice(
+            (i for i, text in enumerate(lowered) if not used[i] and matches(text)),
+            3,
+        ))
         
-        if matching_results:
+        if matching:
             combined_parts.append(f"=== Documentation for: {checklist_item} ===\n")
-            for result in matching_results:
-                combined_parts.append(f"{result.page_content}\n\n")
-                used_content.add(result.page_content)
+            for i in matching:
+                combined_parts.append(f"{unique_contents[i]}\n\n")
+                used[i] = True
     
     # Add any remaining unique results
-    remaining = [r for r in unique_results if r.page_content not in used_content]
+    remaining = [content for content, is_used in zip(unique_contents, used) if not is_used]
     if remaining:
         combined_parts.append("\n=== Additional Relevant Documentation ===\n")
-        for result in remaining[:5]:
-            combined_parts.append(f"{result.page_content}\n\n")
+        for content in remaining[:5]:
+            combined_parts.append(f"{content}\n\n")
     
     return "\n".join(combined_parts)
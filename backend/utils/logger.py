@@ -1,5 +1,8 @@
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
 import sys
 from typing import Optional
 
@@ -18,34 +21,108 @@ COLOR_MESSAGE = "\033[37m"   # White for message
 
 LOG_LEVEL = os.getenv("BACKEND_LOG_LEVEL", "INFO").upper()
 
+def _level_template(levelname: str, use_color: bool = True) -> str:
+    """Line template with the colors and padded level baked in; fields are time, name, message."""
+    if not use_color:
+        return f"{{}} | {levelname:<8} | {{}} | {{}}"
+    color_level = COLOR_LEVELS.get(levelname, "")
+    return (
+        f"{COLOR_TIME}{{}}{RESET} | {color_level}{levelname:<8}{RESET} | "
+        f"{COLOR_NAME}{{}}{RESET} | {COLOR_MESSAGE}{{}}{RESET}"
+    )
+
+
+def _stdout_is_tty() -> bool:
+    try:
+        return sys.stdout.isatty()
+    except (AttributeError, ValueError):
+        return False
+
+
 class ColoredFormatter(logging.Formatter):
-    def format(self, record):
-        asctime = self.formatTime(record, self.datefmt)
-        levelname = record.levelname
-        name = record.name
+    def __init__(self, *args, use_color: Optional[bool] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Escape codes are noise when output goes to a file or pipe.
+        self._use_color = _stdout_is_tty() if use_color is None else use_color
+        # Only the level part differs between records, so build each level's template once.
+        self._templates = {
+            levelname: _level_template(levelname, self._use_color) for levelname in COLOR_LEVELS
+        }
 
-        color_level = COLOR_LEVELS.get(levelname, "")
-        colored_level = f"{color_level}{levelname:<8}{RESET}"
-        colored_time = f"{COLOR_TIME}{asctime}{RESET}"
-        colored_name = f"{COLOR_NAME}{name}{RESET}"
-        colored_msg = f"{COLOR_MESSAGE}{record.getMessage()}{RESET}"
+    def format(self, record):
+        template = self._templates.get(record.levelname)
+        if template is None:
+            template = self._templates[record.levelname] = _level_template(record.levelname, self._use_color)
 
-        log = f"{colored_time} | {colored_level} | {colored_name} | {colored_msg}"
+        log = template.format(self.formatTime(record, self.datefmt), record.name, record.getMessage())
         if record.exc_info:
-            log += f"\n{self.formatException(record.exc_info)}"
+            # Render a traceback once per record, however many handlers format it.
+            if not record.exc_text:
+                record.exc_text = self.formatException(record.exc_info)
+            log += f"\n{record.exc_text}"
         return log
 
 # Remove all existing handlers associated with the root logger.
 for handler in logging.root.handlers[:]:
     logging.root.removeHandler(handler)
 
-handler = logging.StreamHandler(sys.stdout)
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Merge %-args now, since they may be mutated after the call returns, but leave
+        # coloring and traceback formatting to the listener thread.
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class _CoalescingStreamHandler(logging.StreamHandler):
+    """
+    StreamHandler on whatever sys.stdout currently is, so log lines stay in order with
+    print() output and go through any stdout replacement. Flushing is left to drain(),
+    so a burst of records becomes one write.
+    """
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass  # always sys.stdout
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        with self.lock:
+            self.stream.flush()
+
+
+class _DrainingQueueListener(logging.handlers.QueueListener):
+    def dequeue(self, block):
+        # About to wait for more records: write out everything buffered so far first.
+        if block and self.queue.empty():
+            handler.drain()
+        return self.queue.get(block)
+
+
+handler = _CoalescingStreamHandler()
 handler.setLevel(getattr(logging, LOG_LEVEL, logging.DEBUG))
 handler.setFormatter(ColoredFormatter())
 
+# Logging calls only enqueue the record; one background thread formats and writes to
+# stdout, so request handlers never block on the stream. The listener flushes whenever
+# the queue runs dry, so output is never held back longer than the current burst.
+_log_queue: queue.SimpleQueue = queue.SimpleQueue()
+_listener = _DrainingQueueListener(_log_queue, handler, respect_handler_level=True)
+_listener.start()
+# atexit runs in reverse order: stop (drain the queue) first, then flush the stream.
+atexit.register(handler.drain)
+atexit.register(_listener.stop)
+
 logging.basicConfig(
     level=getattr(logging, LOG_LEVEL, logging.DEBUG),
-    handlers=[handler],
+    handlers=[_DeferredQueueHandler(_log_queue)],
 )
 
 def get_logger(name: Optional[str] = None) -> logging.Logger:
@@ -0,0 +1,17 @@
+"""
+Shared setup for the scripts in this directory: put backend/ on sys.path and load
+backend/.env, once per process. Import it before any backend module:
+
+    from _bootstrap import backend_root
+"""
+import sys
+from pathlib import Path
+
+backend_root = Path(__file__).resolve().parent.parent
+
+if str(backend_root) not in sys.path:
+    sys.path.append(str(backend_root))
+
+from utils.dotenv import load_dotenv
+
+load_dotenv(backend_root / ".env")
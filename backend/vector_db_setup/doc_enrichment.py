@@ -1,8 +1,16 @@
 from __future__ import annotations
 
+import asyncio
+import functools
+import hashlib
+import inspect
 import json
 import re
+import sqlite3
+from pathlib import Path
 from typing import Dict, List, Optional
+
+import orjson
 from langchain_core.documents import Document
 from config import settings
 
@@ -11,6 +19,51 @@ try:
 except Exception:
     get_llm = None
 
+try:
+    # optional: RE2's linear-time engine for the hot patterns, which only use
+    # RE2-compatible syntax
+    import re2 as _fast_re
+except ImportError:
+    _fast_re = re
+
+# Match function definitions: `functionName(...)` or `#### functionName`. Kept as
+# separate passes: matches from different patterns may overlap (`createX(` yields
+# both createX and X), which a single alternation would lose.
+_FUNCTION_NAME_PATTERNS = [
+    _fast_re.compile(r'`([a-zA-Z_][a-zA-Z0-9_]*)\s*\('),  # `functionName(
+    _fast_re.compile(r'####\s+`([a-zA-Z_][a-zA-Z0-9_]*)'),  # #### `functionName
+    _fast_re.compile(r'create([A-Z][a-zA-Z0-9]*)'),  # createAppSession, createChannel, etc.
+    _fast_re.compile(r'([a-z]+_[a-z_]+)'),  # snake_case like create_app_session
+]
+
+# Markdown code fences around the enrichment JSON
+_FENCE_OPEN = re.compile(r'^```(?:json)?\s*')
+_FENCE_CLOSE = re.compile(r'\s*```$')
+
+# Enrichment results from earlier runs, keyed on prompt/parser version + model + chunk,
+# so re-ingesting unchanged docs skips the LLM call.
+ENRICH_CACHE_PATH = Path(__file__).resolve().parent.parent / "data" / "enrich_cache.db"
+
+
+@functools.lru_cache(maxsize=1)
+def _enrichment_version() -> str:
+    """
+    Fingerprint of the prompt builder and response parser, part of every cache key:
+    editing either one invalidates enrichments produced by the old version.
+    """
+    source = inspect.getsource(DocumentEnricher._build_enrichment_prompt) + inspect.getsource(
+        DocumentEnricher._parse_enrichment_response
+    )
+    return hashlib.blake2b(source.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def document_to_json_line(doc: Document) -> bytes:
+    """One enriched_docs.jsonl line: {"page_content", "metadata"} plus a newline."""
+    return orjson.dumps(
+        {"page_content": doc.page_content, "metadata": doc.metadata},
+        option=orjson.OPT_APPEND_NEWLINE,
+    )
+
 
 class DocumentEnricher:
     """
@@ -18,7 +71,8 @@ class DocumentEnricher:
     searchability and bridge the vocabulary gap for autonomous agents.
     """
     
-    def __init__(self):
+    def __init__(self, use_cache: bool = True):
+        """use_cache=False always calls the LLM and neither reads nor writes the cache."""
         if not settings.OPENROUTER_API_KEY:
             raise ValueError("OPENROUTER_API_KEY is not set. Cannot initialize enricher.")
         if get_llm is None:
@@ -28,24 +82,42 @@ class DocumentEnricher:
             temperature=0.1,  # Low temperature for consistent metadata
             max_tokens=2048,
         )
+        
+        self._cache: Optional[sqlite3.Connection] = None
+        if use_cache:
+            ENRICH_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+            self._cache = sqlite3.connect(ENRICH_CACHE_PATH)
+            self._cache.execute(
+                "CREATE TABLE IF NOT EXISTS enrichment (hash TEXT PRIMARY KEY, payload TEXT NOT NULL)"
+            )
+    
+    def _cache_key(self, content: str, title: str, chunk_type: str) -> str:
+        raw = f"{_enrichment_version()}\x00{settings.OPENROUTER_MODEL}\x00{title}\x00{chunk_type}\x00{content}"
+        return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+    
+    def _cached_enrichment(self, key: str) -> Optional[Dict]:
+        if self._cache is None:
+            return None
+        row = self._cache.execute("SELECT payload FROM enrichment WHERE hash = ?", (key,)).fetchone()
+        return orjson.loads(row[0]) if row else None
+    
+    def _store_enrichment(self, key: str, enrichment_data: Dict) -> None:
+        if self._cache is None:
+            return
+        self._cache.execute(
+            "INSERT OR REPLACE INTO enrichment (hash, payload) VALUES (?, ?)",
+            (key, orjson.dumps(enrichment_data).decode("utf-8")),
+        )
+        self._cache.commit()
     
     def extract_function_names(self, text: str) -> List[str]:
         """
         Extract function/method names from code snippets using regex.
         This is a fast pre-filter before LLM enrichment.
         """
-        # Match function definitions: `functionName(...)` or `#### functionName`
-        patterns = [
-            r'`([a-zA-Z_][a-zA-Z0-9_]*)\s*\(',  # `functionName(`
-            r'####\s+`([a-zA-Z_][a-zA-Z0-9_]*)',  # #### `functionName
-            r'create([A-Z][a-zA-Z0-9]*)',  # createAppSession, createChannel, etc.
-            r'([a-z]+_[a-z_]+)',  # snake_case like create_app_session
-        ]
-        
         functions = set()
-        for pattern in patterns:
-            matches = re.findall(pattern, text)
-            functions.update(matches)
+        for pattern in _FUNCTION_NAME_PATTERNS:
+            functions.update(pattern.findall(text))
         
         return list(functions)[:5]  # Limit to top 5
     
@@ -54,7 +126,8 @@ class DocumentEnricher:
         Enrich a single document chunk with AI-generated metadata.
         """
         content = doc.page_content
-        metadata = doc.metadata.copy()
+        # Read-only here; the one copy is made when the enriched/fallback doc is built.
+        metadata = doc.metadata
         chunk_type = metadata.get("chunk_type", "unknown")
         title = metadata.get("title", "Unknown")
         
@@ -65,26 +138,32 @@ class DocumentEnricher:
         # Fast extraction of function names (no LLM needed)
         function_names = self.extract_function_names(content)
         
-        # Build enrichment prompt
-        prompt = self._build_enrichment_prompt(content, title, chunk_type, function_names)
+        cache_key = self._cache_key(content, title, chunk_type)
         
         try:
-            # Call LLM for intelligent metadata
-            response = await self.llm.ainvoke(prompt)
-            raw_content = getattr(response, "content", "") or ""
-            
-            # Extract text from content (handles strings, lists, dicts)
-            content_text = self._extract_text_from_content(raw_content)
-            
-            # Parse JSON response
-            enrichment_data = self._parse_enrichment_response(content_text)
+            enrichment_data = self._cached_enrichment(cache_key)
+            if enrichment_data is None:
+                # Build enrichment prompt
+                prompt = self._build_enrichment_prompt(content, title, chunk_type, function_names)
+                
+                # Call LLM for intelligent metadata
+                response = await self.llm.ainvoke(prompt)
+                raw_content = getattr(response, "content", "") or ""
+                
+                # Extract text from content (handles strings, lists, dicts)
+                content_text = self._extract_text_from_content(raw_content)
+                
+                # Parse JSON response
+                enrichment_data = self._parse_enrichment_response(content_text)
+                # An unparseable response comes back as empty fallback metadata; retry
+                # those on the next run instead of caching them.
+                if enrichment_data.get("summary"):
+                    self._store_enrichment(cache_key, enrichment_data)
             
             # Merge metadata
-            enriched_metadata = {
-                **metadata,
-                **enrichment_data,
-                "function_names": function_names,  # Add extracted functions
-            }
+            enriched_metadata = metadata.copy()
+            enriched_metadata.update(enrichment_data)
+            enriched_metadata["function_names"] = function_names  # Add extracted functions
             
             # Enhance page_content with keywords for better searchability
             enhanced_content = self._enhance_content(content, enrichment_data)
@@ -181,8 +260,8 @@ Return ONLY valid JSON, no markdown, no explanation."""
         
         # Remove markdown code fences if present
         if content.startswith("```"):
-            content = re.sub(r'^```(?:json)?\s*', '', content)
-            content = re.sub(r'\s*```$', '', content)
+            content = _FENCE_OPEN.sub('', content)
+            content = _FENCE_CLOSE.sub('', content)
         
         try:
             data = json.loads(content)
@@ -234,28 +313,52 @@ Return ONLY valid JSON, no markdown, no explanation."""
         
         return content + "".join(enhancement)
     
-    async def enrich_batch(self, documents: List[Document], batch_size: int = 10) -> List[Document]:
+    async def enrich_batch(
+        self,
+        documents: List[Document],
+        batch_size: int = 10,
+        jsonl_path: Optional[Path] = None,
+    ) -> List[Document]:
         """
         Enrich multiple documents with rate limiting and progress tracking.
+
+        batch_size is the number of LLM calls kept in flight. It is a rolling window
+        over the whole list rather than fixed batches, so one slow chunk never holds
+        up the others. Results keep the input order.
+
+        If jsonl_path is given, each enriched document is appended to it as a JSON line
+        as soon as it is done (in completion order), so a crashed run keeps its work.
         """
-        enriched = []
         total = len(documents)
-        
-        for i in range(0, total, batch_size):
-            batch = documents[i:i + batch_size]
-            print(f"Enriching batch {i//batch_size + 1}/{(total + batch_size - 1)//batch_size} ({len(batch)} chunks)...")
-            
-            # Process batch concurrently
-            import asyncio
-            batch_results = await asyncio.gather(
-                *[self.enrich_chunk(doc) for doc in batch],
+        semaphore = asyncio.Semaphore(batch_size)
+        done = 0
+        sink = open(jsonl_path, "wb") if jsonl_path is not None else None
+
+        async def enrich_one(doc: Document) -> Document:
+            nonlocal done
+            async with semaphore:
+                result = await self.enrich_chunk(doc)
+            if sink is not None:
+                sink.write(document_to_json_line(result))
+            done += 1
+            if done % batch_size == 0 or done == total:
+                print(f"Enriched {done}/{total} chunks...")
+            return result
+
+        try:
+            results = await asyncio.gather(
+                *[enrich_one(doc) for doc in documents],
                 return_exceptions=True
             )
-            
-            for result in batch_results:
-                if isinstance(result, Exception):
-                    print(f"Error in batch processing: {result}")
-                    continue
-                enriched.append(result)
+        finally:
+            if sink is not None:
+                sink.close()
+
+        enriched = []
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"Error in batch processing: {result}")
+                continue
+            enriched.append(result)
         
         return enriched
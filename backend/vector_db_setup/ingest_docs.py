@@ -1,34 +1,55 @@
-import json
 import sys
 import os
 import re
 import asyncio
-from typing import List
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterator, List
 from pathlib import Path
 
-# Add backend directory to sys.path to allow imports
-# This script is located at backend/vector_db_setup/ingest_docs.py
-current_file = Path(__file__).resolve()
-backend_root = current_file.parent.parent
-sys.path.append(str(backend_root))
+import orjson
 
-from utils.dotenv import load_dotenv
-load_dotenv(backend_root / ".env")
+# Puts backend/ on sys.path and loads backend/.env
+from _bootstrap import backend_root
 
 from agent.tools.vector_store import YellowVectorStore
-from doc_enrichment import DocumentEnricher
+from config import settings
+from doc_enrichment import DocumentEnricher, document_to_json_line
 from langchain_core.documents import Document
 
+try:
+    import ijson  # optional: stream-parse the docs JSON
+except ImportError:
+    ijson = None
+
+try:
+    # optional: RE2's linear-time engine for the hot patterns, which only use
+    # RE2-compatible syntax
+    import re2 as _fast_re
+except ImportError:
+    _fast_re = re
+
 DOCS_JSON_PATH = backend_root.parent / "docs" / "yellow_docs_vector_data.json"
+ENRICHED_JSONL_PATH = backend_root / "data" / "enriched_docs.jsonl"
+# Concurrent add_documents batches when storing the enriched docs
+ADD_CONCURRENCY = 8
+# Pages handed to the chunking process pool at a time
+CHUNK_GROUP_SIZE = 256
+
+# Page chrome stripped by clean_text, as one alternation so each page is scanned once.
+_CLEAN_RE = _fast_re.compile(
+    r'(?m)'  # multiline inline, since re2 takes no re.MULTILINE flag
+    r'^\s*\* \[\]\(/.*\)$'  # breadcrumbs like "* [](/)"
+    r'|^On this page.*$'  # "On this page" TOC
+    r'|\[Edit this page\].*$'  # footer "Edit this page"
+)
 
 def clean_text(text: str) -> str:
-    # Remove breadcrumbs like "* [](/)"
-    text = re.sub(r'^\s*\* \[\]\(/.*\)$', '', text, flags=re.MULTILINE)
-    # Remove "On this page" TOC
-    text = re.sub(r'^On this page.*$', '', text, flags=re.MULTILINE)
-    # Remove footer "Edit this page"
-    text = re.sub(r'\[Edit this page\].*$', '', text, flags=re.MULTILINE)
-    return text.strip()
+    return _CLEAN_RE.sub('', text).strip()
+
+# Section headers chunk_content splits on
+_H4_RE = _fast_re.compile(r'(?m)^####\s+.*$')
+_H2_RE = _fast_re.compile(r'(?m)^##\s+.*$')
 
 def chunk_content(item: dict) -> List[Document]:
     url = item.get("id", "")
@@ -39,68 +60,39 @@ def chunk_content(item: dict) -> List[Document]:
     
     chunks = []
     
-    # API Reference mode: split by Level 4 headers (#### `functionName`)
     if "/api-reference/" in url:
-        # Split by #### to capture function definitions
-        # The split will consume the delimiter, so we need to be careful.
-        # simpler approach: split by `#### ` and re-attach?
-        # Or just use LangChain's Markdown splitter if we wanted, but let's stick to the plan's custom logic
-        # for precision on these specific docs.
-        
-        parts = re.split(r'(^####\s+.*$)', clean_content, flags=re.MULTILINE)
-        
-        # parts[0] is intro text
-        # parts[1] is header 1
-        # parts[2] is body 1
-        # parts[3] is header 2
-        # parts[4] is body 2...
-        
-        current_chunk = parts[0]
-        
-        for i in range(1, len(parts), 2):
-            header = parts[i]
-            body = parts[i+1] if i+1 < len(parts) else ""
-            
-            # If the current chunk is substantial, save it
-            if len(current_chunk.strip()) > 50:
-                 chunks.append(Document(
-                    page_content=current_chunk.strip(),
-                    metadata={**metadata_base, "chunk_type": "api_intro"}
-                ))
-            
-            # New chunk for this function
-            current_chunk = header + "\n" + body
-            
-        # Add the last one
-        if current_chunk.strip():
-             chunks.append(Document(
-                page_content=current_chunk.strip(),
-                metadata={**metadata_base, "chunk_type": "api_function"}
-            ))
-            
+        # API Reference mode: split by Level 4 headers (#### `functionName`)
+        header_re, section_type, last_type = _H4_RE, "api_intro", "api_function"
     else:
         # Guide mode: split by Level 2 headers (## )
-        parts = re.split(r'(^##\s+.*$)', clean_content, flags=re.MULTILINE)
-        
-        current_chunk = parts[0]
+        header_re, section_type, last_type = _H2_RE, "guide_section", "guide_section"
+    
+    # Walk the header matches and slice each section out of clean_content directly,
+    # rather than re.split-ing into an interleaved header/body list.
+    headers = list(header_re.finditer(clean_content))
+    
+    # Text before the first header is the intro
+    current_chunk = clean_content[:headers[0].start()] if headers else clean_content
+    
+    for i, header in enumerate(headers):
+        body_end = headers[i + 1].start() if i + 1 < len(headers) else len(clean_content)
         
-        for i in range(1, len(parts), 2):
-            header = parts[i]
-            body = parts[i+1] if i+1 < len(parts) else ""
-            
-            if len(current_chunk.strip()) > 50:
-                 chunks.append(Document(
-                    page_content=current_chunk.strip(),
-                    metadata={**metadata_base, "chunk_type": "guide_section"}
-                ))
-            
-            current_chunk = header + "\n" + body
-            
-        if current_chunk.strip():
+        # If the current chunk is substantial, save it
+        if len(current_chunk.strip()) > 50:
              chunks.append(Document(
                 page_content=current_chunk.strip(),
-                metadata={**metadata_base, "chunk_type": "guide_section"}
+                metadata={**metadata_base, "chunk_type": section_type}
             ))
+        
+        # New chunk for this section
+        current_chunk = header.group() + "\n" + clean_content[header.end():body_end]
+        
+    # Add the last one
+    if current_chunk.strip():
+         chunks.append(Document(
+            page_content=current_chunk.strip(),
+            metadata={**metadata_base, "chunk_type": last_type}
+        ))
             
     # Fallback: if no chunks (e.g. no headers found), use the whole text
     if not chunks and clean_content:
@@ -111,32 +103,50 @@ def chunk_content(item: dict) -> List[Document]:
         
     return chunks
 
+def _iter_pages(path: Path) -> Iterator[dict]:
+    """
+    Yield the pages of the docs JSON array one at a time. Streams with ijson when it
+    is installed; otherwise falls back to loading the whole file with orjson.
+    """
+    if ijson is None:
+        yield from orjson.loads(path.read_bytes())
+        return
+    with open(path, "rb") as f:
+        yield from ijson.items(f, "item")
+
 async def main():
     print(f"Loading docs from {DOCS_JSON_PATH}...")
+    all_docs = []
+    page_count = 0
     try:
-        with open(DOCS_JSON_PATH, "r") as f:
-            data = json.load(f)
+        # Chunking is CPU-bound regex work, so pages are spread over worker processes.
+        # They are fed in bounded groups as they are parsed, so the raw corpus is never
+        # held in memory whole.
+        pages = _iter_pages(DOCS_JSON_PATH)
+        with ProcessPoolExecutor() as pool:
+            while batch := list(islice(pages, CHUNK_GROUP_SIZE)):
+                for page_chunks in pool.map(chunk_content, batch, chunksize=32):
+                    all_docs.extend(page_chunks)
+                page_count += len(batch)
     except FileNotFoundError:
         print(f"Error: Could not find {DOCS_JSON_PATH}")
         sys.exit(1)
-
-    all_docs = []
-    print(f"Processing {len(data)} pages...")
-    
-    for item in data:
-        page_chunks = chunk_content(item)
-        all_docs.extend(page_chunks)
         
+    print(f"Processed {page_count} pages.")
     print(f"Generated {len(all_docs)} chunks.")
     
-    # Enrich documents before storing
+    # Enrich documents before storing. Each one is also written to a JSON Lines file
+    # for backup/inspection as soon as it is enriched.
     print("\n" + "="*60)
     print("ENRICHING DOCUMENTS WITH AI METADATA")
     print("="*60)
     
+    os.makedirs(ENRICHED_JSONL_PATH.parent, exist_ok=True)
+    print(f"Writing enriched documents to {ENRICHED_JSONL_PATH}...")
+    
     try:
         enricher = DocumentEnricher()
-        enriched_docs = await enricher.enrich_batch(all_docs, batch_size=10)
+        enriched_docs = await enricher.enrich_batch(all_docs, batch_size=10, jsonl_path=ENRICHED_JSONL_PATH)
         
         # Count enrichment stats
         enriched_count = sum(1 for d in enriched_docs if d.metadata.get("enriched", False))
@@ -148,29 +158,28 @@ async def main():
         print(f"Error during enrichment: {e}")
         print("Falling back to unenriched documents...")
         enriched_docs = all_docs
+        with open(ENRICHED_JSONL_PATH, "wb") as f:
+            f.writelines(document_to_json_line(doc) for doc in enriched_docs)
     
-    # Save enriched documents as JSON for backup/inspection
-    enriched_json_path = backend_root / "data" / "enriched_docs.json"
-    print(f"\nSaving enriched documents to {enriched_json_path}...")
-    
-    enriched_data = []
-    for doc in enriched_docs:
-        enriched_data.append({
-            "page_content": doc.page_content,
-            "metadata": doc.metadata
-        })
-    
-    os.makedirs(enriched_json_path.parent, exist_ok=True)
-    with open(enriched_json_path, "w", encoding="utf-8") as f:
-        json.dump(enriched_data, f, indent=2, ensure_ascii=False)
-    
-    print(f"Saved {len(enriched_data)} enriched documents to JSON.")
+    print(f"Saved {len(enriched_docs)} enriched documents to JSON Lines.")
     
     print("\nInitializing Vector Store...")
     vector_store = YellowVectorStore()
     
     print("Adding documents to ChromaDB...")
-    vector_store.add_documents(enriched_docs)
+    # Each batch is dominated by its embeddings request, so run several at once off the
+    # event loop, capped so the provider isn't flooded.
+    semaphore = asyncio.Semaphore(ADD_CONCURRENCY)
+    
+    async def add_batch(batch: List[Document]) -> None:
+        async with semaphore:
+            await asyncio.to_thread(vector_store.add_documents, batch)
+    
+    batch_size = settings.CHROMA_BATCH_SIZE
+    await asyncio.gather(*[
+        add_batch(enriched_docs[i:i + batch_size])
+        for i in range(0, len(enriched_docs), batch_size)
+    ])
     
     print("Ingestion complete.")
 
@@ -1,45 +1,82 @@
 #!/usr/bin/env python3
 """Load enriched documents from JSON and populate vector DB with OpenRouter embeddings."""
-import json
 import sys
 import shutil
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
 from pathlib import Path
+from typing import Iterator, List, Tuple
 
-# Add backend directory to sys.path
-current_file = Path(__file__).resolve()
-backend_root = current_file.parent.parent
-sys.path.append(str(backend_root))
+import orjson
 
-from utils.dotenv import load_dotenv
-load_dotenv(backend_root / ".env")
+# Puts backend/ on sys.path and loads backend/.env
+from _bootstrap import backend_root
 
-from agent.tools.vector_store import YellowVectorStore
-from langchain_core.documents import Document
+from agent.tools.vector_store import YellowVectorStore, document_id
+from config import settings
 
+try:
+    import ijson  # optional: stream-parse the legacy JSON array
+except ImportError:
+    ijson = None
+
+ENRICHED_JSONL_PATH = backend_root / "data" / "enriched_docs.jsonl"
+# Single JSON array written by older ingest runs; used when there is no .jsonl yet
 ENRICHED_JSON_PATH = backend_root / "data" / "enriched_docs.json"
+# Batches embedded/inserted in parallel
+ADD_WORKERS = 8
+
+def _iter_enriched_items(source: Path) -> Iterator[dict]:
+    """
+    Yield enriched {"page_content", "metadata"} items one at a time: line by line from
+    enriched_docs.jsonl, or from the legacy enriched_docs.json array (streamed with
+    ijson when installed).
+    """
+    if source.suffix == ".jsonl":
+        with open(source, "rb") as f:
+            for line in f:
+                if line.strip():
+                    yield orjson.loads(line)
+        return
+    if ijson is None:
+        yield from orjson.loads(source.read_bytes())
+        return
+    with open(source, "rb") as f:
+        yield from ijson.items(f, "item")
+
+
+def _iter_chunks(source: Path) -> Iterator[Tuple[str, dict]]:
+    """(page_content, metadata) pairs; plain tuples, since no Document is needed to insert."""
+    # Drop repeated chunks here too: add batches run concurrently, so a duplicate landing
+    # in another batch would be embedded twice before either insert is visible.
+    seen = set()
+    for item in _iter_enriched_items(source):
+        doc_id = document_id(item["page_content"])
+        if doc_id in seen:
+            continue
+        seen.add(doc_id)
+        metadata = item["metadata"]
+        metadata.pop("enriched", None)
+        yield item["page_content"], metadata
+
+
+def _add_batch(vector_store: YellowVectorStore, batch: List[Tuple[str, dict]]) -> int:
+    texts, metadatas = zip(*batch)
+    vector_store.add_texts(list(texts), list(metadatas))
+    return len(batch)
+
+
+def _finish(futures) -> int:
+    """Collect finished add batches (re-raising any failure); returns documents added."""
+    return sum(future.result() for future in futures)
+
 
 def main():
-    print(f"Loading enriched documents from {ENRICHED_JSON_PATH}...")
-    
-    try:
-        with open(ENRICHED_JSON_PATH, "r", encoding="utf-8") as f:
-            enriched_data = json.load(f)
-    except FileNotFoundError:
-        print(f"Error: Could not find {ENRICHED_JSON_PATH}")
+    source = ENRICHED_JSONL_PATH if ENRICHED_JSONL_PATH.exists() else ENRICHED_JSON_PATH
+    if not source.exists():
+        print(f"Error: Could not find {ENRICHED_JSONL_PATH} or {ENRICHED_JSON_PATH}")
         sys.exit(1)
-    
-    print(f"Loaded {len(enriched_data)} enriched documents.")
-    
-    # Convert JSON to Document objects
-    documents = []
-    for item in enriched_data:
-        metadata = item["metadata"].copy()
-        metadata.pop("enriched", None)
-        
-        documents.append(Document(
-            page_content=item["page_content"],
-            metadata=metadata
-        ))
+    print(f"Loading enriched documents from {source}...")
     
     print("\nInitializing Vector Store with OpenRouter embeddings...")
     print("Using embeddings: OpenRouter (text-embedding-3-large)")
@@ -55,17 +92,26 @@ def main():
     vector_store = YellowVectorStore(use_openrouter=True)
     
     print("Adding documents to ChromaDB (with metadata normalization)...")
-    print(f"Processing {len(documents)} documents...")
     
-    # Process in batches to show progress
-    batch_size = 50
-    for i in range(0, len(documents), batch_size):
-        batch = documents[i:i + batch_size]
-        vector_store.add_documents(batch)
-        print(f"   Processed {min(i + batch_size, len(documents))}/{len(documents)} documents...")
+    # Documents are streamed from the file straight into batches, so only the batches
+    # in flight are held in memory. Each batch is mostly an embeddings API round trip,
+    # so several batches are embedded and inserted concurrently.
+    batch_size = settings.CHROMA_BATCH_SIZE
+    documents = _iter_chunks(source)
+    processed = 0
+    in_flight = set()
+    with ThreadPoolExecutor(max_workers=ADD_WORKERS) as pool:
+        while batch := list(islice(documents, batch_size)):
+            if len(in_flight) >= ADD_WORKERS * 2:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                processed += _finish(done)
+                print(f"   Processed {processed} documents...")
+            in_flight.add(pool.submit(_add_batch, vector_store, batch))
+        processed += _finish(wait(in_flight).done)
     
-    print(f"\n✅ Successfully added {len(documents)} documents to ChromaDB!")
+    print(f"\n✅ Successfully added {processed} documents to ChromaDB!")
     print("✅ Database rebuilt with OpenRouter embeddings!")
 
+
 if __name__ == "__main__":
     main()
@@ -1,15 +1,7 @@
 #!/usr/bin/env python3
 """Quick test to verify enrichment worked."""
-import sys
-from pathlib import Path
-
-# Add backend directory to sys.path
-current_file = Path(__file__).resolve()
-backend_root = current_file.parent
-sys.path.append(str(backend_root))
-
-from utils.dotenv import load_dotenv
-load_dotenv(backend_root / ".env")
+# Puts backend/ on sys.path and loads backend/.env
+import _bootstrap  # noqa: F401
 
 from agent.tools.vector_store import YellowVectorStore
 
@@ -1,25 +1,55 @@
 #!/usr/bin/env python3
-"""Test enrichment on a single chunk to verify it works."""
+"""
+Test enrichment on a chunk to verify it works.
+
+Pass a .jsonl file of {"page_content", "metadata"} chunks to enrich many at once:
+    python test_single_enrichment.py chunks.jsonl
+"""
 import sys
 import asyncio
 from pathlib import Path
 
-# Add backend directory to sys.path
-current_file = Path(__file__).resolve()
-backend_root = current_file.parent
-sys.path.append(str(backend_root))
-
-from utils.dotenv import load_dotenv
-load_dotenv(backend_root / ".env")
+# Puts backend/ on sys.path and loads backend/.env
+import _bootstrap  # noqa: F401
 
+import orjson
 from doc_enrichment import DocumentEnricher
 from langchain_core.documents import Document
 
-async def main():
-    print("Testing enrichment on a single chunk...")
+# LLM calls kept in flight when enriching many chunks
+CONCURRENCY = 16
+
+
+def _load_chunks(path: Path) -> list[Document]:
+    with open(path, "rb") as f:
+        items = [orjson.loads(line) for line in f if line.strip()]
+    return [Document(page_content=item["page_content"], metadata=item.get("metadata", {})) for item in items]
+
+
+def _report(enriched_doc: Document) -> None:
+    print(f"\nEnriched document:")
+    print(f"  Enriched flag: {enriched_doc.metadata.get('enriched', False)}")
+    print(f"  Function name: {enriched_doc.metadata.get('function_name', 'None')}")
+    print(f"  Function names (extracted): {enriched_doc.metadata.get('function_names', [])}")
+    print(f"  Intent: {enriched_doc.metadata.get('intent', 'unknown')}")
+    print(f"  Summary: {enriched_doc.metadata.get('summary', '')}")
+    print(f"  Keywords: {enriched_doc.metadata.get('keywords', [])}")
+    print(f"  Use cases: {enriched_doc.metadata.get('use_cases', [])}")
+    print(f"\n  Enhanced content length: {len(enriched_doc.page_content)} chars")
+    print(f"  Enhanced content preview (last 300 chars):")
+    print(f"  ...{enriched_doc.page_content[-300:]}")
     
-    # Create a test document chunk (similar to what we'd get from ingestion)
-    test_doc = Document(
+    if enriched_doc.metadata.get('enriched', False):
+        print("\n✅ Enrichment successful!")
+    else:
+        print("\n❌ Enrichment failed!")
+        if 'error' in enriched_doc.metadata:
+            print(f"   Error: {enriched_doc.metadata['error']}")
+
+
+def _sample_chunk() -> Document:
+    # A test document chunk (similar to what we'd get from ingestion)
+    return Document(
         page_content="""
 #### `createAppSessionMessage(signer: MessageSigner, sessions: AppSession[]): Promise<string>`
 
@@ -41,38 +71,42 @@ This is used to initialize a payment flow on the Yellow Network.
             "chunk_type": "api_function"
         }
     )
+
+
+async def main():
+    if len(sys.argv) > 1:
+        test_docs = _load_chunks(Path(sys.argv[1]))
+        print(f"Testing enrichment on {len(test_docs)} chunks...")
+    else:
+        print("Testing enrichment on a single chunk...")
+        test_docs = [_sample_chunk()]
     
+    if not test_docs:
+        return
+    test_doc = test_docs[0]
     print(f"\nOriginal document:")
     print(f"  Content length: {len(test_doc.page_content)} chars")
     print(f"  Metadata: {list(test_doc.metadata.keys())}")
     print(f"  Content preview: {test_doc.page_content[:200]}...")
     
-    # Enrich it
+    # Enrich them: every chunk is its own request, CONCURRENCY of them in flight at once
     print("\n" + "="*60)
     print("ENRICHING...")
     print("="*60)
     
-    enricher = DocumentEnricher()
-    enriched_doc = await enricher.enrich_chunk(test_doc)
-    
-    print(f"\nEnriched document:")
-    print(f"  Enriched flag: {enriched_doc.metadata.get('enriched', False)}")
-    print(f"  Function name: {enriched_doc.metadata.get('function_name', 'None')}")
-    print(f"  Function names (extracted): {enriched_doc.metadata.get('function_names', [])}")
-    print(f"  Intent: {enriched_doc.metadata.get('intent', 'unknown')}")
-    print(f"  Summary: {enriched_doc.metadata.get('summary', '')}")
-    print(f"  Keywords: {enriched_doc.metadata.get('keywords', [])}")
-    print(f"  Use cases: {enriched_doc.metadata.get('use_cases', [])}")
-    print(f"\n  Enhanced content length: {len(enriched_doc.page_content)} chars")
-    print(f"  Enhanced content preview (last 300 chars):")
-    print(f"  ...{enriched_doc.page_content[-300:]}")
+    # Always exercise the LLM: cached results would hide a broken enrichment path
+    enricher = DocumentEnricher(use_cache=False)
+    enriched_docs = await enricher.enrich_batch(test_docs, batch_size=CONCURRENCY)
     
-    if enriched_doc.metadata.get('enriched', False):
-        print("\n✅ Enrichment successful!")
-    else:
-        print("\n❌ Enrichment failed!")
-        if 'error' in enriched_doc.metadata:
-            print(f"   Error: {enriched_doc.metadata['error']}")
+    # Full report for the first chunk; for a larger set, a tally plus any failures
+    if enriched_docs:
+        _report(enriched_docs[0])
+    if len(test_docs) > 1:
+        failed = [doc for doc in enriched_docs if not doc.metadata.get('enriched', False)]
+        for doc in failed:
+            print(f"   ❌ {doc.metadata.get('url', '?')}: {doc.metadata.get('error', 'not enriched')}")
+        print(f"\n{len(enriched_docs) - len(failed)}/{len(test_docs)} chunks enriched")
+
 
 if __name__ == "__main__":
     asyncio.run(main())